@@ -3,6 +3,11 @@ ASGI config for HealthPlus project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI worker (``GUNICORN_ASGI=1 gunicorn``, see
+gunicorn.conf.py, which runs it on ``uvicorn_worker.UvicornWorker``) so
+``api/user/login/async/`` can hand password hashing to the hash pool without
+blocking other requests.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +17,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HealthPlus.settings')
+# settings turn persistent database connections off under ASGI
+os.environ['DJANGO_ASGI'] = 'True'
 
 application = get_asgi_application()
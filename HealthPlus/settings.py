@@ -12,11 +12,12 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
 import dj_database_url
 import cloudinary
 from corsheaders.defaults import default_methods, default_headers
+from Utils.database import configure_connections
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -66,7 +67,20 @@ INSTALLED_APPS = [
 
 ]
 
+# API-only workers can leave out the admin (jazzmin, import_export) and the API
+# docs (drf-yasg), which are then never imported; see `manage.py profile_imports`.
+ADMIN_ENABLED = config('ADMIN_ENABLED', default=True, cast=bool)
+DOCS_ENABLED = config('DOCS_ENABLED', default=True, cast=bool)
+if not ADMIN_ENABLED:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ('jazzmin', 'django.contrib.admin', 'import_export')]
+if not DOCS_ENABLED:
+    INSTALLED_APPS.remove('drf_yasg')
+
 MIDDLEWARE = [
+    # first, so its total covers every other middleware; inert unless METRICS_ENABLED
+    'Utils.metrics.MetricsMiddleware',
+    # inert unless DATABASE_REPLICAS is set
+    'Utils.routers.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -111,6 +125,62 @@ DATABASES = {
 if PRODUCTION:
     DATABASES["default"] = dj_database_url.parse(config("DATABASE_URL"))
 
+# Connection reuse (see Utils/database.py). By default each worker thread keeps
+# its connection for DB_CONN_MAX_AGE seconds (0 = reconnect on every request),
+# checking it is still alive before reusing it. With DB_POOL on Postgres, and
+# psycopg[pool] installed, each worker process instead keeps a pool of
+# DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE connections; size it to the worker's
+# threads, and keep workers x DB_POOL_MAX_SIZE under Postgres' max_connections.
+# A request waits at most DB_POOL_TIMEOUT seconds for a free connection.
+# Under ASGI (HealthPlus/asgi.py sets DJANGO_ASGI) Django does not support
+# persistent connections, so DB_CONN_MAX_AGE is forced to 0 there and only the
+# WSGI deploy keeps connections; use DB_POOL to reuse them under ASGI.
+SERVE_ASGI = config('DJANGO_ASGI', default=False, cast=bool)
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=0 if SERVE_ASGI else 600, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=4, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=float)
+DB_POOL_MAX_IDLE = config('DB_POOL_MAX_IDLE', default=600, cast=float) # seconds before a spare connection is closed
+
+DATABASES["default"] = configure_connections(
+    DATABASES["default"],
+    conn_max_age=DB_CONN_MAX_AGE,
+    health_checks=DB_CONN_HEALTH_CHECKS,
+    pool=DB_POOL,
+    asgi=SERVE_ASGI,
+    pool_options={
+        'min_size': DB_POOL_MIN_SIZE,
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': DB_POOL_TIMEOUT,
+        'max_idle': DB_POOL_MAX_IDLE,
+    },
+)
+
+# Read replicas (see Utils/routers.py): reads of users and JWT tables go to one
+# of DATABASE_REPLICA_URLS, except where they could miss a recent write. After a
+# request writes, that client keeps reading from default for
+# REPLICA_STICKY_SECONDS; set it above the usual replication lag.
+DATABASE_REPLICA_URLS = config('DATABASE_REPLICA_URLS', default='', cast=Csv())
+DATABASE_REPLICAS = []
+for index, url in enumerate(DATABASE_REPLICA_URLS):
+    alias = f'replica_{index}'
+    DATABASES[alias] = configure_connections(
+        dj_database_url.parse(url),
+        conn_max_age=DB_CONN_MAX_AGE,
+        health_checks=DB_CONN_HEALTH_CHECKS,
+        pool=DB_POOL,
+        pool_options=DATABASES['default']['OPTIONS'].get('pool'),
+        asgi=SERVE_ASGI,
+    )
+    # tests run against default alone
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['Utils.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+REPLICA_PIN_COOKIE = 'db_primary_until'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,6 +200,32 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing: PASSWORD_HASHER picks the algorithm for new hashes
+# ("pbkdf2", "scrypt", or "argon2" which needs argon2-cffi installed). Stored
+# hashes made with another algorithm or other cost settings are rewritten on
+# the user's next login. `manage.py calibrate_hasher` suggests costs for this machine.
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='pbkdf2')
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=1_000_000, cast=int)
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=102400, cast=int) # KiB
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=8, cast=int)
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', default=2**14, cast=int) # power of 2
+PASSWORD_SCRYPT_BLOCK_SIZE = config('PASSWORD_SCRYPT_BLOCK_SIZE', default=8, cast=int)
+PASSWORD_SCRYPT_PARALLELISM = config('PASSWORD_SCRYPT_PARALLELISM', default=1, cast=int)
+
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'Utils.hashers.PBKDF2PasswordHasher',
+    'argon2': 'Utils.hashers.Argon2PasswordHasher',
+    'scrypt': 'Utils.hashers.ScryptPasswordHasher',
+}
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_CLASSES[PASSWORD_HASHER],
+    # still accepted, so existing hashes keep working until they are upgraded
+    *[path for name, path in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER],
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -152,6 +248,21 @@ STATIC_URL = 'static/'
 # )
 STATIC_ROOT = os.path.join(BASE_DIR,  'staticfiles')
 
+# STATIC_ROOT is build output and not committed; build.sh runs collectstatic on
+# each deploy. It writes every asset under a content-hashed name, plus a gzip copy
+# (and a brotli one with the Brotli package installed). WhiteNoise indexes
+# STATIC_ROOT once at startup and serves hashed names with a year-long
+# immutable Cache-Control, picking the precompressed copy the client accepts.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'Utils.storage.StaticFilesStorage'},
+}
+# assets missing from the manifest (collectstatic not re-run yet, or not run at
+# all) keep their plain, briefly cached names instead of failing the page
+WHITENOISE_MANIFEST_STRICT = False
+# on, STATIC_ROOT is re-checked on every request; only for editing assets locally
+WHITENOISE_AUTOREFRESH = config('WHITENOISE_AUTOREFRESH', default=False, cast=bool)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -204,7 +315,8 @@ JAZZMIN_SETTINGS = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication without the per-request user lookup
+        'Utils.authentication.ClaimsJWTAuthentication',
     ],
 }
 
@@ -231,7 +343,7 @@ SIMPLE_JWT = {
 
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
     "TOKEN_TYPE_CLAIM": "token_type",
-    "TOKEN_USER_CLASS": "rest_framework_simplejwt.models.TokenUser",
+    "TOKEN_USER_CLASS": "Utils.authentication.ClaimsTokenUser",
 
     "JTI_CLAIM": "jti",
 
@@ -240,18 +352,135 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=7),  # match your refresh token policy
 
     "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "Utils.blacklist.CachedBlacklistTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 
+# Students' serial numbers come from a per-year counter row. With a block size
+# above 1 each worker reserves that many at a time and hands them out without
+# locking the counter (unique, but no longer gap-free).
+SERIAL_NUMBER_BLOCK_SIZE = config('SERIAL_NUMBER_BLOCK_SIZE', default=1, cast=int)
+
+# Queries behind api/user/search/ are cancelled after this many milliseconds (0 = no limit)
+USER_SEARCH_BUDGET_MS = config('USER_SEARCH_BUDGET_MS', default=200, cast=int)
+
+# Cache alias remembering deactivated users until their access tokens expire.
+# It must be shared by every worker (e.g. Redis; a system check refuses locmem
+# and dummy caches). Unset, each request checks is_active in the database,
+# which the same check only allows outside PRODUCTION.
+JWT_REVOCATION_CACHE = config('JWT_REVOCATION_CACHE', default=None)
+
+# Recently blacklisted refresh-token JTIs are remembered in memory so replays
+# are rejected without a query. TOKEN_BLACKLIST_CACHE, a cache shared by every
+# worker, holds all of them once purge_expired_tokens has loaded the table into
+# it; refreshes then never query the blacklist. The same command removes
+# expired rows.
+TOKEN_BLACKLIST_RECENT_SIZE = config('TOKEN_BLACKLIST_RECENT_SIZE', default=50000, cast=int)
+TOKEN_BLACKLIST_CACHE = config('TOKEN_BLACKLIST_CACHE', default=None)
+
+# Seconds within which a repeat login does not rewrite last_login (0 = always write)
+LAST_LOGIN_UPDATE_WINDOW = config('LAST_LOGIN_UPDATE_WINDOW', default=0, cast=int)
+
 DEFAULT_USER_PROFILE_IMAGE = config('DEFAULT_USER_PROFILE_IMAGE')
+# Edge length, in pixels, of the face-cropped profile thumbnail. Stored URLs
+# are rebuilt by `manage.py refresh_profile_image_urls` after changing it.
+PROFILE_IMAGE_THUMBNAIL_SIZE = config('PROFILE_IMAGE_THUMBNAIL_SIZE', default=150, cast=int)
 SWAGGER_DOCS_BASE_URL = config('SWAGGER_DOCS_BASE_URL')
 
+# The OpenAPI schema is generated once per process (see Utils/openapi.py), or
+# read from OPENAPI_SCHEMA_DIR, where `manage.py build_openapi_schema` writes it
+# with precompressed copies on deploy (build.sh). Browsers revalidate it with
+# its ETag after OPENAPI_SCHEMA_MAX_AGE seconds. The UIs load it from the cached
+# route.
+OPENAPI_SCHEMA_DIR = config('OPENAPI_SCHEMA_DIR', default=None)
+OPENAPI_SCHEMA_MAX_AGE = config('OPENAPI_SCHEMA_MAX_AGE', default=300, cast=int)
+SWAGGER_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+REDOC_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+
 DEFAULT_STAFF_PASSWORD = config('DEFAULT_STAFF_PASSWORD')
 
+# Password hashing pool behind the async login endpoint. LOGIN_HASH_WORKERS caps
+# how many hashes run at once, LOGIN_HASH_MAX_QUEUE how many may wait for a free
+# worker before logins are turned away with a 429.
+LOGIN_HASH_EXECUTOR = config('LOGIN_HASH_EXECUTOR', default='process') # "process" or "thread"
+LOGIN_HASH_WORKERS = config('LOGIN_HASH_WORKERS', default=os.cpu_count() or 1, cast=int)
+LOGIN_HASH_MAX_QUEUE = config('LOGIN_HASH_MAX_QUEUE', default=32, cast=int)
+
+# Failed-login throttling (see Utils/throttle.py), checked before any query or
+# password hash. Failures are counted over a sliding LOGIN_THROTTLE_WINDOW per
+# client IP and per matric number / staff id; going over a limit locks the key
+# out for LOGIN_THROTTLE_LOCKOUT seconds, doubling on each repeat up to
+# LOGIN_THROTTLE_MAX_LOCKOUT. Campus NAT puts many students behind one address,
+# hence the higher IP limit. Set LOGIN_THROTTLE_BACKEND to an alias in CACHES to
+# count across workers, and LOGIN_THROTTLE_PROXY_COUNT to the number of proxies
+# that append to X-Forwarded-For in front of the app.
+LOGIN_THROTTLE_ENABLED = config('LOGIN_THROTTLE_ENABLED', default=True, cast=bool)
+LOGIN_THROTTLE_IP_LIMIT = config('LOGIN_THROTTLE_IP_LIMIT', default=100, cast=int)
+LOGIN_THROTTLE_IDENTIFIER_LIMIT = config('LOGIN_THROTTLE_IDENTIFIER_LIMIT', default=10, cast=int)
+LOGIN_THROTTLE_WINDOW = config('LOGIN_THROTTLE_WINDOW', default=300, cast=int)
+LOGIN_THROTTLE_LOCKOUT = config('LOGIN_THROTTLE_LOCKOUT', default=60, cast=int)
+LOGIN_THROTTLE_MAX_LOCKOUT = config('LOGIN_THROTTLE_MAX_LOCKOUT', default=3600, cast=int)
+LOGIN_THROTTLE_BACKEND = config('LOGIN_THROTTLE_BACKEND', default=None)
+LOGIN_THROTTLE_PROXY_COUNT = config('LOGIN_THROTTLE_PROXY_COUNT', default=0, cast=int)
+LOGIN_THROTTLE_MAX_KEYS = config('LOGIN_THROTTLE_MAX_KEYS', default=100000, cast=int)
+
+# Login credential cache (see Utils/credential_cache.py). Set
+# CREDENTIAL_CACHE_BACKEND to an alias in CACHES to share entries between
+# workers; the per-worker copy then lives at most CREDENTIAL_CACHE_LOCAL_TTL seconds.
+CREDENTIAL_CACHE_MAX_SIZE = config('CREDENTIAL_CACHE_MAX_SIZE', default=10000, cast=int)
+CREDENTIAL_CACHE_TTL = config('CREDENTIAL_CACHE_TTL', default=60, cast=int)
+CREDENTIAL_CACHE_NEGATIVE_TTL = config('CREDENTIAL_CACHE_NEGATIVE_TTL', default=10, cast=int)
+CREDENTIAL_CACHE_LOCAL_TTL = config('CREDENTIAL_CACHE_LOCAL_TTL', default=5, cast=int)
+CREDENTIAL_CACHE_BACKEND = config('CREDENTIAL_CACHE_BACKEND', default=None)
+
+# User admin changelist (see Utils/changelist.py). On Postgres, an unfiltered
+# total of at least ADMIN_COUNT_ESTIMATE_THRESHOLD rows is the planner's estimate
+# rather than COUNT(*); filtered and smaller ones, and all of them elsewhere, are
+# exact counts cached for ADMIN_COUNT_CACHE_TTL seconds. Filter facet counts are cached for
+# ADMIN_FACET_CACHE_TTL seconds, and each page's last row for
+# ADMIN_PAGE_BOUNDARY_TTL seconds so the next page is read after it instead of
+# at an OFFSET. Point ADMIN_COUNT_CACHE at a shared alias in CACHES to share
+# them between workers.
+ADMIN_COUNT_CACHE = config('ADMIN_COUNT_CACHE', default='default')
+ADMIN_COUNT_ESTIMATE_THRESHOLD = config('ADMIN_COUNT_ESTIMATE_THRESHOLD', default=10000, cast=int)
+ADMIN_COUNT_CACHE_TTL = config('ADMIN_COUNT_CACHE_TTL', default=60, cast=int)
+ADMIN_FACET_CACHE_TTL = config('ADMIN_FACET_CACHE_TTL', default=30, cast=int)
+ADMIN_PAGE_BOUNDARY_TTL = config('ADMIN_PAGE_BOUNDARY_TTL', default=600, cast=int)
+
+# Per-view request metrics (see Utils/metrics.py), served at /metrics.
+# METRICS_SAMPLE_RATE is the fraction of requests timed; the rest are only
+# counted. With several gunicorn workers set METRICS_DIR to a directory they
+# share (emptied on deploy) so /metrics reports the sum over all of them.
+# In PRODUCTION /metrics is only served with METRICS_AUTH_TOKEN set.
+# METRICS_SERVER_TIMING adds each response's query counts and timings as a
+# Server-Timing header, which every client can read: for development.
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+METRICS_SAMPLE_RATE = config('METRICS_SAMPLE_RATE', default=1.0, cast=float)
+METRICS_SERVER_TIMING = config('METRICS_SERVER_TIMING', default=False, cast=bool)
+METRICS_DIR = config('METRICS_DIR', default=None)
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=int)
+METRICS_AUTH_TOKEN = config('METRICS_AUTH_TOKEN', default=None) # scrapers send "Authorization: Bearer <token>"
+
+# Profile and staff ID images are staged in IMAGE_UPLOAD_STAGING_DIR and pushed
+# to IMAGE_UPLOAD_BACKEND by IMAGE_UPLOAD_WORKERS background threads (0 = one
+# attempt inline, after the request's transaction commits). Failed uploads are
+# retried with doubling delays; after IMAGE_UPLOAD_MAX_ATTEMPTS they wait for
+# `manage.py process_image_uploads --retry-failed`. For offline work use
+# Utils.uploads.LocalFileSystemBackend, which stores files under IMAGE_UPLOAD_LOCAL_ROOT.
+IMAGE_UPLOAD_BACKEND = config('IMAGE_UPLOAD_BACKEND', default='Utils.uploads.CloudinaryBackend')
+IMAGE_UPLOAD_LOCAL_ROOT = config('IMAGE_UPLOAD_LOCAL_ROOT', default=os.path.join(BASE_DIR, 'media'))
+IMAGE_UPLOAD_STAGING_DIR = config('IMAGE_UPLOAD_STAGING_DIR', default=os.path.join(BASE_DIR, 'upload_staging'))
+IMAGE_UPLOAD_WORKERS = config('IMAGE_UPLOAD_WORKERS', default=4, cast=int)
+IMAGE_UPLOAD_MAX_ATTEMPTS = config('IMAGE_UPLOAD_MAX_ATTEMPTS', default=5, cast=int)
+IMAGE_UPLOAD_RETRY_DELAY = config('IMAGE_UPLOAD_RETRY_DELAY', default=2, cast=float) # seconds before the first retry
+
 cloudinary.config(
     cloud_name = config('CLOUDINARY_CLOUD_NAME'),
     api_key = config('CLOUDINARY_API_KEY'),
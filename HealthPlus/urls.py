@@ -1,32 +1,26 @@
-from django.contrib import admin
-from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 from django.conf import settings
-
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Health Plus API",
-      default_version='v1',
-      description="Below, you will find all endpoints and documentation to each of these endpoints",
-    #   terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="adesolaayodeji53@gmail.com"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-   url=settings.SWAGGER_DOCS_BASE_URL,
-)
+from django.urls import path, include
+from User.views import metrics_endpoint
 
 BASE_URL = 'api'
 
 urlpatterns = [
-   path('admin/', admin.site.urls),
    path(f'{BASE_URL}/', include('User.urls')),
-
-   # swagger UI
-   path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-   path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-   path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+   path('metrics', metrics_endpoint, name='metrics'),
 ]
+
+if settings.ADMIN_ENABLED:
+   from django.contrib import admin
+
+   urlpatterns.append(path('admin/', admin.site.urls))
+
+if settings.DOCS_ENABLED:
+   from Utils.openapi import openapi_schema, schema_view, serve_cached_spec
+
+   # swagger UI; the schema itself is generated once per process (or by
+   # `manage.py build_openapi_schema`) and served from Utils.openapi
+   urlpatterns += [
+      path('swagger<format>/', openapi_schema, name='schema-json'),
+      path('', serve_cached_spec(schema_view.with_ui('swagger', cache_timeout=0)), name='schema-swagger-ui'),
+      path('redoc/', serve_cached_spec(schema_view.with_ui('redoc', cache_timeout=0)), name='schema-redoc'),
+   ]
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'User'
+
+    def ready(self):
+        # registers the BlacklistedToken receivers that feed the recent
+        # blacklist, and the system checks of both modules
+        from Utils import blacklist, metrics
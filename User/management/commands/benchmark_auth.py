@@ -0,0 +1,133 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.middleware.csrf import _get_new_csrf_string
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from User.models import User, UserType
+from Utils.benchmark import (
+    SERVERS, Scenario, check_budget, format_summary, run_scenario, seed_students,
+    throwaway_database, unique_ids,
+)
+
+PASSWORD = 'secret123'
+SCENARIOS = ('login', 'login_async', 'register_student', 'register_staff')
+
+
+def parse_concurrency(value):
+    try:
+        levels = [int(level) for level in value.split(',') if level.strip()]
+    except ValueError:
+        raise CommandError("--concurrency must be a comma separated list of numbers")
+    if not levels or min(levels) < 1:
+        raise CommandError("--concurrency levels must be at least 1")
+    return levels
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the login and registration endpoints against a throwaway database "
+        "and fail when an endpoint issues more queries than its budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help="Students to seed before the run.")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per scenario and concurrency level.")
+        parser.add_argument('--concurrency', default='1,4,16', help="Comma separated concurrency levels.")
+        parser.add_argument('--server', choices=sorted(SERVERS), default='client')
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, dest='scenarios')
+        parser.add_argument(
+            '--real-hasher', action='store_true',
+            help="Use the configured password hasher instead of a fast one, so hashing cost is included.",
+        )
+        parser.add_argument(
+            '--no-budget', action='store_true',
+            help="Report query counts without failing on budget regressions.",
+        )
+
+    def handle(self, *args, **options):
+        levels = parse_concurrency(options['concurrency'])
+        if options['users'] < 1 or options['requests'] < 1:
+            raise CommandError("--users and --requests must be at least 1")
+
+        overrides = {
+            'MIDDLEWARE': ['Utils.benchmark.QueryCountMiddleware', *settings.MIDDLEWARE],
+            'ALLOWED_HOSTS': ['*'],
+        }
+        if not options['real_hasher']:
+            overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+            # spawned hash workers would not see the overridden hashers
+            overrides['LOGIN_HASH_EXECUTOR'] = 'thread'
+
+        # failed requests are counted as errors; their tracebacks would bury the report
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        regressions = []
+        with throwaway_database(on_disk=max(levels) > 1), override_settings(**overrides):
+            matric_numbers = seed_students(options['users'], PASSWORD)
+            self.stdout.write(f"Seeded {len(matric_numbers)} students")
+            scenarios = self.build_scenarios(matric_numbers)
+
+            server = SERVERS[options['server']]()
+            try:
+                for name in options['scenarios'] or SCENARIOS:
+                    for concurrency in levels:
+                        summary = run_scenario(server, scenarios[name], options['requests'], concurrency)
+                        self.stdout.write(format_summary(f"{name} x{concurrency}", summary))
+                        regression = check_budget(name, summary)
+                        if regression and regression not in regressions:
+                            regressions.append(regression)
+            finally:
+                server.close()
+
+        if regressions and not options['no_budget']:
+            raise CommandError("Query budget exceeded:\n" + "\n".join(regressions))
+
+    def build_scenarios(self, matric_numbers):
+        year = timezone.now().year
+        new_matric_number = unique_ids(f'BEN/{year % 100:02d}/')
+        new_staff_id = unique_ids('STF/')
+
+        # register_staff is a session-authenticated form post, so every server
+        # kind needs the same cookies a logged in superuser's browser sends
+        admin = User.objects.create_superuser(staff_id='BENCH/ADMIN', password=PASSWORD)
+        client = Client()
+        client.force_login(admin)
+        csrf_token = _get_new_csrf_string()
+        staff_headers = {
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={client.session.session_key}; '
+                      f'{settings.CSRF_COOKIE_NAME}={csrf_token}',
+            'X-CSRFToken': csrf_token,
+        }
+
+        def credentials(i):
+            return {'matric_number': matric_numbers[i % len(matric_numbers)], 'password': PASSWORD}
+
+        def student(i):
+            return {
+                'matric_number': new_matric_number(),
+                'first_name': 'Bench',
+                'last_name': 'Mark',
+                'password': PASSWORD,
+                'confirm_password': PASSWORD,
+            }
+
+        def staff(i):
+            return {
+                'first_name': 'Bench',
+                'last_name': 'Staff',
+                'staff_id': new_staff_id(),
+                'staff_type': UserType.NURSE,
+            }
+
+        return {
+            'login': Scenario('login', reverse('user:login_user'), credentials, 200),
+            'login_async': Scenario('login_async', reverse('user:login_user_async'), credentials, 200),
+            'register_student': Scenario('register_student', reverse('user:register_student'), student, 201),
+            'register_staff': Scenario(
+                'register_staff', reverse('user:register_staff'), staff, 302, form=True, headers=staff_headers,
+            ),
+        }
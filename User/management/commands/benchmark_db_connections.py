@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+
+import dj_database_url
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.utils import ConnectionHandler
+
+from Utils.benchmark import format_summary, summarize
+from Utils.database import POSTGRES_ENGINES, configure_connections, pool_available
+
+MODES = ('per-request', 'persistent', 'pool')
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure what each request pays for its database connection: a new "
+        "connection per request, a persistent one, or a psycopg pool (Postgres only)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument(
+            '--database-url',
+            help="Database to connect to; defaults to DATABASES['default'] "
+                 "(a temporary file when that is SQLite). Only SELECT 1 is run.",
+        )
+        parser.add_argument('--mode', action='append', choices=MODES, dest='modes')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1")
+
+        with tempfile.TemporaryDirectory() as scratch:
+            database = self.database(options['database_url'], scratch)
+            for mode in options['modes'] or MODES:
+                if mode == 'pool' and not (database['ENGINE'] in POSTGRES_ENGINES and pool_available()):
+                    self.stdout.write("pool: skipped, needs Postgres and psycopg[pool]")
+                    continue
+                summary = self.run_mode(database, mode, options['requests'])
+                self.stdout.write(format_summary(mode, summary))
+
+    def database(self, url, scratch):
+        if url:
+            database = dj_database_url.parse(url)
+        else:
+            database = dict(settings.DATABASES['default'])
+        if database['ENGINE'] == 'django.db.backends.sqlite3' and not url:
+            # never create or lock the development database
+            database['NAME'] = os.path.join(scratch, 'connections.sqlite3')
+        return database
+
+    def run_mode(self, database, mode, requests):
+        database = configure_connections(
+            database,
+            conn_max_age=0 if mode == 'per-request' else 600,
+            health_checks=settings.DB_CONN_HEALTH_CHECKS,
+            pool=mode == 'pool',
+            pool_options={
+                'min_size': settings.DB_POOL_MIN_SIZE,
+                'max_size': settings.DB_POOL_MAX_SIZE,
+                'timeout': settings.DB_POOL_TIMEOUT,
+            },
+        )
+        connection = ConnectionHandler({'default': database})['default']
+        latencies = []
+        try:
+            for _ in range(requests):
+                start = time.perf_counter()
+                # what close_old_connections does on request_started and
+                # request_finished, around the request's one query
+                connection.close_if_unusable_or_obsolete()
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                connection.close_if_unusable_or_obsolete()
+                latencies.append(time.perf_counter() - start)
+        finally:
+            connection.close()
+            if mode == 'pool':
+                connection.close_pool()
+        return summarize(latencies, [1] * len(latencies))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from Utils.benchmark import format_summary, run_timed, throwaway_database
+
+
+class Command(BaseCommand):
+    help = "Measure round trips and latency of student registration against a throwaway database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument(
+            '--real-hasher', action='store_true',
+            help="Use the configured password hasher instead of a fast one, so hashing cost is included.",
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        if iterations < 1:
+            raise CommandError("--iterations must be at least 1")
+
+        hashers = {}
+        if not options['real_hasher']:
+            hashers['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+        with throwaway_database(), override_settings(**hashers):
+            client = Client()
+            url = reverse('user:register_student')
+
+            def register(i):
+                response = client.post(url, {
+                    'matric_number': f'BEN/25/{i:06d}',
+                    'first_name': 'Bench',
+                    'last_name': 'Mark',
+                    'password': 'secret123',
+                    'confirm_password': 'secret123',
+                }, content_type='application/json')
+                if response.status_code != 201:
+                    raise CommandError(f"Registration failed: {response.status_code} {response.content!r}")
+
+            summary = run_timed(register, iterations)
+
+        self.stdout.write(format_summary('register_student', summary))
@@ -0,0 +1,86 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from rest_framework.renderers import JSONRenderer
+
+from User.models import User
+from User.serializers import StudentSerializer
+from Utils.benchmark import seed_students, throwaway_database
+from Utils.roster import RosterJSONRenderer, orjson, roster_page, serialize_roster
+
+
+def model_serializer_page(after, page_size):
+    # the same keyset page, through model instances and StudentSerializer
+    queryset = User.objects.all()
+    if after:
+        queryset = queryset.filter(Q(date_joined__gt=after[0]) | Q(id__gt=after[1]), date_joined__gte=after[0])
+    users = list(queryset.order_by('date_joined', 'id')[:page_size])
+    body = JSONRenderer().render(StudentSerializer(users, many=True).data)
+    return body, (users[-1].date_joined, users[-1].pk) if len(users) == page_size else None
+
+
+class Command(BaseCommand):
+    help = (
+        "Page through a seeded roster with StudentSerializer and with the roster's "
+        "values() fast path, and compare rows per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--page-size', type=int, default=500)
+        parser.add_argument('--rounds', type=int, default=5, help="Time each path this many times, keep the best.")
+        parser.add_argument('--min-speedup', type=float, default=0,
+                            help="Fail when the fast path is less than this many times faster.")
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['page_size'], options['rounds']) < 1:
+            raise CommandError("--users, --page-size and --rounds must be at least 1")
+        page_size = options['page_size']
+
+        with throwaway_database():
+            seed_students(options['users'], 'secret123')
+            total = User.objects.count()
+
+            def slow_pass():
+                pages, after = [], None
+                while True:
+                    body, after = model_serializer_page(after, page_size)
+                    pages.append(body)
+                    if after is None:
+                        return pages
+
+            renderer = RosterJSONRenderer()
+
+            def fast_pass():
+                pages, cursor = [], None
+                while True:
+                    rows, cursor = roster_page(cursor=cursor, page_size=page_size)
+                    pages.append(renderer.render(serialize_roster(rows)))
+                    if cursor is None:
+                        return pages
+
+            # best of --rounds, alternating, so a stall on a busy machine
+            # lands on neither side for good
+            slow = fast = float('inf')
+            for _ in range(options['rounds']):
+                start = time.perf_counter()
+                slow_pages = slow_pass()
+                slow = min(slow, time.perf_counter() - start)
+                start = time.perf_counter()
+                fast_pages = fast_pass()
+                fast = min(fast, time.perf_counter() - start)
+
+        slow_rows = [row for body in slow_pages for row in json.loads(body)]
+        fast_rows = [row for body in fast_pages for row in json.loads(body)]
+        if slow_rows != fast_rows:
+            raise CommandError("The roster fast path does not match StudentSerializer")
+
+        self.stdout.write(f"Rendering with {'orjson' if orjson else 'the standard library'}")
+        self.stdout.write(f"StudentSerializer: {total} rows in {slow * 1000:.0f}ms ({total / slow:.0f} rows/s)")
+        self.stdout.write(f"roster fast path:  {total} rows in {fast * 1000:.0f}ms ({total / fast:.0f} rows/s)")
+        speedup = slow / fast
+        self.stdout.write(f"Speedup: {speedup:.1f}x")
+        if speedup < options['min_speedup']:
+            raise CommandError(f"Speedup {speedup:.1f}x is below {options['min_speedup']}x")
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework import serializers
+
+from User.models import User
+from User.serializers import StudentSerializer
+from Utils.benchmark import matric_number
+from Utils.images import thumbnail_transformation
+
+
+class URLBuildingStudentSerializer(StudentSerializer):
+    # what StudentSerializer did before the URLs were stored: build them per row
+    profile_image = serializers.SerializerMethodField()
+    profile_image_thumbnail = serializers.SerializerMethodField()
+
+    def get_profile_image(self, obj):
+        return obj.profile_image.url
+
+    def get_profile_image_thumbnail(self, obj):
+        return obj.profile_image.build_url(**thumbnail_transformation())
+
+
+def build_users(count):
+    # in memory only; serialization is what is being measured
+    field = User._meta.get_field('profile_image')
+    year = timezone.now().year
+    users = []
+    for i in range(count):
+        user = User(
+            matric_number=matric_number(i, year), first_name='Bench', last_name=f'User{i}',
+            serial_number=i + 1, year_of_admission=year, date_joined=timezone.now(),
+            profile_image=field.to_python(f'image/upload/v1/health-plus/user_profile_images/user_{i}.jpg'),
+        )
+        user.update_profile_image_urls()
+        users.append(user)
+    return users
+
+
+class Command(BaseCommand):
+    help = "Time StudentSerializer over many users with stored image URLs against building them per row."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per serializer; the fastest counts.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['repeat'] < 1:
+            raise CommandError("--users and --repeat must be at least 1")
+        users = build_users(options['users'])
+
+        results = {}
+        for label, serializer_class in (('per-row URLs', URLBuildingStudentSerializer), ('stored URLs', StudentSerializer)):
+            best = None
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                data = serializer_class(users, many=True).data
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = (best, data)
+            self.stdout.write(
+                f"{label:<14} {len(users)} users in {best * 1000:.0f}ms "
+                f"({best / len(users) * 1e6:.1f}us per user)"
+            )
+
+        if results['per-row URLs'][1] != results['stored URLs'][1]:
+            raise CommandError("Serializers disagree on the output")
+        self.stdout.write(f"Speedup: {results['per-row URLs'][0] / results['stored URLs'][0]:.1f}x")
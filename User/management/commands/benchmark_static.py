@@ -0,0 +1,89 @@
+import re
+import time
+from http.client import HTTPConnection
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Utils.benchmark import percentile, throwaway_database, WSGIServerThread
+
+ASSET_URL = re.compile(r'(?:src|href)="([^"]+)"')
+ACCEPT_COMPRESSED = {'Accept-Encoding': 'br, gzip'}
+
+
+def fetch(port, path, headers=None):
+    # (response, body, seconds until the status line and headers arrived)
+    conn = HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        start = time.perf_counter()
+        conn.request('GET', path, headers={'Host': 'testserver', **(headers or {})})
+        response = conn.getresponse()
+        ttfb = time.perf_counter() - start
+        return response, response.read(), ttfb
+    finally:
+        conn.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the admin and API docs pages with their static assets through a real "
+        "server and report bytes transferred, first and repeat visit, and time to first byte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visits', type=int, default=20, help="First visits per page, for the timings.")
+
+    def handle(self, *args, **options):
+        if options['visits'] < 1:
+            raise CommandError("--visits must be at least 1")
+        pages = {}
+        if settings.ADMIN_ENABLED:
+            pages['admin'] = '/admin/login/'
+        if settings.DOCS_ENABLED:
+            pages['swagger'] = '/'
+            pages['redoc'] = '/redoc/'
+        if not pages:
+            raise CommandError("Neither the admin nor the API docs are enabled")
+
+        with throwaway_database():
+            server = WSGIServerThread()
+            try:
+                for name, path in pages.items():
+                    self.stdout.write(self.visit(server.port, name, path, options['visits']))
+            finally:
+                server.close()
+
+    def visit(self, port, name, path, visits):
+        response, html, _ = fetch(port, path, ACCEPT_COMPRESSED)
+        if response.status != 200:
+            raise CommandError(f"{path} returned {response.status}")
+        static_url = settings.STATIC_URL
+        assets = sorted({url for url in ASSET_URL.findall(html.decode()) if url.startswith(static_url)})
+
+        ttfbs = []
+        for _ in range(visits):
+            wire, plain, repeat, revalidated, immutable = 0, 0, 0, 0, 0
+            for url in [path, *assets]:
+                response, body, ttfb = fetch(port, url, ACCEPT_COMPRESSED)
+                ttfbs.append(ttfb)
+                wire += len(body)
+                plain += len(fetch(port, url)[1])
+                if url == path:
+                    # the page itself is never cached
+                    repeat += len(body)
+                    continue
+                if 'immutable' in (response.getheader('Cache-Control') or ''):
+                    immutable += 1
+                    continue
+                # a returning browser revalidates everything not marked immutable
+                conditions = {'If-None-Match': response.getheader('ETag') or '',
+                              'If-Modified-Since': response.getheader('Last-Modified') or ''}
+                repeat += len(fetch(port, url, {**ACCEPT_COMPRESSED, **conditions})[1])
+                revalidated += 1
+
+        return (
+            f"{name}: {len(assets)} assets ({immutable} immutable), "
+            f"first visit {wire / 1024:.1f} KB on the wire ({plain / 1024:.1f} KB uncompressed), "
+            f"repeat visit {repeat / 1024:.1f} KB in {revalidated + 1} requests, "
+            f"TTFB p50 {percentile(ttfbs, 50) * 1000:.2f}ms p95 {percentile(ttfbs, 95) * 1000:.2f}ms"
+        )
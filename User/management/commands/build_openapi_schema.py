@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Utils.openapi import write_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema, with gzip (and brotli) copies, into "
+        "OPENAPI_SCHEMA_DIR for the workers to serve. Run on every deploy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Directory to write to; defaults to OPENAPI_SCHEMA_DIR.")
+
+    def handle(self, *args, **options):
+        directory = options['output'] or settings.OPENAPI_SCHEMA_DIR
+        if not directory:
+            raise CommandError("Set OPENAPI_SCHEMA_DIR or pass --output")
+        for name, body in write_schema(directory).items():
+            sizes = ', '.join(f'{encoding} {len(data)}' for encoding, data in sorted(body.encoded.items()))
+            self.stdout.write(f"{name}: {len(body.content)} bytes ({sizes}), ETag {body.etag}")
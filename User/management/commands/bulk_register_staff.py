@@ -0,0 +1,74 @@
+import io
+import json
+import sys
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Utils.bulk import StaffImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Register staff in bulk from a CSV (with a header row) or JSONL file, with an "
+        "optional zip of ID card images. Columns: staff_id, first_name, middle_name, "
+        "last_name, staff_type, and optionally staff_id_img (file name inside the zip). "
+        "Existing staff IDs are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or - for stdin.")
+        parser.add_argument('--images', help="Zip archive of staff ID card images.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension, else csv.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--upload-workers', type=int, default=8, help="Concurrent image uploads.")
+        parser.add_argument('--errors', help="Write per-row errors to this JSONL file instead of stdout.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        if options['batch_size'] < 1 or options['upload_workers'] < 1:
+            raise CommandError("--batch-size and --upload-workers must be at least 1")
+
+        images = None
+        if options['images']:
+            try:
+                images = zipfile.ZipFile(options['images'])
+            except (OSError, zipfile.BadZipFile) as e:
+                raise CommandError(f"Cannot read {options['images']}: {e}")
+
+        if options['path'] == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+        else:
+            try:
+                stream = open(options['path'], encoding='utf-8-sig', newline='')
+            except OSError as e:
+                raise CommandError(str(e))
+
+        def progress(result):
+            self.stdout.write(
+                f"created {result.created}, skipped {result.skipped}, "
+                f"images {result.images_uploaded}, failed {len(result.errors)}"
+            )
+
+        importer = StaffImporter(
+            batch_size=options['batch_size'],
+            upload_workers=options['upload_workers'],
+            progress=progress if options['verbosity'] >= 1 else None,
+        )
+        with stream:
+            result = importer.run(read_rows(stream, fmt), images)
+        if images is not None:
+            images.close()
+
+        if options['errors']:
+            with open(options['errors'], 'w', encoding='utf-8') as errors_file:
+                for error in result.errors:
+                    errors_file.write(json.dumps(error) + '\n')
+        else:
+            for error in result.errors:
+                self.stderr.write(f"row {error['row']} ({error['staff_id']}): {error['message']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Registered {result.created} staff, skipped {result.skipped} existing, "
+            f"uploaded {result.images_uploaded} ID images, {len(result.errors)} rows failed."
+        ))
@@ -0,0 +1,60 @@
+import io
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Utils.bulk import StudentImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Register students in bulk from a CSV (with a header row) or JSONL file. "
+        "Columns: matric_number, first_name, middle_name, last_name, password, "
+        "and optionally year_of_admission and serial_number."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or - for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension, else csv.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, help="Password hashing workers (default: CPU count).")
+        parser.add_argument('--executor', choices=['process', 'thread'], default='process')
+        parser.add_argument('--errors', help="Write per-row errors to this JSONL file instead of stdout.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        if options['path'] == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+        else:
+            try:
+                stream = open(options['path'], encoding='utf-8-sig', newline='')
+            except OSError as e:
+                raise CommandError(str(e))
+
+        def progress(result):
+            self.stdout.write(f"created {result.created}, failed {len(result.errors)}")
+
+        importer = StudentImporter(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            executor=options['executor'],
+            progress=progress if options['verbosity'] >= 1 else None,
+        )
+        with stream:
+            result = importer.run(read_rows(stream, fmt))
+
+        if options['errors']:
+            with open(options['errors'], 'w', encoding='utf-8') as errors_file:
+                for error in result.errors:
+                    errors_file.write(json.dumps(error) + '\n')
+        else:
+            for error in result.errors:
+                self.stderr.write(f"row {error['row']} ({error['matric_number']}): {error['message']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Registered {result.created} students, {len(result.errors)} rows failed."
+        ))
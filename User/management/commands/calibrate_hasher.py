@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Utils.hashers import HASHER_CLASSES, calibrate, time_hash
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark password hashing on this machine and print the PASSWORD_* settings "
+        "that bring one hash closest to the target time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--algorithm', choices=sorted(HASHER_CLASSES), default=None,
+                            help="Defaults to the configured PASSWORD_HASHER.")
+        parser.add_argument('--target-ms', type=float, default=250,
+                            help="Wanted time for one hash, in milliseconds.")
+        parser.add_argument('--samples', type=int, default=3,
+                            help="Hashes timed per setting; the fastest counts.")
+
+    def handle(self, *args, **options):
+        algorithm = options['algorithm'] or settings.PASSWORD_HASHER
+        if options['target_ms'] <= 0 or options['samples'] < 1:
+            raise CommandError("--target-ms and --samples must be positive")
+        target = options['target_ms'] / 1000
+
+        current = time_hash(settings.PASSWORD_HASHER, {}, options['samples'])
+        self.stdout.write(
+            f"Configured {settings.PASSWORD_HASHER}: {current * 1000:.0f}ms per hash "
+            f"({1 / current:.1f} logins/s per core)"
+        )
+
+        try:
+            params, seconds = calibrate(algorithm, target, options['samples'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Calibrated {algorithm}: {seconds * 1000:.0f}ms per hash "
+            f"({1 / seconds:.1f} logins/s per core), target {options['target_ms']:.0f}ms"
+        )
+        self.stdout.write("Add to the environment:")
+        self.stdout.write(f"PASSWORD_HASHER={algorithm}")
+        for name, value in params.items():
+            self.stdout.write(f"{name}={value}")
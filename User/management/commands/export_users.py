@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from User.models import User, UserType
+from Utils.export import EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = "Dump users to CSV or JSONL with constant memory, regardless of table size."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help="File to write to (default: stdout).")
+        parser.add_argument('--user-type', choices=UserType.list())
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        queryset = User.objects.all()
+        if options['user_type']:
+            queryset = queryset.filter(user_type=options['user_type'])
+
+        chunks = iter_export(options['format'], queryset, chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from Utils.uploads import drain_image_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Make one upload attempt for every pending profile or staff ID image, "
+        "e.g. after a restart dropped the in-process queue or the storage backend was down."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help="Also retry uploads that ran out of attempts.",
+        )
+
+    def handle(self, *args, **options):
+        uploaded, pending, failed = drain_image_uploads(retry_failed=options['retry_failed'])
+        self.stdout.write(f"Uploaded {uploaded} images, {pending} still pending, {failed} failed.")
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Utils.boot import measure_boot
+
+
+class Command(BaseCommand):
+    help = (
+        "Boot the app in a fresh interpreter, as a gunicorn worker would, and "
+        "report the time and memory it took and the modules that cost the most to import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help="Number of modules (or packages) to list.")
+        parser.add_argument('--by-package', action='store_true',
+                            help="Add up each top-level package's own import time instead.")
+        parser.add_argument('--api-only', action='store_true',
+                            help="Boot with ADMIN_ENABLED and DOCS_ENABLED off.")
+        parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                            help="Extra environment for the booted interpreter.")
+
+    def handle(self, *args, **options):
+        env = {}
+        if options['api_only']:
+            env.update(ADMIN_ENABLED='False', DOCS_ENABLED='False')
+        for item in options['env']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"--env takes NAME=VALUE, not {item!r}")
+            env[name] = value
+
+        try:
+            profile = measure_boot(env, importtime=True)
+        except RuntimeError as error:
+            raise CommandError(str(error))
+
+        # -X importtime adds its own overhead to the wall time
+        self.stdout.write(
+            f"boot: {profile.seconds * 1000:.0f} ms, max RSS {profile.rss_mb:.1f} MB, "
+            f"{len(profile.modules)} modules"
+        )
+        if options['by_package']:
+            rows = sorted(profile.by_package().items(), key=lambda item: item[1], reverse=True)
+            for package, self_us in rows[:options['top']]:
+                self.stdout.write(f"{self_us / 1000:9.1f} ms  {package}")
+            return
+
+        self.stdout.write(f"{'cumulative':>12} {'self':>9}  module (imported by)")
+        costs = sorted(profile.imports, key=lambda cost: cost.cumulative_us, reverse=True)
+        for cost in costs[:options['top']]:
+            self.stdout.write(
+                f"{cost.cumulative_us / 1000:9.1f} ms {cost.self_us / 1000:6.1f} ms  "
+                f"{cost.module} ({cost.imported_by or '-'})"
+            )
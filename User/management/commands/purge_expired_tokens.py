@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Utils.blacklist import get_recent_blacklist, purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding and blacklisted JWTs in bounded batches, and "
+        "load the live blacklist into TOKEN_BLACKLIST_CACHE if that has gone cold. "
+        "Run it from cron, or with --every to keep it running as a periodic task."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches per run.")
+        parser.add_argument('--every', type=int, help="Repeat every N seconds instead of exiting.")
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = purge_expired_tokens(
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches'],
+            )
+            self.stdout.write(f"Deleted {deleted} expired tokens.")
+            blacklist = get_recent_blacklist()
+            if blacklist.shared is not None and not blacklist.shared.get(blacklist.WARM_KEY):
+                loaded = blacklist.warm(batch_size=options['batch_size'])
+                self.stdout.write(f"Loaded {loaded} blacklisted tokens into the cache.")
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from User.models import User
+from Utils.images import refresh_profile_image_urls
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the stored profile image and thumbnail URLs, e.g. after changing "
+        "PROFILE_IMAGE_THUMBNAIL_SIZE or the Cloudinary account."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        updated = refresh_profile_image_urls(User.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(f"Refreshed profile image URLs of {updated} users.")
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:52
+
+from django.db import migrations, models
+
+
+def seed_serial_counters(apps, schema_editor):
+    User = apps.get_model('User', 'User')
+    SerialCounter = apps.get_model('User', 'SerialCounter')
+    last_values = (
+        User.objects.using(schema_editor.connection.alias)
+        .filter(user_type='student')
+        .values('year_of_admission')
+        .annotate(last_value=models.Max('serial_number'))
+    )
+    SerialCounter.objects.using(schema_editor.connection.alias).bulk_create([
+        SerialCounter(year_of_admission=row['year_of_admission'], last_value=row['last_value'] or 0)
+        for row in last_values
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User', '0004_alter_user_date_joined_alter_user_is_active_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerialCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year_of_admission', models.IntegerField(unique=True)),
+                ('last_value', models.IntegerField(default=0, help_text='Last serial number handed out to a student of this year.')),
+            ],
+        ),
+        migrations.RunPython(seed_serial_counters, migrations.RunPython.noop),
+    ]
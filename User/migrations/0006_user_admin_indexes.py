@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:57
+
+from django.db import DatabaseError, migrations, models, transaction
+
+# Columns in UserAdmin.search_fields. The admin's icontains search compiles to
+# UPPER("col"::text) LIKE UPPER('%term%') on Postgres, which a trigram index on
+# the same expression can serve; other databases keep scanning for now.
+TRIGRAM_SEARCH_COLUMNS = ['matric_number', 'first_name', 'middle_name', 'last_name']
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('User', 'User')._meta.db_table
+    try:
+        # needs CREATE privilege on the database; skip quietly without it
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        return
+    for column in TRIGRAM_SEARCH_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "user_{column}_trgm_idx" ON "{table}" '
+            f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in TRIGRAM_SEARCH_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "user_{column}_trgm_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User', '0005_serialcounter'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['user_type', '-id'], name='user_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_staff', True), ('verified_staff', False)), fields=['-id'], name='user_unverified_staff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_staff', True)), fields=['-id'], name='user_staff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['-id'], name='user_inactive_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
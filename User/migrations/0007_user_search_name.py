@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:59
+
+from django.db import DatabaseError, migrations, models, transaction
+
+from Utils.text import normalize_search_text
+
+
+def backfill_search_name(apps, schema_editor):
+    User = apps.get_model('User', 'User')
+    users = User.objects.using(schema_editor.connection.alias)
+    batch = []
+    for user in users.only('first_name', 'middle_name', 'last_name').iterator(chunk_size=2000):
+        names = [user.first_name, user.middle_name, user.last_name]
+        user.search_name = normalize_search_text(' '.join(name for name in names if name))[:100]
+        batch.append(user)
+        if len(batch) >= 2000:
+            users.bulk_update(batch, ['search_name'])
+            batch = []
+    if batch:
+        users.bulk_update(batch, ['search_name'])
+
+
+def create_trigram_index(apps, schema_editor):
+    # word-prefix matches after the first name ("... doe%") are LIKE '% doe%'
+    # on search_name; on Postgres a trigram index serves those as well
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('User', 'User')._meta.db_table
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS "user_search_name_trgm_idx" ON "{table}" '
+        'USING gin ("search_name" gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS "user_search_name_trgm_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User', '0006_user_admin_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='search_name',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Normalised full name used by the user search, kept in sync on save.', max_length=100),
+        ),
+        migrations.RunPython(backfill_search_name, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['search_name', 'id'], name='user_search_name_idx', opclasses=['varchar_pattern_ops', 'int8_ops']),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
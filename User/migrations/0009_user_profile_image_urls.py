@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:22
+
+from django.db import migrations, models
+
+from Utils.images import refresh_profile_image_urls
+
+
+def backfill_profile_image_urls(apps, schema_editor):
+    User = apps.get_model('User', 'User')
+    refresh_profile_image_urls(User.objects.using(schema_editor.connection.alias))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User', '0008_imageupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_image_thumbnail_url',
+            field=models.URLField(blank=True, default='', editable=False, help_text='Delivery URL of the profile image thumbnail, kept in sync on save.', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_image_url',
+            field=models.URLField(blank=True, default='', editable=False, help_text='Delivery URL of the profile image, kept in sync on save.', max_length=500),
+        ),
+        migrations.RunPython(backfill_profile_image_urls, migrations.RunPython.noop),
+    ]
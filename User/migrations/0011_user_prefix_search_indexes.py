@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:12
+
+from django.db import migrations
+
+# Indexes for the search's prefix lookups that a plain btree cannot serve.
+# Postgres compiles istartswith to UPPER(col::text) LIKE UPPER('x%'), so
+# matric numbers and staff ids get UPPER() expression indexes with pattern
+# ops. SQLite's LIKE is case-insensitive and only uses NOCASE indexes, which
+# covers search_name's startswith too.
+POSTGRES_INDEXES = {
+    'user_matric_number_prefix_idx': '(UPPER("matric_number"::text) text_pattern_ops)',
+    'user_staff_id_prefix_idx': '(UPPER("staff_id"::text) text_pattern_ops)',
+}
+SQLITE_INDEXES = {
+    'user_matric_number_prefix_idx': '("matric_number" COLLATE NOCASE)',
+    'user_staff_id_prefix_idx': '("staff_id" COLLATE NOCASE)',
+    'user_search_name_prefix_idx': '("search_name" COLLATE NOCASE, "id")',
+}
+
+
+def vendor_indexes(schema_editor):
+    return {
+        'postgresql': POSTGRES_INDEXES,
+        'sqlite': SQLITE_INDEXES,
+    }.get(schema_editor.connection.vendor, {})
+
+
+def create_prefix_indexes(apps, schema_editor):
+    table = apps.get_model('User', 'User')._meta.db_table
+    for name, columns in vendor_indexes(schema_editor).items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" {columns}')
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    for name in vendor_indexes(schema_editor):
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User', '0010_user_date_joined_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
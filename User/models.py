@@ -1,11 +1,16 @@
-from django.db import models
+from django.db import models, router
 from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin
 )
 from cloudinary.models import CloudinaryField
 from django.utils import timezone
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from Utils.authentication import restore_user_tokens, revocation_cache, revoke_user_tokens
+from Utils.credential_cache import get_credential_cache
+from Utils.images import PROFILE_IMAGE_URL_FIELDS, profile_image_urls
+from Utils.text import normalize_search_text
+from Utils.tokens import issue_tokens
 
 
 class UserType:
@@ -28,7 +33,35 @@ USER_TYPE_CHOICES = [
 ]
 
 
-class CustomUserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    # update() and bulk_update() skip save(), which is where a deactivation
+    # revokes the user's access tokens; these do the same for whole querysets
+
+    def update(self, **kwargs):
+        if 'is_active' not in kwargs or revocation_cache() is None:
+            return super().update(**kwargs)
+        # read where the update writes, not from a replica that may lag
+        db = self._db or router.db_for_write(self.model, **self._hints)
+        ids = list(self.using(db).values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        inactive = set(
+            self.model._base_manager.using(db)
+            .filter(pk__in=ids, is_active=False)
+            .values_list('pk', flat=True)
+        )
+        revoke_user_tokens(*inactive)
+        restore_user_tokens(*(pk for pk in ids if pk not in inactive))
+        return rows
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if 'is_active' in fields:
+            revoke_user_tokens(*(obj.pk for obj in objs if not obj.is_active))
+            restore_user_tokens(*(obj.pk for obj in objs if obj.is_active))
+        return rows
+
+
+class CustomUserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, matric_number=None, password=None, **extra_fields):
         user = self.model(matric_number=matric_number, **extra_fields)
         if password:
@@ -83,6 +116,20 @@ class User(AbstractBaseUser, PermissionsMixin):
         folder='health-plus/user_profile_images/',
         help_text="User's profile image."
     )
+    profile_image_url = models.URLField(
+        max_length=500,
+        blank=True,
+        default='',
+        editable=False,
+        help_text="Delivery URL of the profile image, kept in sync on save."
+    )
+    profile_image_thumbnail_url = models.URLField(
+        max_length=500,
+        blank=True,
+        default='',
+        editable=False,
+        help_text="Delivery URL of the profile image thumbnail, kept in sync on save."
+    )
 
     staff_id = models.CharField(
         max_length=20,
@@ -113,11 +160,113 @@ class User(AbstractBaseUser, PermissionsMixin):
     )
     date_joined = models.DateTimeField(auto_now_add=True, help_text="Date user joined.")
 
+    search_name = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        editable=False,
+        help_text="Normalised full name used by the user search, kept in sync on save."
+    )
+
     objects = CustomUserManager()
 
+    class Meta:
+        # Match the UserAdmin list filters; trailing -id lets the changelist's
+        # default "-pk" ordering be read straight off the index. Boolean filters
+        # compile to bare "WHERE is_staff AND NOT verified_staff", which only a
+        # partial index can serve on every backend, and the rare side of each
+        # flag is the one anyone filters for.
+        indexes = [
+            models.Index(fields=['user_type', '-id'], name='user_type_idx'),
+            models.Index(
+                fields=['-id'], name='user_unverified_staff_idx',
+                condition=models.Q(is_staff=True, verified_staff=False),
+            ),
+            models.Index(fields=['-id'], name='user_staff_idx', condition=models.Q(is_staff=True)),
+            models.Index(fields=['-id'], name='user_inactive_idx', condition=models.Q(is_active=False)),
+            # also the keyset the roster pages through
+            models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+            # pattern ops let Postgres serve LIKE 'prefix%' whatever the collation
+            models.Index(
+                fields=['search_name', 'id'], name='user_search_name_idx',
+                opclasses=['varchar_pattern_ops', 'int8_ops'],
+            ),
+            # the search's case-insensitive prefix indexes differ per backend,
+            # see migration 0011_user_prefix_search_indexes
+        ]
+
     USERNAME_FIELD = 'matric_number'
     REQUIRED_FIELDS = ['first_name', 'last_name']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_credentials = (
+            instance.__dict__.get('matric_number'), instance.__dict__.get('staff_id')
+        )
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.update_search_name()
+        update_fields = kwargs.get('update_fields')
+        image_changed = update_fields is None or 'profile_image' in update_fields
+        if image_changed:
+            self.update_profile_image_urls()
+        if update_fields is not None:
+            synced = set()
+            if {'first_name', 'middle_name', 'last_name'} & set(update_fields):
+                synced.add('search_name')
+            if image_changed:
+                synced.update(PROFILE_IMAGE_URL_FIELDS)
+            if synced:
+                kwargs['update_fields'] = {*update_fields, *synced}
+        uploading = image_changed and isinstance(self.profile_image, UploadedFile)
+        super().save(*args, **kwargs)
+        if uploading:
+            # the field only turned into a Cloudinary resource during the save
+            self.update_profile_image_urls()
+            User.objects.filter(pk=self.pk).update(
+                **{name: getattr(self, name) for name in PROFILE_IMAGE_URL_FIELDS}
+            )
+        self.invalidate_cached_credentials()
+        if not self.is_active:
+            revoke_user_tokens(self.pk)
+        elif getattr(self, '_loaded_is_active', True) is False:
+            restore_user_tokens(self.pk)
+        self._loaded_is_active = self.is_active
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.invalidate_cached_credentials()
+        return result
+
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        self.invalidate_cached_credentials()
+
+    def invalidate_cached_credentials(self):
+        # also drop the identifiers the row was loaded with, in case the matric
+        # number or staff id has just been changed
+        credential_cache = get_credential_cache()
+        current = (self.matric_number, self.staff_id)
+        loaded = getattr(self, '_loaded_credentials', current)
+        credential_cache.invalidate(*current)
+        if loaded != current:
+            credential_cache.invalidate(*loaded)
+        self._loaded_credentials = current
+
+    def update_profile_image_urls(self):
+        image = self.profile_image
+        if isinstance(image, str) and image:
+            image = self._meta.get_field('profile_image').to_python(image)
+        for name, url in profile_image_urls(image).items():
+            setattr(self, name, url)
+
+    def update_search_name(self):
+        # also call this before bulk_create(), which skips save()
+        self.search_name = normalize_search_text(self.get_full_name())[:100]
+
     def get_full_name(self):
         names = [self.first_name]
         if self.middle_name:
@@ -126,18 +275,60 @@ class User(AbstractBaseUser, PermissionsMixin):
         return " ".join(names).strip()
 
     def auth_tokens(self):
-        refresh = RefreshToken.for_user(self)
-        self.last_login = timezone.now()
-        self.save()
-        return {
-            "access": str(refresh.access_token),
-            "refresh": str(refresh)
-        }
+        return issue_tokens(self)
 
     def user_profile_image(self):
-        if self.profile_image:
-            return self.profile_image.url
-        return settings.DEFAULT_USER_PROFILE_IMAGE
+        return self.profile_image_url or settings.DEFAULT_USER_PROFILE_IMAGE
+
+    def user_profile_image_thumbnail(self):
+        return self.profile_image_thumbnail_url or settings.DEFAULT_USER_PROFILE_IMAGE
+
+    def __str__(self):
+        return self.get_full_name()
+
+
+class SerialCounter(models.Model):
+    year_of_admission = models.IntegerField(unique=True)
+    last_value = models.IntegerField(
+        default=0,
+        help_text="Last serial number handed out to a student of this year."
+    )
+
+    def __str__(self):
+        return f"{self.year_of_admission}: {self.last_value}"
+
+
+class ImageUploadStatus:
+    PENDING = 'pending'
+    FAILED = 'failed'
+
+
+IMAGE_UPLOAD_FIELD_CHOICES = [
+    ('profile_image', 'Profile image'),
+    ('staff_id_img', 'Staff ID image'),
+]
+
+
+class ImageUpload(models.Model):
+    # An image staged on local disk until the upload queue (Utils/uploads.py)
+    # has pushed it to storage and set it on the user; the row is removed then.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='image_uploads')
+    field = models.CharField(max_length=20, choices=IMAGE_UPLOAD_FIELD_CHOICES)
+    staged_path = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, help_text="Original file name.")
+    status = models.CharField(
+        max_length=10,
+        choices=[(ImageUploadStatus.PENDING, 'Pending'), (ImageUploadStatus.FAILED, 'Failed')],
+        default=ImageUploadStatus.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='image_upload_status_idx'),
+        ]
 
     def __str__(self):
-        return self.get_full_name()
\ No newline at end of file
+        return f"{self.field} for user {self.user_id} ({self.status})"
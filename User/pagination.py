@@ -0,0 +1,8 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UserSearchPagination(CursorPagination):
+    ordering = ('search_name', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
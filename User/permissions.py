@@ -0,0 +1,23 @@
+from rest_framework.permissions import BasePermission
+from .models import UserType
+
+
+class IsSuperUser(BasePermission):
+    message = "Only administrators can perform this action."
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.is_superuser)
+
+
+class IsClinicStaff(BasePermission):
+    message = "Only clinic staff can perform this action."
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        # user_type first: it is a token claim, the staff flags need the user row
+        return bool(
+            user.user_type in (UserType.DOCTOR, UserType.NURSE, UserType.PHARMACIST, UserType.ADMIN)
+            or user.is_staff or user.is_superuser
+        )
@@ -3,15 +3,19 @@ from .models import User
 
 class StudentSerializer(serializers.ModelSerializer):
 
-    profile_image = serializers.SerializerMethodField()
+    # both read the URLs stored when the image was uploaded
+    profile_image = serializers.CharField(source='user_profile_image', read_only=True)
+    profile_image_thumbnail = serializers.CharField(source='user_profile_image_thumbnail', read_only=True)
 
     class Meta:
         model = User
         fields = [
             'matric_number', 'first_name', 'last_name', 'middle_name',
             'user_type', 'serial_number', 'year_of_admission', 'profile_image',
-            'date_joined'
+            'profile_image_thumbnail', 'date_joined'
         ]
 
-    def get_profile_image(self, obj):
-        return obj.user_profile_image()
\ No newline at end of file
+class UserSearchSerializer(StudentSerializer):
+
+    class Meta(StudentSerializer.Meta):
+        fields = StudentSerializer.Meta.fields + ['staff_id']
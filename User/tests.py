@@ -1,3 +1,1853 @@
-from django.test import TestCase
+import asyncio
+import gc
+import time
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import io
+import json
+import os
+import re
+import runpy
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import StreamingHttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.db import DataError, IntegrityError, OperationalError, connection, connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from cloudinary import CloudinaryResource
+
+from .models import ImageUpload, ImageUploadStatus, SerialCounter, User, UserType
+from .serializers import StudentSerializer
+from Utils.credential_cache import get_credential_cache
+from Utils.database import configure_connections
+from Utils.hashers import calibrate, needs_rehash
+from Utils.hashing import HashPool, HashPoolSaturated, get_hash_pool
+from Utils import metrics, registration
+from Utils import openapi as openapi_cache
+from Utils.benchmark import (
+    QUERY_BUDGETS, ClientServer, Scenario, check_budget, matric_number, run_scenario, seed_students,
+)
+from Utils.bulk import StaffImporter, StudentImporter, read_rows
+from Utils.boot import measure_boot, parse_importtime
+from Utils.changelist import ChangelistPaginator, estimated_count, keyset_columns
+from Utils.blacklist import CachedBlacklistRefreshToken, get_recent_blacklist, purge_expired_tokens
+from Utils.authentication import ClaimsJWTAuthentication, ClaimsTokenUser, check_revocation_cache
+from Utils.search import SearchTimeout, query_deadline
+from Utils.serials import BlockSerialAllocator, get_serial_allocator
+from Utils.routers import ReplicaRouter, RoutingState, _state as routing_state, routing_stats
+from Utils.throttle import check_login_throttle, get_login_throttle, record_login_result
+from Utils.tokens import issue_tokens
+from Utils.uploads import UploadQueue, process_image_upload, stage_image_upload
+from Utils.user import authenticate
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    LOGIN_HASH_EXECUTOR='thread',
+    LOGIN_HASH_WORKERS=2,
+    LOGIN_HASH_MAX_QUEUE=2,
+)
+class AsyncLoginTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            matric_number='CSC/20/0001',
+            password='secret123',
+            first_name='John',
+            last_name='Doe',
+        )
+        cls.url = reverse('user:login_user_async')
+
+    async def test_login_success(self):
+        response = await self.async_client.post(
+            self.url,
+            {'matric_number': 'CSC/20/0001', 'password': 'secret123'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['data']['user']['matric_number'], 'CSC/20/0001')
+        self.assertIn('access', body['data']['tokens'])
+
+    async def test_login_wrong_password(self):
+        response = await self.async_client.post(
+            self.url,
+            {'matric_number': 'CSC/20/0001', 'password': 'wrong'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_login_missing_fields(self):
+        response = await self.async_client.post(
+            self.url, {'matric_number': 'CSC/20/0001'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_login_with_form_data(self):
+        response = await self.async_client.post(self.url, {'matric_number': 'CSC/20/0001', 'password': 'secret123'})
+        self.assertEqual(response.status_code, 200)
+
+    async def test_login_malformed_json(self):
+        for body in ('{"matric_number": ', '["CSC/20/0001"]'):
+            response = await self.async_client.post(self.url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    async def test_login_rejected_when_pool_saturated(self):
+        pool = get_hash_pool()
+        with mock.patch.object(pool, 'reserve', side_effect=HashPoolSaturated):
+            response = await self.async_client.post(
+                self.url,
+                {'matric_number': 'CSC/20/0001', 'password': 'secret123'},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class HashPoolTests(TestCase):
+
+    def test_reserve_applies_queue_backpressure(self):
+        pool = HashPool(workers=1, max_queue=1, executor='thread')
+        pool.reserve()
+        pool.reserve()
+        with self.assertRaises(HashPoolSaturated):
+            pool.reserve()
+        pool.release()
+        pool.reserve()
+        self.assertEqual(pool.in_flight, 2)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class CredentialCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            matric_number='CSC/20/0002',
+            password='secret123',
+            first_name='Jane',
+            last_name='Doe',
+        )
+
+    def setUp(self):
+        get_credential_cache().clear()
+        cache.clear()
+
+    def test_unknown_matric_number_is_negatively_cached(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(authenticate(matric_number='CSC/99/9999', password='x'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(authenticate(matric_number='CSC/99/9999', password='x'))
+
+    def test_wrong_password_is_rejected_from_cache(self):
+        self.assertIsNone(authenticate(matric_number='CSC/20/0002', password='wrong'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(authenticate(matric_number='CSC/20/0002', password='wrong'))
+        self.assertEqual(authenticate(matric_number='CSC/20/0002', password='secret123'), self.student)
+
+    def test_negative_entry_cleared_when_user_is_created(self):
+        self.assertIsNone(authenticate(matric_number='CSC/20/0003', password='secret123'))
+        User.objects.create_user(
+            matric_number='CSC/20/0003', password='secret123', first_name='A', last_name='B'
+        )
+        self.assertIsNotNone(authenticate(matric_number='CSC/20/0003', password='secret123'))
+
+    def test_password_change_invalidates_entry(self):
+        self.assertIsNotNone(authenticate(matric_number='CSC/20/0002', password='secret123'))
+        user = User.objects.get(pk=self.student.pk)
+        user.set_password('changed456')
+        user.save()
+        self.assertIsNone(authenticate(matric_number='CSC/20/0002', password='secret123'))
+        self.assertIsNotNone(authenticate(matric_number='CSC/20/0002', password='changed456'))
+
+    def test_matric_number_change_invalidates_old_identifier(self):
+        self.assertIsNotNone(authenticate(matric_number='CSC/20/0002', password='secret123'))
+        user = User.objects.get(pk=self.student.pk)
+        user.matric_number = 'CSC/20/0004'
+        user.save()
+        self.assertIsNone(authenticate(matric_number='CSC/20/0002', password='secret123'))
+
+    def test_password_changed_on_another_worker(self):
+        self.assertIsNotNone(authenticate(matric_number='CSC/20/0002', password='secret123'))
+        # a queryset update skips save(), like a change made by another worker
+        User.objects.filter(pk=self.student.pk).update(password=make_password('changed456'))
+        self.assertIsNone(authenticate(matric_number='CSC/20/0002', password='secret123'))
+        self.assertIsNotNone(authenticate(matric_number='CSC/20/0002', password='changed456'))
+
+    @override_settings(CREDENTIAL_CACHE_BACKEND='default')
+    def test_shared_backend_serves_other_workers(self):
+        authenticate(matric_number='CSC/99/9999', password='x')
+        # a fresh local layer stands in for another worker process
+        get_credential_cache().clear()
+        with self.assertNumQueries(0):
+            self.assertIsNone(authenticate(matric_number='CSC/99/9999', password='x'))
+
+
+class TokenIssuanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            matric_number='CSC/20/0005', first_name='Ada', last_name='Obi'
+        )
+
+    def test_issue_tokens_only_writes_last_login(self):
+        with CaptureQueriesContext(connection) as ctx:
+            tokens = issue_tokens(self.student)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"last_login"', updates[0])
+        self.assertNotIn('"password"', updates[0])
+
+        refresh = RefreshToken(tokens['refresh'])
+        self.assertEqual(AccessToken(tokens['access'])['user_id'], str(self.student.pk))
+        outstanding = OutstandingToken.objects.get(jti=refresh['jti'])
+        self.assertEqual(outstanding.token, tokens['refresh'])
+        self.student.refresh_from_db()
+        self.assertIsNotNone(self.student.last_login)
+
+    @override_settings(LAST_LOGIN_UPDATE_WINDOW=300)
+    def test_last_login_write_is_coalesced(self):
+        issue_tokens(self.student)
+        with CaptureQueriesContext(connection) as ctx:
+            issue_tokens(self.student)
+        self.assertFalse(any(q['sql'].startswith('UPDATE') for q in ctx.captured_queries))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class RegisterStudentTests(TestCase):
+
+    url = reverse('user:register_student')
+
+    def register(self, matric_number, **extra):
+        data = {
+            'matric_number': matric_number,
+            'first_name': 'Tolu',
+            'last_name': 'Ade',
+            'password': 'secret123',
+            'confirm_password': 'secret123',
+            **extra,
+        }
+        return self.client.post(self.url, data, content_type='application/json')
+
+    def test_register_student_round_trips(self):
+        SerialCounter.objects.create(year_of_admission=timezone.now().year)
+        # BEGIN, counter UPDATE + read-back, INSERT user, COMMIT, INSERT outstanding token
+        with self.assertNumQueries(6):
+            response = self.register('CSC/21/0001')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['user']['serial_number'], 1)
+        self.assertIsNotNone(authenticate(matric_number='CSC/21/0001', password='secret123'))
+
+    def test_serial_numbers_increase(self):
+        self.register('CSC/21/0001')
+        response = self.register('CSC/21/0002')
+        self.assertEqual(response.json()['user']['serial_number'], 2)
+
+    def test_duplicate_matric_number(self):
+        self.register('CSC/21/0001')
+        response = self.register('CSC/21/0001')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], "A user with this matric number exists")
+        self.assertEqual(User.objects.filter(matric_number='CSC/21/0001').count(), 1)
+
+    def test_password_mismatch(self):
+        response = self.register('CSC/21/0001', confirm_password='other')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], "Passwords do not match")
+        self.assertFalse(User.objects.exists())
+
+
+@tag('slow')
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SerialAllocatorStressTests(TransactionTestCase):
+    students = 2000
+    threads = 8
+
+    def register_one(self, matric_number):
+        # SQLite answers contended writes with "table is locked" instead of
+        # waiting like Postgres does, so retry; the student may already be in
+        # if only the token insert after the commit failed.
+        while True:
+            try:
+                if not User.objects.filter(matric_number=matric_number).exists():
+                    registration.register_student({
+                        'matric_number': matric_number,
+                        'first_name': 'Stress',
+                        'last_name': 'Test',
+                        'password': 'secret123',
+                        'confirm_password': 'secret123',
+                    })
+                return
+            except OperationalError:
+                time.sleep(0.001)
+
+    def register_many(self, offset):
+        try:
+            for i in range(offset, self.students, self.threads):
+                self.register_one(f'STR/25/{i:05d}')
+        finally:
+            connections.close_all()
+
+    def assert_unique_serials(self):
+        serials = list(User.objects.values_list('serial_number', flat=True))
+        self.assertEqual(len(serials), self.students)
+        self.assertEqual(len(set(serials)), self.students)
+
+    def test_parallel_registrations_get_unique_gap_free_serials(self):
+        with ThreadPoolExecutor(self.threads) as pool:
+            list(pool.map(self.register_many, range(self.threads)))
+        self.assert_unique_serials()
+        self.assertEqual(
+            sorted(User.objects.values_list('serial_number', flat=True)),
+            list(range(1, self.students + 1)),
+        )
+
+    @override_settings(SERIAL_NUMBER_BLOCK_SIZE=50)
+    def test_parallel_registrations_with_block_reservation(self):
+        self.assertIsInstance(get_serial_allocator(), BlockSerialAllocator)
+        with ThreadPoolExecutor(self.threads) as pool:
+            list(pool.map(self.register_many, range(self.threads)))
+        self.assert_unique_serials()
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, LOGIN_HASH_EXECUTOR='thread')
+class BulkRegisterStudentsTests(TestCase):
+
+    CSV = (
+        "matric_number,first_name,middle_name,last_name,password\n"
+        "BLK/25/0001,Ada,,Obi,secret123\n"
+        "BLK/25/0002,Bola,Ife,Ade,secret123\n"
+        "BLK/25/0002,Dup,,Row,secret123\n"
+        "BLK/25/0003,,,NoFirst,secret123\n"
+        "BLK/25/0004,Chi,,Eze,secret123\n"
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            matric_number='ADMIN/1', password='admin123', first_name='Ad', last_name='Min'
+        )
+        User.objects.create_user(matric_number='BLK/25/0004', first_name='Old', last_name='User')
+
+    def test_command_reports_row_errors_without_aborting(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(self.CSV)
+        self.addCleanup(os.remove, f.name)
+        with tempfile.NamedTemporaryFile('r', suffix='.jsonl') as errors:
+            call_command(
+                'bulk_register_students', f.name, executor='thread', batch_size=2,
+                errors=errors.name, verbosity=0, stdout=io.StringIO(),
+            )
+            failed = [json.loads(line) for line in errors]
+
+        self.assertEqual(
+            sorted(User.objects.filter(matric_number__startswith='BLK/25/').values_list('matric_number', 'serial_number')),
+            [('BLK/25/0001', 1), ('BLK/25/0002', 2), ('BLK/25/0004', 0)],
+        )
+        self.assertEqual([error['row'] for error in failed], [4, 5, 6])
+        self.assertIsNotNone(authenticate(matric_number='BLK/25/0002', password='secret123'))
+
+    def test_api_requires_superuser(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(matric_number='BLK/25/0004'))
+        upload = SimpleUploadedFile('intake.csv', self.CSV.encode())
+        response = client.post(reverse('user:bulk_register_students'), {'file': upload})
+        self.assertEqual(response.status_code, 403)
+
+    def test_api_imports_jsonl(self):
+        lines = "\n".join(json.dumps(row) for row in [
+            {'matric_number': 'BLK/25/0010', 'first_name': 'A', 'last_name': 'B', 'password': 'p'},
+            {'matric_number': 'BLK/25/0011', 'first_name': 'C', 'last_name': 'D'},
+        ])
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        upload = SimpleUploadedFile('intake.jsonl', lines.encode())
+        response = client.post(reverse('user:bulk_register_students'), {'file': upload})
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()['data']
+        self.assertEqual(data['created'], 1)
+        self.assertEqual(data['errors'][0]['message'], "Missing required fields: password")
+
+    def test_overlong_fields_are_row_errors(self):
+        rows = [
+            (1, {'matric_number': 'BLK/25/0020', 'first_name': 'A' * 31, 'last_name': 'B', 'password': 'p'}),
+            (2, {'matric_number': 'BLK/25/' + '0' * 20, 'first_name': 'A', 'last_name': 'B', 'password': 'p'}),
+            (3, {'matric_number': 'BLK/25/0021', 'first_name': 'A', 'last_name': 'B', 'password': 'p'}),
+        ]
+        result = StudentImporter(executor='thread', workers=1).run(rows)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(
+            [error['message'] for error in result.errors],
+            ["first_name must be at most 30 characters", "matric_number must be at most 25 characters"],
+        )
+
+    def test_rows_the_database_refuses_are_reported_one_by_one(self):
+        importer = StudentImporter(executor='thread', workers=1)
+        insert = importer.insert
+
+        def refuse(users):
+            if len(users) > 1:
+                raise IntegrityError('duplicate key')
+            if users[0].matric_number == 'BLK/25/0031':
+                raise DataError('value too long')
+            insert(users)
+
+        rows = [
+            (row_number, {'matric_number': f'BLK/25/003{row_number}', 'first_name': 'A', 'last_name': 'B', 'password': 'p'})
+            for row_number in range(3)
+        ]
+        with mock.patch.object(importer, 'insert', side_effect=refuse):
+            result = importer.run(rows)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([(error['row'], error['matric_number']) for error in result.errors], [(1, 'BLK/25/0031')])
+        self.assertEqual(User.objects.filter(matric_number__in=['BLK/25/0030', 'BLK/25/0032']).count(), 2)
+
+
+class StreamingExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            matric_number='ADMIN/2', password='admin123', first_name='Ad', last_name='Min'
+        )
+        for i in range(5):
+            User.objects.create_user(matric_number=f'EXP/25/{i}', first_name='Ex', last_name=f'Port{i}')
+
+    def test_admin_action_streams_csv(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:User_user_changelist'), {
+            'action': 'stream_export_csv',
+            'select_across': '1',
+            '_selected_action': [self.admin.pk],
+        })
+        self.assertIsInstance(response, StreamingHttpResponse)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('id,matric_number,'))
+        self.assertNotIn('password', lines[0])
+        self.assertEqual(len(lines), 1 + User.objects.count())
+
+    def test_in_memory_export_removed(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:User_user_changelist'))
+        self.assertContains(response, reverse('admin:User_user_import'))
+        self.assertNotContains(response, '/export/')
+        with self.assertRaises(NoReverseMatch):
+            reverse('admin:User_user_export')
+
+    def test_command_writes_jsonl(self):
+        with tempfile.NamedTemporaryFile('r', suffix='.jsonl') as output:
+            call_command('export_users', format='jsonl', output=output.name, chunk_size=2)
+            rows = [json.loads(line) for line in output]
+        self.assertEqual(len(rows), User.objects.count())
+        self.assertEqual(rows[1]['matric_number'], 'EXP/25/0')
+        self.assertIsNone(rows[1]['profile_image'])
+
+
+class AdminChangelistIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            matric_number='ADMIN/3', password='admin123', first_name='Ad', last_name='Min'
+        )
+        User.objects.bulk_create([
+            User(
+                matric_number=f'IDX/25/{i:04d}', first_name='In', last_name=f'Dex{i}',
+                user_type=UserType.list()[i % 4], is_staff=i % 3 == 0, verified_staff=i % 6 == 0,
+            )
+            for i in range(500)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def query_plans(self, query_string):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin:User_user_changelist') + query_string)
+        self.assertEqual(response.status_code, 200)
+
+        table = User._meta.db_table
+        plans = []
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                sql = query['sql']
+                if sql.startswith('SELECT') and f'FROM "{table}"' in sql and 'WHERE' in sql:
+                    cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+                    plans.append((sql, ' '.join(str(part) for row in cursor.fetchall() for part in row)))
+        self.assertTrue(plans)
+        return plans
+
+    def assert_no_full_scan(self, sql, plan):
+        table = User._meta.db_table
+        if connection.vendor == 'sqlite':
+            full_scan = f'SCAN {table}' in plan and 'USING' not in plan
+        else:
+            full_scan = f'Seq Scan on "{table}"' in plan or f'Seq Scan on {table}' in plan
+        self.assertFalse(full_scan, f'{sql}\n{plan}')
+
+    def assert_no_full_scans(self, query_string):
+        for sql, plan in self.query_plans(query_string):
+            self.assert_no_full_scan(sql, plan)
+
+    def test_user_type_filter_uses_index(self):
+        self.assert_no_full_scans('?user_type__exact=doctor')
+
+    def test_staff_verification_filter_uses_index(self):
+        self.assert_no_full_scans('?is_staff__exact=1&verified_staff__exact=0')
+
+    def test_inactive_filter_uses_index(self):
+        self.assert_no_full_scans('?is_active__exact=0')
+
+    def test_search_prefix_lookups_use_indexes(self):
+        for condition in (
+            Q(search_name__startswith='in dex1'),
+            Q(matric_number__istartswith='idx/25/01'),
+            Q(staff_id__istartswith='idx-'),
+        ):
+            queryset = User.objects.filter(condition)
+            self.assert_no_full_scan(str(queryset.query), queryset.explain())
+
+    def test_date_joined_filter_uses_index(self):
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.assert_no_full_scans('?' + urlencode({
+            'date_joined__gte': today.isoformat(' '),
+            'date_joined__lt': (today + timezone.timedelta(days=1)).isoformat(' '),
+        }))
+
+
+class UserSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.nurse = User.objects.create_user(
+            staff_id='NUR-001', first_name='Ngozi', last_name='Okafor', user_type=UserType.NURSE
+        )
+        cls.student = User.objects.create_user(
+            matric_number='CSC/20/1234', first_name='Adébáyọ̀', middle_name='John', last_name='Doe'
+        )
+        User.objects.create_user(matric_number='MED/21/0001', first_name='Johnson', last_name='Bello')
+        for i in range(25):
+            User.objects.create_user(matric_number=f'ENG/22/{i:04d}', first_name='Tunde', last_name=f'Ola{i}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.nurse)
+
+    def search(self, **params):
+        return self.client.get(reverse('user:search_users'), params)
+
+    def matric_numbers(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [user['matric_number'] for user in response.json()['data']['results']]
+
+    def test_search_name_is_normalised_on_save(self):
+        self.assertEqual(self.student.search_name, 'adebayo john doe')
+
+    def test_matches_word_prefixes_in_any_position(self):
+        self.assertEqual(self.matric_numbers(self.search(q='jo doe')), ['CSC/20/1234'])
+        self.assertEqual(self.matric_numbers(self.search(q='ADEB')), ['CSC/20/1234'])
+        self.assertCountEqual(self.matric_numbers(self.search(q='john')), ['CSC/20/1234', 'MED/21/0001'])
+
+    def test_matches_matric_number_prefix(self):
+        self.assertEqual(self.matric_numbers(self.search(q='csc/20')), ['CSC/20/1234'])
+
+    def test_cursor_pagination(self):
+        first = self.search(q='tunde', page_size=20).json()['data']
+        self.assertEqual(len(first['results']), 20)
+        second = self.client.get(first['next']).json()['data']
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+
+    def test_requires_clinic_staff(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.search(q='john').status_code, 403)
+
+    def test_short_query_rejected(self):
+        self.assertEqual(self.search(q='j').status_code, 400)
+
+    def test_query_deadline_cancels_slow_queries(self):
+        slow_query = (
+            'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) '
+            'SELECT COUNT(*) FROM n'
+        )
+        with self.assertRaises(SearchTimeout):
+            with query_deadline(5), connection.cursor() as cursor:
+                cursor.execute(slow_query)
+
+
+class ClaimsAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            staff_id='DOC-001', first_name='Emeka', last_name='Nwosu',
+            user_type=UserType.DOCTOR, is_staff=True, verified_staff=True,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def authenticate(self, access):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        return ClaimsJWTAuthentication().authenticate(request)
+
+    @override_settings(JWT_REVOCATION_CACHE='default')
+    def test_claims_authenticate_without_queries(self):
+        access = issue_tokens(self.doctor)['access']
+        with self.assertNumQueries(0):
+            user, token = self.authenticate(access)
+            self.assertIsInstance(user, ClaimsTokenUser)
+            self.assertEqual(user.user_type, UserType.DOCTOR)
+            self.assertTrue(user.verified_staff)
+            self.assertTrue(user.is_active)
+
+    def test_other_attributes_load_the_user_once(self):
+        user, _ = self.authenticate(issue_tokens(self.doctor)['access'])
+        with self.assertNumQueries(1):
+            self.assertTrue(user.is_staff)
+            self.assertEqual(user.staff_id, 'DOC-001')
+            self.assertEqual(user.get_full_name(), 'Emeka Nwosu')
+
+    def test_deactivated_user_is_rejected(self):
+        access = issue_tokens(self.doctor)['access']
+        self.doctor.is_active = False
+        self.doctor.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(access)
+
+        self.doctor.is_active = True
+        self.doctor.save()
+        user, _ = self.authenticate(access)
+        self.assertEqual(user.id, str(self.doctor.pk))
+
+    def test_without_revocation_cache_is_active_is_read_from_database(self):
+        access = issue_tokens(self.doctor)['access']
+        with self.assertNumQueries(1):
+            self.authenticate(access)
+        # update() skips save(); the database still has the last word
+        User.objects.filter(pk=self.doctor.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(access)
+
+    @override_settings(JWT_REVOCATION_CACHE='default')
+    def test_queryset_updates_revoke_and_restore(self):
+        access = issue_tokens(self.doctor)['access']
+        User.objects.filter(pk=self.doctor.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(access)
+        User.objects.filter(pk=self.doctor.pk).update(is_active=True)
+        self.assertEqual(self.authenticate(access)[0].id, str(self.doctor.pk))
+
+        self.doctor.is_active = False
+        User.objects.bulk_update([self.doctor], ['is_active'])
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(access)
+
+    def test_check_refuses_unshared_revocation_cache(self):
+        self.assertEqual(check_revocation_cache(), [])
+        with override_settings(PRODUCTION=True):
+            self.assertEqual([error.id for error in check_revocation_cache()], ['User.E003'])
+        with override_settings(JWT_REVOCATION_CACHE='default'):
+            self.assertEqual([error.id for error in check_revocation_cache()], ['User.E002'])
+        with override_settings(JWT_REVOCATION_CACHE='sessions'):
+            self.assertEqual([error.id for error in check_revocation_cache()], ['User.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost'}}
+        with override_settings(CACHES=shared, JWT_REVOCATION_CACHE='default'):
+            self.assertEqual(check_revocation_cache(), [])
+
+
+class TokenBlacklistTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            matric_number='CSC/20/0100', first_name='Kemi', last_name='Ojo'
+        )
+
+    def setUp(self):
+        get_recent_blacklist().clear()
+
+    def refresh(self, token):
+        return self.client.post(
+            reverse('user:token_refresh'), {'refresh': token}, content_type='application/json'
+        )
+
+    def test_rotated_token_replay_rejected_from_memory(self):
+        tokens = issue_tokens(self.student)
+        response = self.refresh(tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('refresh', response.json())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+
+    def test_replay_seen_by_another_worker_checks_database(self):
+        tokens = issue_tokens(self.student)
+        self.refresh(tokens['refresh'])
+        get_recent_blacklist().clear()
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'blacklist': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'blacklist'},
+        },
+        TOKEN_BLACKLIST_CACHE='blacklist',
+    )
+    def test_warm_shared_cache_answers_without_queries(self):
+        rotated, live = issue_tokens(self.student), issue_tokens(self.student)
+        # blacklisted outside the refresh path, before the cache was in use
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(token=rotated['refresh']))
+        blacklist = get_recent_blacklist()
+        blacklist.clear()
+        caches['blacklist'].clear()
+
+        # cold: a miss still asks the database
+        with self.assertNumQueries(1):
+            CachedBlacklistRefreshToken(live['refresh'])
+        self.assertEqual(blacklist.warm(), 1)
+        with self.assertNumQueries(0):
+            CachedBlacklistRefreshToken(live['refresh'])
+            with self.assertRaises(TokenError):
+                CachedBlacklistRefreshToken(rotated['refresh'])
+
+        # blacklisted after warming, by another worker
+        self.assertEqual(self.refresh(live['refresh']).status_code, 200)
+        blacklist.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.refresh(live['refresh']).status_code, 401)
+
+    def test_refresh_reads_claims_from_the_user(self):
+        tokens = issue_tokens(self.student)
+        User.objects.filter(pk=self.student.pk).update(user_type=UserType.NURSE, verified_staff=True)
+        response = self.refresh(tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        for token in (AccessToken(response.json()['access']), RefreshToken(response.json()['refresh'])):
+            self.assertEqual(token['user_type'], UserType.NURSE)
+            self.assertTrue(token['verified_staff'])
+
+    def test_refresh_rejected_for_inactive_user(self):
+        tokens = issue_tokens(self.student)
+        User.objects.filter(pk=self.student.pk).update(is_active=False)
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+
+    def test_purge_removes_expired_tokens_in_batches(self):
+        for _ in range(5):
+            self.refresh(issue_tokens(self.student)['refresh'])
+        live = issue_tokens(self.student)
+        self.assertEqual(BlacklistedToken.objects.count(), 5)
+
+        # expire everything but the last pair
+        OutstandingToken.objects.exclude(token=live['refresh']).update(
+            expires_at=timezone.now() - timezone.timedelta(seconds=1)
+        )
+        self.assertEqual(purge_expired_tokens(batch_size=3), 10)
+        self.assertEqual(list(OutstandingToken.objects.values_list('token', flat=True)), [live['refresh']])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    LOGIN_HASH_EXECUTOR='thread',
+    MIDDLEWARE=['Utils.benchmark.QueryCountMiddleware', *settings.MIDDLEWARE],
+)
+class QueryBudgetTests(TestCase):
+    # Fails when an auth endpoint starts issuing more (or fewer) queries than
+    # Utils.benchmark.QUERY_BUDGETS allows; update the budget deliberately.
+
+    @classmethod
+    def setUpTestData(cls):
+        # also creates this year's serial counter
+        cls.matric_numbers = seed_students(10, 'secret123')
+        cls.admin = User.objects.create_superuser(staff_id='ADM/001', password='secret123')
+
+    def setUp(self):
+        get_credential_cache().clear()
+
+    def login_data(self):
+        return {'matric_number': self.matric_numbers[0], 'password': 'secret123'}
+
+    def test_seeded_matric_numbers_look_real(self):
+        self.assertEqual(matric_number(0, 2021), 'CSC/21/0001')
+        self.assertEqual(matric_number(10, 2021), 'CSC/21/0002')
+        self.assertEqual(len(set(self.matric_numbers)), 10)
+
+    def test_login(self):
+        with self.assertNumQueries(QUERY_BUDGETS['login']):
+            response = self.client.post(reverse('user:login_user'), self.login_data(), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_async(self):
+        with self.assertNumQueries(QUERY_BUDGETS['login_async']):
+            response = self.client.post(
+                reverse('user:login_user_async'), self.login_data(), content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_register_student(self):
+        with self.assertNumQueries(QUERY_BUDGETS['register_student']):
+            response = self.client.post(reverse('user:register_student'), {
+                'matric_number': 'NEW/26/0001',
+                'first_name': 'Tolu',
+                'last_name': 'Ade',
+                'password': 'secret123',
+                'confirm_password': 'secret123',
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_register_staff(self):
+        self.client.force_login(self.admin)
+        with self.assertNumQueries(QUERY_BUDGETS['register_staff']):
+            response = self.client.post(reverse('user:register_staff'), {
+                'first_name': 'Ngozi',
+                'last_name': 'Eze',
+                'staff_id': 'NUR/001',
+                'staff_type': UserType.NURSE,
+            })
+        self.assertRedirects(response, reverse('user:register_staff'))
+        self.assertTrue(User.objects.filter(staff_id='NUR/001', is_staff=True).exists())
+
+    def test_run_scenario_reports_queries_per_request(self):
+        scenario = Scenario('login', reverse('user:login_user'), lambda i: self.login_data(), 200)
+        summary = run_scenario(ClientServer(), scenario, requests=5)
+        self.assertEqual(summary['requests'], 5)
+        self.assertEqual(summary['errors'], 0)
+        # only the first login misses the credential cache
+        self.assertEqual(summary['max_queries'], QUERY_BUDGETS['login'])
+        self.assertLess(summary['queries_per_request'], QUERY_BUDGETS['login'])
+        self.assertIsNone(check_budget('login', summary))
+        self.assertIsNotNone(check_budget('login', summary, budgets={'login': 3}))
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    METRICS_ENABLED=True,
+    METRICS_SAMPLE_RATE=1.0,
+    METRICS_SERVER_TIMING=True,
+    METRICS_AUTH_TOKEN=None,
+)
+class MetricsMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            matric_number='CSC/20/0200', password='secret123', first_name='Bayo', last_name='Ade'
+        )
+
+    def setUp(self):
+        get_credential_cache().clear()
+        metrics.get_registry().clear()
+
+    def login(self, path='user:login_user'):
+        return self.client.post(
+            reverse(path), {'matric_number': 'CSC/20/0200', 'password': 'secret123'},
+            content_type='application/json'
+        )
+
+    def test_server_timing_header(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="4 queries"', timing)
+        self.assertIn('hash;dur=', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_prometheus_endpoint_aggregates_per_view(self):
+        self.login()
+        self.login('user:login_user_async')
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('healthplus_requests_total{view="user:login_user"} 1', body)
+        self.assertIn('healthplus_requests_total{view="user:login_user_async"} 1', body)
+        self.assertIn('healthplus_db_queries_total{view="user:login_user"} 4', body)
+        self.assertIn('healthplus_request_duration_seconds_count{view="user:login_user"} 1', body)
+        self.assertIn('healthplus_hash_seconds_total{view="user:login_user_async"}', body)
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_only_counted(self):
+        response = self.login()
+        self.assertNotIn('Server-Timing', response)
+        totals = metrics.get_registry().snapshot()['user:login_user']
+        self.assertEqual((totals['requests'], totals['sampled'], totals['queries']), (1, 0, 0))
+
+    def test_totals_from_other_workers_are_merged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            other = metrics.MetricsRegistry(directory)
+            other.views = {'user:login_user': {**metrics.MetricsRegistry._empty(), 'requests': 5, 'queries': 20}}
+            other.flush()
+            os.replace(other.path(), other.path(pid=1))
+
+            with override_settings(METRICS_DIR=directory):
+                self.login()
+                merged = metrics.get_registry().collect()
+        self.assertEqual(merged['user:login_user']['requests'], 6)
+        self.assertEqual(merged['user:login_user']['queries'], 24)
+
+    @override_settings(METRICS_AUTH_TOKEN='scrape-me')
+    def test_endpoint_requires_token_when_configured(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer scrape-me'}).status_code, 200)
+
+    @override_settings(PRODUCTION=True)
+    def test_production_requires_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.assertEqual([error.id for error in metrics.check_metrics_auth()], ['User.E006'])
+        with override_settings(METRICS_AUTH_TOKEN='scrape-me'):
+            self.assertEqual(metrics.check_metrics_auth(), [])
+            response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer scrape-me'})
+            self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.login())
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+CHEAP_HASHER_COSTS = {
+    'PASSWORD_PBKDF2_ITERATIONS': 1000,
+    'PASSWORD_SCRYPT_WORK_FACTOR': 2**10,
+    'PASSWORD_SCRYPT_BLOCK_SIZE': 8,
+    'PASSWORD_SCRYPT_PARALLELISM': 1,
+}
+SCRYPT_FIRST = ['Utils.hashers.ScryptPasswordHasher', 'Utils.hashers.PBKDF2PasswordHasher']
+PBKDF2_FIRST = ['Utils.hashers.PBKDF2PasswordHasher', 'Utils.hashers.ScryptPasswordHasher']
+
+
+@override_settings(LOGIN_HASH_EXECUTOR='thread', **CHEAP_HASHER_COSTS)
+class PasswordHasherTests(TestCase):
+
+    def setUp(self):
+        get_credential_cache().clear()
+
+    def create_student(self, matric_number):
+        return User.objects.create_user(
+            matric_number=matric_number, password='secret123', first_name='Ife', last_name='Ola'
+        )
+
+    def stored_hash(self, user):
+        return User.objects.values_list('password', flat=True).get(pk=user.pk)
+
+    def test_new_hashes_use_configured_hasher_and_costs(self):
+        with override_settings(PASSWORD_HASHERS=SCRYPT_FIRST):
+            user = self.create_student('CSC/20/0300')
+        self.assertTrue(self.stored_hash(user).startswith('scrypt$1024$'))
+
+    def test_login_upgrades_to_configured_hasher(self):
+        with override_settings(PASSWORD_HASHERS=PBKDF2_FIRST):
+            user = self.create_student('CSC/20/0301')
+        self.assertTrue(self.stored_hash(user).startswith('pbkdf2_sha256$1000$'))
+
+        with override_settings(PASSWORD_HASHERS=SCRYPT_FIRST):
+            self.assertTrue(needs_rehash(self.stored_hash(user)))
+            self.assertEqual(authenticate(matric_number='CSC/20/0301', password='secret123'), user)
+            self.assertTrue(self.stored_hash(user).startswith('scrypt$1024$'))
+            self.assertFalse(needs_rehash(self.stored_hash(user)))
+            # the new hash is what the next login checks against
+            self.assertIsNotNone(authenticate(matric_number='CSC/20/0301', password='secret123'))
+
+    @override_settings(PASSWORD_HASHERS=PBKDF2_FIRST)
+    def test_login_downgrades_cost(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            user = self.create_student('CSC/20/0302')
+        self.assertTrue(needs_rehash(self.stored_hash(user)))
+        authenticate(matric_number='CSC/20/0302', password='secret123')
+        self.assertTrue(self.stored_hash(user).startswith('pbkdf2_sha256$1000$'))
+
+    @override_settings(PASSWORD_HASHERS=PBKDF2_FIRST)
+    def test_wrong_password_does_not_rehash(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            user = self.create_student('CSC/20/0303')
+        encoded = self.stored_hash(user)
+        self.assertIsNone(authenticate(matric_number='CSC/20/0303', password='wrong'))
+        self.assertEqual(self.stored_hash(user), encoded)
+
+    def test_async_login_rehashes(self):
+        with override_settings(PASSWORD_HASHERS=PBKDF2_FIRST):
+            user = self.create_student('CSC/20/0304')
+        with override_settings(PASSWORD_HASHERS=SCRYPT_FIRST):
+            response = self.client.post(
+                reverse('user:login_user_async'),
+                {'matric_number': 'CSC/20/0304', 'password': 'secret123'},
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(self.stored_hash(user).startswith('scrypt$1024$'))
+
+    def test_calibrate_pbkdf2(self):
+        params, seconds = calibrate('pbkdf2', target=0.001, samples=1)
+        self.assertEqual(params, {'PASSWORD_PBKDF2_ITERATIONS': 10_000})
+        self.assertGreater(seconds, 0)
+
+
+def fake_upload(field, name, content):
+    return CloudinaryResource(
+        public_id=f'{field.options["folder"]}/{os.path.splitext(name)[0]}',
+        type='upload', resource_type='image', version='1', format='jpg',
+    )
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, DEFAULT_STAFF_PASSWORD='welcome123')
+class BulkRegisterStaffTests(TestCase):
+
+    CSV = (
+        "staff_id,first_name,middle_name,last_name,staff_type,staff_id_img\n"
+        "NUR/001,Ada,,Obi,nurse,nur-001.jpg\n"
+        "DOC/001,Bola,Ife,Ade,doctor,doc-001.jpg\n"
+        "DOC/001,Dup,,Row,doctor,\n"
+        "PHA/001,Chi,,Eze,janitor,\n"
+        "PHA/002,Uche,,Nwa,pharmacist,missing.jpg\n"
+        "OLD/001,Old,,Staff,nurse,\n"
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(staff_id='ADM/001', password='admin123')
+        cls.existing = User.objects.create_user(
+            staff_id='OLD/001', first_name='Kept', last_name='As Is', user_type=UserType.NURSE, is_staff=True
+        )
+
+    def images(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('nur-001.jpg', b'nurse id')
+            archive.writestr('doc-001.jpg', b'doctor id')
+        buffer.seek(0)
+        return buffer
+
+    def run_import(self):
+        importer = StaffImporter(batch_size=2, upload_workers=2, upload=fake_upload)
+        with zipfile.ZipFile(self.images()) as images:
+            return importer.run(read_rows(io.StringIO(self.CSV)), images)
+
+    def test_import_hashes_default_password_once(self):
+        with override_settings(DEFAULT_STAFF_PASSWORD='welcome123'), \
+                mock.patch('Utils.hashers.hashers.make_password', wraps=make_password) as hash_password:
+            result = self.run_import()
+        self.assertEqual(hash_password.call_count, 1)
+
+        self.assertEqual(result.created, 3)
+        self.assertEqual(result.skipped, 1)
+        self.assertEqual(result.images_uploaded, 2)
+        self.assertEqual(
+            [(error['row'], error['staff_id']) for error in result.errors],
+            [(4, 'DOC/001'), (5, 'PHA/001'), (6, 'PHA/002')],
+        )
+        nurse = User.objects.get(staff_id='NUR/001')
+        self.assertTrue(nurse.is_staff)
+        self.assertEqual(nurse.user_type, UserType.NURSE)
+        self.assertEqual(nurse.staff_id_img.public_id, 'health-plus/staff_id_img/nur-001')
+        self.assertIsNotNone(authenticate(staff_id='PHA/002', password='welcome123'))
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.first_name, 'Kept')
+
+    def test_import_is_idempotent(self):
+        self.run_import()
+        upload = mock.Mock(side_effect=fake_upload)
+        importer = StaffImporter(batch_size=2, upload=upload)
+        with zipfile.ZipFile(self.images()) as images:
+            result = importer.run(read_rows(io.StringIO(self.CSV)), images)
+        self.assertEqual((result.created, result.skipped, result.images_uploaded), (0, 4, 0))
+        upload.assert_not_called()
+
+    def test_rows_the_database_refuses_are_reported_one_by_one(self):
+        bulk_create = User.objects.bulk_create
+
+        def refuse(users, *args, **kwargs):
+            if len(users) > 1:
+                raise IntegrityError('duplicate key')
+            if users[0].staff_id == 'DOC/001':
+                raise DataError('value too long')
+            return bulk_create(users, *args, **kwargs)
+
+        with mock.patch.object(User.objects, 'bulk_create', side_effect=refuse):
+            result = StaffImporter(batch_size=10, upload=fake_upload).run(read_rows(io.StringIO(self.CSV)))
+        self.assertEqual(result.created, 2)
+        self.assertIn((3, 'DOC/001'), [(error['row'], error['staff_id']) for error in result.errors])
+        self.assertEqual(User.objects.filter(staff_id__in=['NUR/001', 'PHA/002']).count(), 2)
+
+    def test_failed_upload_keeps_the_account(self):
+        def failing_upload(field, name, content):
+            raise ConnectionError("timed out")
+
+        importer = StaffImporter(upload=failing_upload)
+        with zipfile.ZipFile(self.images()) as images:
+            result = importer.run(read_rows(io.StringIO(self.CSV)), images)
+        self.assertEqual(result.created, 3)
+        self.assertIn("Image upload failed: timed out", [error['message'] for error in result.errors])
+        self.assertFalse(User.objects.get(staff_id='NUR/001').staff_id_img)
+
+    def test_api(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with mock.patch('Utils.uploads.cloudinary.uploader.upload_resource',
+                        side_effect=lambda file, **options: fake_upload(
+                            User._meta.get_field('staff_id_img'), file.name, file.read())):
+            response = client.post(reverse('user:bulk_register_staff'), {
+                'file': SimpleUploadedFile('roster.csv', self.CSV.encode()),
+                'images': SimpleUploadedFile('ids.zip', self.images().getvalue()),
+            })
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()['data']
+        self.assertEqual((data['created'], data['skipped'], data['images_uploaded']), (3, 1, 2))
+
+    def test_register_staff_form_saves_once(self):
+        self.client.force_login(self.admin)
+        image = SimpleUploadedFile('id.jpg', b'id card', content_type='image/jpeg')
+        with tempfile.TemporaryDirectory() as staging, \
+                override_settings(IMAGE_UPLOAD_STAGING_DIR=staging, IMAGE_UPLOAD_WORKERS=0), \
+                mock.patch('Utils.uploads.cloudinary.uploader.upload_resource',
+                           side_effect=lambda file, **options: fake_upload(
+                               User._meta.get_field('staff_id_img'), file.name, file.read())) as upload, \
+                CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.client.post(reverse('user:register_staff'), {
+                    'first_name': 'Ngozi', 'last_name': 'Eze', 'staff_id': 'NUR/002',
+                    'staff_type': UserType.NURSE, 'staff_id_img': image,
+                })
+            # the response went out before anything was uploaded
+            upload.assert_not_called()
+            user_writes = [
+                q['sql'] for q in ctx.captured_queries
+                if q['sql'].startswith(('INSERT', 'UPDATE')) and '"User_user"' in q['sql']
+            ]
+            for callback in callbacks:
+                callback()
+        self.assertEqual(len(user_writes), 1)
+        self.assertRedirects(response, reverse('user:register_staff'))
+        staff = User.objects.get(staff_id='NUR/002')
+        self.assertEqual(staff.staff_id_img.public_id, 'health-plus/staff_id_img/id')
+        self.assertIsNotNone(authenticate(staff_id='NUR/002', password='welcome123'))
+
+        response = self.client.post(reverse('user:register_staff'), {
+            'first_name': 'Other', 'last_name': 'Eze', 'staff_id': 'NUR/002', 'staff_type': UserType.NURSE,
+        }, follow=True)
+        self.assertContains(response, 'A staff member with this staff ID exists')
+
+
+class FailingBackend:
+    def upload(self, field, file, name):
+        raise ConnectionError("cloudinary is down")
+
+
+@override_settings(IMAGE_UPLOAD_WORKERS=0, IMAGE_UPLOAD_MAX_ATTEMPTS=2)
+class ImageUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(staff_id='NUR/010', first_name='Ada', user_type=UserType.NURSE)
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        staging = os.path.join(self.root, 'staging')
+        settings_override = override_settings(
+            IMAGE_UPLOAD_STAGING_DIR=staging,
+            IMAGE_UPLOAD_LOCAL_ROOT=os.path.join(self.root, 'media'),
+            IMAGE_UPLOAD_BACKEND='Utils.uploads.LocalFileSystemBackend',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def stage(self, content=b'id card', name='card.jpg'):
+        with self.captureOnCommitCallbacks() as callbacks:
+            upload = stage_image_upload(self.staff, 'staff_id_img', SimpleUploadedFile(name, content))
+        return upload, callbacks
+
+    def test_staged_upload_is_pending_until_processed(self):
+        upload, callbacks = self.stage()
+        self.assertEqual(upload.status, ImageUploadStatus.PENDING)
+        self.assertTrue(os.path.exists(upload.staged_path))
+        self.staff.refresh_from_db()
+        self.assertFalse(self.staff.staff_id_img)
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertFalse(os.path.exists(upload.staged_path))
+        self.staff.refresh_from_db()
+        public_id = self.staff.staff_id_img.public_id
+        self.assertTrue(public_id.startswith('health-plus/staff_id_img/card_'))
+        with open(os.path.join(self.root, 'media', public_id + '.jpg'), 'rb') as f:
+            self.assertEqual(f.read(), b'id card')
+
+    def test_newer_image_supersedes_pending_one(self):
+        first, _ = self.stage(b'old')
+        second, callbacks = self.stage(b'new')
+        self.assertFalse(ImageUpload.objects.filter(pk=first.pk).exists())
+        self.assertFalse(os.path.exists(first.staged_path))
+        # the first upload's callback finds nothing to do
+        self.assertIsNone(process_image_upload(first.pk))
+        for callback in callbacks:
+            callback()
+        self.staff.refresh_from_db()
+        with open(os.path.join(self.root, 'media', self.staff.staff_id_img.public_id + '.jpg'), 'rb') as f:
+            self.assertEqual(f.read(), b'new')
+
+    @override_settings(IMAGE_UPLOAD_BACKEND='User.tests.FailingBackend')
+    def test_failed_uploads_are_retried_then_marked_failed(self):
+        upload, callbacks = self.stage()
+        for callback in callbacks:
+            callback()
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.attempts), (ImageUploadStatus.PENDING, 1))
+        self.assertEqual(upload.last_error, "cloudinary is down")
+
+        upload = process_image_upload(upload.pk)
+        self.assertEqual((upload.status, upload.attempts), (ImageUploadStatus.FAILED, 2))
+        self.assertTrue(os.path.exists(upload.staged_path))
+
+    def test_worker_retries_with_backoff(self):
+        upload, _ = self.stage()
+        queue = UploadQueue(workers=1, retry_delay=0.01)
+        self.addCleanup(queue.shutdown)
+        results = [ImageUpload(pk=upload.pk, attempts=1, status=ImageUploadStatus.PENDING), None]
+        with mock.patch('Utils.uploads.process_image_upload', side_effect=results) as process, \
+                mock.patch('Utils.uploads.connections.close_all'):
+            queue.submit(upload.pk)
+            deadline = time.monotonic() + 5
+            while process.call_count < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(process.call_count, 2)
+
+    def test_command_drains_and_retries_failed(self):
+        with override_settings(IMAGE_UPLOAD_BACKEND='User.tests.FailingBackend', IMAGE_UPLOAD_MAX_ATTEMPTS=1):
+            self.stage()
+            out = io.StringIO()
+            call_command('process_image_uploads', stdout=out)
+        self.assertIn("Uploaded 0 images, 0 still pending, 1 failed.", out.getvalue())
+
+        out = io.StringIO()
+        call_command('process_image_uploads', stdout=out)
+        self.assertIn("Uploaded 0 images", out.getvalue())
+        call_command('process_image_uploads', '--retry-failed', stdout=out)
+        self.assertIn("Uploaded 1 images, 0 still pending, 0 failed.", out.getvalue())
+        self.staff.refresh_from_db()
+        self.assertTrue(self.staff.staff_id_img)
+
+
+class ProfileImageURLTests(TestCase):
+
+    IMAGE = 'image/upload/v1/health-plus/user_profile_images/ada.jpg'
+
+    def resource(self):
+        return User._meta.get_field('profile_image').to_python(self.IMAGE)
+
+    def test_urls_are_stored_when_the_image_changes(self):
+        user = User.objects.create_user(matric_number='CSC/20/0100', first_name='Ada', last_name='Obi')
+        self.assertEqual((user.profile_image_url, user.profile_image_thumbnail_url), ('', ''))
+
+        user.profile_image = self.resource()
+        user.save(update_fields=['profile_image'])
+        user = User.objects.get(pk=user.pk)
+        self.assertEqual(user.profile_image_url, self.resource().url)
+        self.assertIn('/c_fill,f_auto,g_face,h_150,q_auto,w_150/', user.profile_image_thumbnail_url)
+
+        with override_settings(PROFILE_IMAGE_THUMBNAIL_SIZE=64):
+            call_command('refresh_profile_image_urls', stdout=io.StringIO())
+        user.refresh_from_db()
+        self.assertIn('h_64', user.profile_image_thumbnail_url)
+
+    def test_serializer_does_not_build_urls(self):
+        User.objects.create_user(matric_number='CSC/20/0101', first_name='Ada', last_name='Obi',
+                                 profile_image=self.resource())
+        User.objects.create_user(matric_number='CSC/20/0102', first_name='Bola', last_name='Ade')
+        users = list(User.objects.order_by('matric_number'))
+        with mock.patch.object(CloudinaryResource, 'build_url') as build_url:
+            data = StudentSerializer(users, many=True).data
+        build_url.assert_not_called()
+        self.assertEqual(data[0]['profile_image'], users[0].profile_image.url)
+        self.assertEqual(data[1]['profile_image'], settings.DEFAULT_USER_PROFILE_IMAGE)
+        self.assertEqual(data[1]['profile_image_thumbnail'], settings.DEFAULT_USER_PROFILE_IMAGE)
+
+    @override_settings(IMAGE_UPLOAD_WORKERS=0)
+    def test_background_upload_stores_urls(self):
+        user = User.objects.create_user(matric_number='CSC/20/0103', first_name='Ada', last_name='Obi')
+        with tempfile.TemporaryDirectory() as staging, override_settings(IMAGE_UPLOAD_STAGING_DIR=staging), \
+                mock.patch('Utils.uploads.cloudinary.uploader.upload_resource', return_value=self.resource()):
+            with self.captureOnCommitCallbacks(execute=True):
+                stage_image_upload(user, 'profile_image', SimpleUploadedFile('ada.jpg', b'face'))
+        user.refresh_from_db()
+        self.assertEqual(user.user_profile_image(), self.resource().url)
+        self.assertTrue(user.user_profile_image_thumbnail().endswith('/v1/health-plus/user_profile_images/ada.jpg'))
+
+
+class RosterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.nurse = User.objects.create_user(
+            staff_id='NUR-002', first_name='Ngozi', last_name='Okafor', user_type=UserType.NURSE,
+            is_staff=True, verified_staff=True,
+        )
+        User.objects.create_user(
+            matric_number='CSC/20/0001', first_name='Ada', middle_name=None, last_name='Obi', year_of_admission=2020,
+            profile_image=User._meta.get_field('profile_image').to_python('image/upload/v1/health-plus/ada.jpg'),
+        )
+        for i in range(6):
+            User.objects.create_user(
+                matric_number=f'MED/21/{i:04d}', first_name='Tunde', last_name=f'Ola{i}', year_of_admission=2021,
+            )
+        User.objects.create_user(staff_id='DOC-001', first_name='Bola', last_name='Ade',
+                                 user_type=UserType.DOCTOR, is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.nurse)
+
+    def roster(self, url=None, **params):
+        response = self.client.get(url or reverse('user:roster_users'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def test_pages_match_student_serializer(self):
+        expected = StudentSerializer(User.objects.order_by('date_joined', 'id'), many=True).data
+        results = []
+        page = self.roster(page_size=3)
+        while True:
+            results.extend(page['results'])
+            if not page['next']:
+                break
+            page = self.roster(page['next'])
+        self.assertEqual(results, json.loads(json.dumps(expected)))
+
+    def test_filters(self):
+        def matric_numbers(**params):
+            return [user['matric_number'] for user in self.roster(**params)['results']]
+
+        self.assertEqual(matric_numbers(year_of_admission=2020), ['CSC/20/0001'])
+        self.assertEqual(len(matric_numbers(user_type='student', year_of_admission=2021)), 6)
+        self.assertEqual([user['first_name'] for user in self.roster(verified_staff='true')['results']], ['Ngozi'])
+        self.assertEqual(len(matric_numbers(user_type='doctor', verified_staff='false')), 1)
+
+    def test_one_query_per_page(self):
+        first = self.roster(page_size=4)
+        with self.assertNumQueries(1):
+            self.roster(first['next'])
+
+    def test_invalid_queries_rejected(self):
+        url = reverse('user:roster_users')
+        for params in ({'user_type': 'janitor'}, {'year_of_admission': 'last'},
+                       {'verified_staff': 'maybe'}, {'cursor': 'not-a-cursor'}, {'page_size': 0}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+    def test_requires_clinic_staff(self):
+        self.client.force_authenticate(User.objects.get(matric_number='CSC/20/0001'))
+        self.assertEqual(self.client.get(reverse('user:roster_users')).status_code, 403)
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    LOGIN_HASH_EXECUTOR='thread',
+    LOGIN_THROTTLE_IP_LIMIT=5,
+    LOGIN_THROTTLE_IDENTIFIER_LIMIT=3,
+    LOGIN_THROTTLE_LOCKOUT=60,
+    LOGIN_THROTTLE_MAX_LOCKOUT=600,
+)
+class LoginThrottleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            matric_number='CSC/20/0200', password='secret123', first_name='John', last_name='Doe'
+        )
+
+    def setUp(self):
+        get_login_throttle().clear()
+
+    def login(self, password='wrong', matric_number='CSC/20/0200', ip='10.0.0.1', **extra):
+        return self.client.post(
+            reverse('user:login_user'), {'matric_number': matric_number, 'password': password},
+            content_type='application/json', REMOTE_ADDR=ip, **extra,
+        )
+
+    def test_identifier_locked_out_before_any_query_or_hash(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(self.login().status_code, 401)  # the fourth failure locks
+
+        with self.assertNumQueries(0), mock.patch('Utils.user.check_password') as check:
+            response = self.login(password='secret123', ip='10.0.0.2')
+        check.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+    def test_lockouts_double(self):
+        throttle = get_login_throttle()
+        keys = [('matric_number:x', 0)]
+        self.assertEqual(throttle.record_failure(keys), 60)
+        self.assertEqual(throttle.record_failure(keys), 120)
+        self.assertEqual(throttle.record_failure(keys), 240)
+        for _ in range(5):
+            locked_for = throttle.record_failure(keys)
+        self.assertEqual(locked_for, 600)
+
+    def test_ip_limit_spans_accounts(self):
+        for i in range(6):
+            self.login(matric_number=f'CSC/20/09{i:02d}')
+        self.assertEqual(self.login(password='secret123').status_code, 429)
+        self.assertEqual(self.login(password='secret123', ip='10.0.0.9').status_code, 200)
+
+    def test_success_clears_account_failures(self):
+        for _ in range(3):
+            self.login()
+        self.assertEqual(self.login(password='secret123').status_code, 200)
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 401)
+
+    def test_sliding_window_forgets_old_failures(self):
+        throttle = get_login_throttle()
+        keys = [('ip:x', 3)]
+        with mock.patch('Utils.throttle.time.time', return_value=1000 * 300):
+            for _ in range(3):
+                throttle.record_failure(keys)
+        # halfway through the next window half of the old count still applies
+        with mock.patch('Utils.throttle.time.time', return_value=1001 * 300 + 150):
+            self.assertEqual(throttle._count('ip:x', time.time()), 2.5)
+        with mock.patch('Utils.throttle.time.time', return_value=1003 * 300):
+            self.assertEqual(throttle.record_failure(keys), 0)
+
+    @override_settings(LOGIN_THROTTLE_PROXY_COUNT=1)
+    def test_client_ip_from_trusted_proxy(self):
+        for i in range(6):
+            self.login(matric_number=f'NOPE/{i}', ip='10.0.0.100', HTTP_X_FORWARDED_FOR=f'1.2.3.{i}, 5.6.7.8')
+        # spoofed left-hand entries do not escape the lockout
+        response = self.login(password='secret123', ip='10.0.0.100', HTTP_X_FORWARDED_FOR='9.9.9.9, 5.6.7.8')
+        self.assertEqual(response.status_code, 429)
+        response = self.login(password='secret123', ip='10.0.0.100', HTTP_X_FORWARDED_FOR='5.6.7.9')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'throttle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle'},
+        },
+        LOGIN_THROTTLE_BACKEND='throttle',
+    )
+    def test_shared_backend_counts_across_workers(self):
+        from Utils.throttle import LoginThrottle
+        workers = [LoginThrottle(window=300, lockout=60, max_lockout=600, backend='throttle') for _ in range(2)]
+        keys = [('matric_number:shared', 3)]
+        for i in range(3):
+            self.assertEqual(workers[i % 2].record_failure(keys), 0)
+        self.assertEqual(workers[1].record_failure(keys), 60)
+        self.assertGreater(workers[0].retry_after(keys), 59)
+
+    def test_async_login_is_throttled(self):
+        for _ in range(4):
+            self.client.post(reverse('user:login_user_async'), {'matric_number': 'CSC/20/0200', 'password': 'x'},
+                             content_type='application/json')
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('user:login_user_async'),
+                                        {'matric_number': 'CSC/20/0200', 'password': 'secret123'},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+
+    def test_deactivated_account_counts_as_failure(self):
+        User.objects.filter(pk=self.student.pk).update(is_active=False)
+        for url in ('user:login_user', 'user:login_user_async'):
+            get_login_throttle().clear()
+            for _ in range(4):
+                response = self.client.post(reverse(url), {'matric_number': 'CSC/20/0200', 'password': 'secret123'},
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 403)
+            # the right password never reset the counter, so the account locks
+            response = self.client.post(reverse(url), {'matric_number': 'CSC/20/0200', 'password': 'secret123'},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 429)
+
+    def test_async_login_keeps_throttle_off_the_event_loop(self):
+        calls = []
+
+        def off_loop(check):
+            def wrapper(*args, **kwargs):
+                with self.assertRaises(RuntimeError):
+                    asyncio.get_running_loop()
+                calls.append(check.__name__)
+                return check(*args, **kwargs)
+            return wrapper
+
+        with mock.patch('User.views.check_login_throttle', off_loop(check_login_throttle)), \
+                mock.patch('User.views.record_login_result', off_loop(record_login_result)):
+            response = self.client.post(reverse('user:login_user_async'),
+                                        {'matric_number': 'CSC/20/0200', 'password': 'wrong'},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(calls, ['check_login_throttle', 'record_login_result'])
+
+
+class DatabaseConnectionTests(TestCase):
+
+    POSTGRES = {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'healthplus', 'OPTIONS': {'sslmode': 'require'}}
+    POOL = {'min_size': 2, 'max_size': 4, 'timeout': 10}
+
+    def test_pool_replaces_persistent_connections(self):
+        with mock.patch('Utils.database.pool_available', return_value=True):
+            database = configure_connections(self.POSTGRES, 600, True, pool=True, pool_options=self.POOL)
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS'], {'sslmode': 'require', 'pool': self.POOL})
+        self.assertNotIn('pool', self.POSTGRES['OPTIONS'])
+
+    def test_falls_back_to_persistent_connections(self):
+        with mock.patch('Utils.database.pool_available', return_value=False), \
+                self.assertWarns(RuntimeWarning):
+            database = configure_connections(self.POSTGRES, 600, True, pool=True, pool_options=self.POOL)
+        self.assertEqual((database['CONN_MAX_AGE'], database['CONN_HEALTH_CHECKS']), (600, True))
+        self.assertNotIn('pool', database['OPTIONS'])
+
+        sqlite = configure_connections({'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}, 60, False, pool=True)
+        self.assertEqual((sqlite['CONN_MAX_AGE'], sqlite['OPTIONS']), (60, {}))
+
+    def test_no_persistent_connections_under_asgi(self):
+        with mock.patch('Utils.database.pool_available', return_value=False), \
+                self.assertWarns(RuntimeWarning):
+            database = configure_connections(self.POSTGRES, 600, True, asgi=True)
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+
+        with mock.patch('Utils.database.pool_available', return_value=True):
+            database = configure_connections(self.POSTGRES, 0, True, pool=True, pool_options=self.POOL, asgi=True)
+        self.assertEqual((database['CONN_MAX_AGE'], database['OPTIONS']['pool']), (0, self.POOL))
+
+    def test_benchmark(self):
+        out = io.StringIO()
+        call_command('benchmark_db_connections', '--requests', '5', stdout=out)
+        self.assertIn('per-request: 5 requests', out.getvalue())
+        self.assertIn('persistent: 5 requests', out.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], PASSWORD_HASHERS=FAST_HASHERS, LOGIN_HASH_EXECUTOR='thread')
+class ReplicaRoutingTests(TransactionTestCase):
+    # A second SQLite file stands in for the replica; replicate() copies the
+    # primary over it, so anything written afterwards is "replication lag".
+    # It is added after the test runner has set up its databases, so the
+    # runner never tries to create it.
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.replica_path = os.path.join(tempfile.mkdtemp(), 'replica.sqlite3')
+        connections.settings['replica'] = {**connections['default'].settings_dict, 'NAME': cls.replica_path}
+        cls.databases = {'default', 'replica'}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(os.path.dirname(cls.replica_path))
+        super().tearDownClass()
+
+    def setUp(self):
+        get_credential_cache().clear()
+        self.nurse = User.objects.create_user(staff_id='NUR-003', first_name='Ngozi', user_type=UserType.NURSE)
+        User.objects.create_user(
+            matric_number='CSC/20/0300', password='secret123', first_name='Ada', last_name='Replicated'
+        )
+        self.replicate()
+        User.objects.create_user(matric_number='CSC/20/0301', first_name='Bola', last_name='Lagging')
+        self.client = APIClient()
+        self.client.force_authenticate(self.nurse)
+        routing_stats.clear()
+
+    def replicate(self):
+        primary, replica = connections['default'], connections['replica']
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    def found(self, query):
+        response = self.client.get(reverse('user:search_users'), {'q': query})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [user['last_name'] for user in response.json()['data']['results']]
+
+    def test_reads_use_the_replica_until_the_client_writes(self):
+        self.assertEqual(self.found('replicated'), ['Replicated'])
+        self.assertEqual(self.found('lagging'), [])
+        self.assertEqual(routing_stats.snapshot(), {('read', 'replica', 'replica'): 2})
+
+        response = self.client.post(reverse('user:register_student'), {
+            'matric_number': 'CSC/20/0302', 'first_name': 'Chi', 'last_name': 'Eze',
+            'password': 'secret123', 'confirm_password': 'secret123',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        # the same client now reads its own writes; a fresh one still lags
+        self.assertEqual(self.found('lagging'), ['Lagging'])
+        other = APIClient()
+        other.force_authenticate(self.nurse)
+        self.assertEqual(other.get(reverse('user:search_users'), {'q': 'lagging'}).json()['data']['results'], [])
+
+        self.client.cookies[settings.REPLICA_PIN_COOKIE] = str(time.time() - 1)
+        self.assertEqual(self.found('lagging'), [])
+
+    def test_login_from_replica_pins_the_client(self):
+        response = self.client.post(reverse('user:login_user'), {
+            'matric_number': 'CSC/20/0300', 'password': 'secret123',
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIn(('read', 'replica', 'replica'), routing_stats.snapshot())
+        self.assertIn(('write', 'default', 'primary'), routing_stats.snapshot())
+        self.assertEqual(self.found('lagging'), ['Lagging'])
+        self.assertIn(('read', 'default', 'pinned'), routing_stats.snapshot())
+
+    def test_routing_rules(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(User), 'default')  # outside a request
+        self.assertIsNone(router.db_for_read(SerialCounter))
+        self.assertFalse(router.allow_migrate('replica', 'User'))
+
+        token = routing_state.set(RoutingState())
+        try:
+            self.assertEqual(router.db_for_read(User), 'replica')
+            self.assertIsNone(router.db_for_read(OutstandingToken))
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(User), 'default')
+            router.db_for_write(User)
+            self.assertEqual(router.db_for_read(User), 'default')
+        finally:
+            routing_state.reset(token)
+        self.assertEqual(routing_stats.snapshot(), {
+            ('read', 'default', 'outside_request'): 1,
+            ('read', 'replica', 'replica'): 1,
+            ('read', 'default', 'transaction'): 1,
+            ('write', 'default', 'primary'): 1,
+            ('read', 'default', 'pinned'): 1,
+        })
+
+    @override_settings(USER_SEARCH_BUDGET_MS=5)
+    def test_search_deadline_applies_on_the_replica(self):
+        slow_ids = 'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 20000000) SELECT i FROM n'
+
+        def slow_search(query, using=None):
+            return User.objects.using(using).filter(pk__in=RawSQL(slow_ids, []))
+
+        with mock.patch('Utils.search.search_users', side_effect=slow_search) as search:
+            response = self.client.get(reverse('user:search_users'), {'q': 'replicated'})
+        self.assertEqual(search.call_args.kwargs['using'], 'replica')
+        self.assertEqual(response.status_code, 503, response.content)
+        self.assertEqual(routing_stats.snapshot(), {('read', 'replica', 'replica'): 1})
+
+    def test_blacklisted_token_rejected_while_replica_lags(self):
+        tokens = issue_tokens(User.objects.get(matric_number='CSC/20/0300'))
+        self.replicate()
+        refresh = reverse('user:token_refresh')
+        self.assertEqual(self.client.post(refresh, {'refresh': tokens['refresh']}, format='json').status_code, 200)
+        # replayed elsewhere: another worker, and a client not pinned to the primary
+        get_recent_blacklist().clear()
+        replay = APIClient().post(refresh, {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(replay.status_code, 401, replay.content)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_AUTH_TOKEN=None)
+    def test_decisions_are_exported(self):
+        self.found('replicated')
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('healthplus_db_routes_total{operation="read",database="replica",reason="replica"} 1', body)
+
+
+class OpenAPISchemaTests(TestCase):
+
+    def setUp(self):
+        openapi_cache.reset_schema(setting='OPENAPI_SCHEMA_DIR')
+
+    def test_generated_once_per_process(self):
+        with mock.patch('Utils.openapi.generate_schema', wraps=openapi_cache.generate_schema) as generate:
+            first = self.client.get(reverse('schema-json', kwargs={'format': '.json'}))
+            self.client.get(reverse('schema-json', kwargs={'format': '.yaml'}))
+            self.client.get(reverse('schema-swagger-ui'), {'format': 'openapi'})
+        generate.assert_called_once()
+        self.assertEqual(first['Content-Type'], 'application/json')
+        self.assertIn('/login/', json.loads(first.content)['paths'])
+
+    def test_etag_and_precompressed_body(self):
+        url = reverse('schema-json', kwargs={'format': '.json'})
+        plain = self.client.get(url)
+        zipped = self.client.get(url, HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(zipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(zipped.content), plain.content)
+        self.assertNotEqual(zipped['ETag'], plain['ETag'])
+        self.assertIn('Accept-Encoding', zipped['Vary'])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=f'W/{zipped["ETag"]}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=zipped['ETag']).status_code, 200)
+
+    def test_served_from_deploy_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        call_command('build_openapi_schema', '--output', directory, stdout=io.StringIO())
+        self.assertTrue(os.path.exists(os.path.join(directory, 'swagger.json.gz')))
+
+        with override_settings(OPENAPI_SCHEMA_DIR=directory), \
+                mock.patch('Utils.openapi.generate_schema') as generate:
+            response = self.client.get(reverse('schema-json', kwargs={'format': '.yaml'}))
+        generate.assert_not_called()
+        with open(os.path.join(directory, 'swagger.yaml'), 'rb') as source:
+            self.assertEqual(response.content, source.read())
+
+    def test_ui_points_at_cached_schema(self):
+        response = self.client.get(reverse('schema-swagger-ui'))
+        self.assertContains(response, reverse('schema-json', kwargs={'format': '.json'}))
+
+
+class BootBudgetTests(TestCase):
+    # what one gunicorn worker may cost to boot, measured in a fresh interpreter
+    BOOT_SECONDS = 3.0
+    BOOT_RSS_MB = 100
+    DOCS_AND_ADMIN_MODULES = {'drf_yasg', 'jazzmin', 'import_export', 'Utils.openapi', 'User.admin'}
+
+    def test_api_only_worker_within_budget(self):
+        profile = measure_boot({'ADMIN_ENABLED': 'False', 'DOCS_ENABLED': 'False'})
+        self.assertLess(profile.seconds, self.BOOT_SECONDS)
+        self.assertLess(profile.rss_mb, self.BOOT_RSS_MB)
+        self.assertIn('User.views', profile.modules)
+        self.assertFalse(self.DOCS_AND_ADMIN_MODULES & profile.modules)
+
+    def test_parse_importtime(self):
+        costs = parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |     yaml.error\n"
+            "import time:       300 |        400 |   yaml\n"
+            "import time:        50 |         50 |   rest_framework.compat\n"
+            "import time:        20 |        470 | rest_framework\n"
+        )
+        self.assertEqual(
+            [(cost.module, cost.cumulative_us, cost.imported_by) for cost in costs],
+            [('yaml.error', 100, 'yaml'), ('yaml', 400, 'rest_framework'),
+             ('rest_framework.compat', 50, 'rest_framework'), ('rest_framework', 470, None)],
+        )
+
+    def test_profile_command(self):
+        out = io.StringIO()
+        call_command('profile_imports', '--top', '5', stdout=out)
+        self.assertRegex(out.getvalue(), r'boot: \d+ ms, max RSS [\d.]+ MB')
+        self.assertEqual(len(out.getvalue().splitlines()), 7)
+
+    def test_gunicorn_master_collects_again_after_freeze(self):
+        self.addCleanup(gc.unfreeze)
+        self.addCleanup(gc.enable)
+        with mock.patch.dict(os.environ, {'GUNICORN_PRELOAD': 'True'}):
+            config = runpy.run_path(os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'))
+        self.assertFalse(gc.isenabled())
+        with mock.patch('Utils.boot.preload') as preload:
+            config['when_ready'](server=None)
+        preload.assert_called_once()
+        self.assertGreater(gc.get_freeze_count(), 0)
+        self.assertTrue(gc.isenabled())
+
+
+class StaticAssetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # STATIC_ROOT is build output, not in the repo; collect it as a deploy would
+        static_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, static_root)
+        cls.enterClassContext(override_settings(STATIC_ROOT=static_root))
+        call_command('collectstatic', '--noinput', verbosity=0)
+
+    def asset_url(self):
+        html = self.client.get(reverse('admin:login')).content.decode()
+        return re.search(r'href="(/static/jazzmin/css/main\.[0-9a-f]{12}\.css)"', html)[1]
+
+    def test_hashed_asset_is_immutable_and_precompressed(self):
+        response = self.client.get(self.asset_url(), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response.close()
+
+    def test_plain_name_still_served(self):
+        response = self.client.get('/static/jazzmin/css/main.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response.close()
+
+    def test_uncollected_asset_keeps_plain_name(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        with override_settings(STATIC_ROOT=static_root):
+            self.assertEqual(staticfiles_storage.url('jazzmin/css/main.css'), '/static/jazzmin/css/main.css')
+
+
+class ChangelistCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            matric_number='ADMIN/4', password='admin123', first_name='Ad', last_name='Min'
+        )
+        User.objects.bulk_create([
+            User(matric_number=f'CNT/25/{i:04d}', first_name='Co', last_name=f'Unt{i}',
+                 user_type=UserType.list()[i % 4])
+            for i in range(250)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def changelist(self, query_string=''):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin:User_user_changelist') + query_string)
+        self.assertEqual(response.status_code, 200)
+        table = User._meta.db_table
+        return response, [q['sql'] for q in ctx.captured_queries if f'FROM "{table}"' in q['sql']]
+
+    def test_next_page_reads_after_previous_one(self):
+        self.changelist('?p=1')
+        response, queries = self.changelist('?p=2')
+        page = [user.pk for user in response.context['cl'].result_list]
+        self.assertEqual(page, list(User.objects.order_by('-pk').values_list('pk', flat=True)[100:200]))
+        self.assertFalse([sql for sql in queries if 'OFFSET' in sql])
+        self.assertFalse([sql for sql in queries if 'COUNT(' in sql])  # cached by the first load
+
+    def test_facet_counts_cached(self):
+        response, queries = self.changelist('?_facets=True')
+        self.assertContains(response, 'doctor (63)')
+        response, repeat = self.changelist('?_facets=True')
+        self.assertContains(response, 'doctor (63)')
+        self.assertLess(len(repeat), len(queries))
+
+    def test_large_totals_estimated(self):
+        queryset = User.objects.order_by('-pk')
+        with mock.patch('Utils.changelist.estimated_count', return_value=2_000_000), self.assertNumQueries(0):
+            self.assertEqual(ChangelistPaginator(queryset, 100).count, 2_000_000)
+
+    def test_filtered_totals_are_exact(self):
+        filtered = User.objects.filter(user_type=UserType.DOCTOR)
+        with mock.patch('Utils.changelist.POSTGRES_ENGINES', {connection.settings_dict['ENGINE']}):
+            with self.assertNumQueries(0):
+                self.assertIsNone(estimated_count(filtered))
+            self.assertEqual(ChangelistPaginator(filtered.order_by('-pk'), 100).count, filtered.count())
+
+    def test_offset_without_total_order(self):
+        self.assertIsNone(keyset_columns(User.objects.order_by('staff_id', 'pk')))
+        self.assertIsNone(keyset_columns(User.objects.order_by('last_name')))
+        self.assertEqual(keyset_columns(User.objects.order_by('-date_joined', '-pk')), [('date_joined', True), ('id', True)])
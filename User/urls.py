@@ -1,7 +1,9 @@
 from django.urls import path
+from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
-    register_student, login_user, 
-    register_staff
+    register_student, login_user, login_user_async,
+    register_staff, bulk_register_students, bulk_register_staff, search_users,
+    roster_users
 )
 
 app_name = 'user'
@@ -11,6 +13,12 @@ BASE_URL = app_name
 urlpatterns = [
     path(f'{BASE_URL}/register/student/', register_student, name='register_student'),
     path(f'{BASE_URL}/login/', login_user, name='login_user'),
+    path(f'{BASE_URL}/login/async/', login_user_async, name='login_user_async'),
+    path(f'{BASE_URL}/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path(f'{BASE_URL}/search/', search_users, name='search_users'),
+    path(f'{BASE_URL}/roster/', roster_users, name='roster_users'),
 
     path(f'{BASE_URL}/register/staff/', register_staff, name='register_staff'),
+    path(f'{BASE_URL}/register/students/bulk/', bulk_register_students, name='bulk_register_students'),
+    path(f'{BASE_URL}/register/staff/bulk/', bulk_register_staff, name='bulk_register_staff'),
 ]
\ No newline at end of file
@@ -1,16 +1,37 @@
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes, renderer_classes
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.parsers import MultiPartParser
 from .models import User, UserType
-from Utils.user import authenticate
-from .serializers import StudentSerializer
-from drf_yasg.utils import swagger_auto_schema
-from drf_yasg import openapi
-from django.http import HttpResponse
+from Utils.user import authenticate, aauthenticate
+from Utils.hashing import HashPoolSaturated
+from Utils.throttle import check_login_throttle, record_login_result, retry_after_header
+from Utils.routers import render_routing_prometheus
+from Utils import registration
+from Utils.bulk import StaffImporter, StudentImporter, detect_format, read_rows
+from Utils.hashers import default_staff_password_hash
+from Utils.uploads import stage_image_upload
+from Utils import search as user_search
+from Utils import roster
+from Utils import metrics
+from .permissions import IsClinicStaff, IsSuperUser
+from .serializers import StudentSerializer, UserSearchSerializer
+from .pagination import UserSearchPagination
+from Utils.docs import openapi, swagger_auto_schema
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from asgiref.sync import sync_to_async
+import io
+import json
 from django.contrib import messages
 from django.shortcuts import render, redirect
 from django.conf import settings 
+from django.db import IntegrityError, router, transaction
+import zipfile
 
 @swagger_auto_schema(
     method="post",
@@ -65,6 +86,7 @@ from django.conf import settings
                         "serial_number": 56,
                         "year_of_admission": 2025,
                         "profile_image": "https://res.cloudinary.com/health-plus/user_profile_images/default.png",
+                        "profile_image_thumbnail": "https://res.cloudinary.com/health-plus/user_profile_images/default.png",
                         "date_joined": "2025-10-19T12:34:56Z"
                     },
                     "tokens": {
@@ -106,54 +128,21 @@ from django.conf import settings
 @api_view(['POST'])
 def register_student(request):
 
-    matric_number = request.data.get('matric_number')
-    first_name = request.data.get('first_name')
-    middle_name = request.data.get('middle_name')
-    last_name = request.data.get('last_name')
-    serial_number = request.data.get('serial_number')
-    password = request.data.get('password')
-    confirm_password = request.data.get('confirm_password')
-
-    if not (matric_number and first_name and last_name and password and confirm_password):
-        return Response({
-            "status": False,
-            "message": "All fields are required"
-        }, status=status.HTTP_400_BAD_REQUEST)
-
-    if User.objects.filter(matric_number=matric_number).exists():
+    try:
+        new_user, tokens = registration.register_student(request.data)
+    except registration.RegistrationError as e:
         return Response({
             "status": False,
-            "message": "A user with this matric number exists"
+            "message": e.message
         }, status=status.HTTP_400_BAD_REQUEST)
-    
-    if not (password == confirm_password):
-        return Response({
-            "status": False,
-            "message": "Passwords do not match"
-        }, status=status.HTTP_400_BAD_REQUEST)
-
-    new_user = User.objects.create_user(
-        matric_number = matric_number,
-        first_name = first_name,
-        last_name = last_name,
-    )
-
-    if not serial_number:
-        last_created_user = User.objects.first()
-        serial_number = last_created_user.serial_number
-
-    if middle_name:
-        new_user.middle_name = middle_name
-   
-    new_user.serial_number = serial_number
-    new_user.save()
 
-    serializer = StudentSerializer(new_user)
+    with metrics.timer('serialize'):
+        user_data = StudentSerializer(new_user).data
     response = {
         "status": True,
         "message": "Account created successfully",
-        "user": serializer.data,
-        "tokens": new_user.auth_tokens()
+        "user": user_data,
+        "tokens": tokens
     }
     return Response(response, status=status.HTTP_201_CREATED)
 
@@ -168,6 +157,7 @@ def register_student(request):
     - Returns user details and JWT access & refresh tokens on success.
     - Account must be active to log in.
     - Invalid credentials return `401 Unauthorized`.
+    - Too many failed attempts from one address or against one account return `429`; wait for the `Retry-After` seconds. Each further lockout is twice as long.
 
     **Authentication:** Not required.
     """,
@@ -201,6 +191,7 @@ def register_student(request):
                             "serial_number": 56,
                             "year_of_admission": 2025,
                             "profile_image": "https://res.cloudinary.com/health-plus/user_profile_images/default.png",
+                            "profile_image_thumbnail": "https://res.cloudinary.com/health-plus/user_profile_images/default.png",
                             "date_joined": "2025-10-19T12:34:56Z"
                         },
                         "tokens": {
@@ -237,6 +228,15 @@ def register_student(request):
                     "message": "Account is deactivated"
                 }
             }
+        ),
+        429: openapi.Response(
+            description="Locked out after too many failed attempts",
+            examples={
+                "application/json": {
+                    "status": False,
+                    "message": "Too many failed login attempts, please try again later."
+                }
+            }
         )
     }
 )
@@ -253,11 +253,21 @@ def login_user(request):
             "message": "matric number or staff ID and password are required"
         }, status=status.HTTP_400_BAD_REQUEST)
     
+    throttle_keys, retry_after = check_login_throttle(request, matric_number, staff_id)
+    if retry_after:
+        return Response({
+            "status": False,
+            "message": "Too many failed login attempts, please try again later."
+        }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': retry_after_header(retry_after)})
+
     if matric_number:
         user = authenticate(matric_number=matric_number, password=password)
     if staff_id:
         user = authenticate(staff_id=staff_id, password=password)
 
+    # a right password on a deactivated account is still a failed login;
+    # it must not clear the counter a guesser is building up
+    record_login_result(throttle_keys, user is not None and user.is_active)
     if user is None:
         return Response({
             "status": False,
@@ -270,16 +280,356 @@ def login_user(request):
             "message": "Account is deactivated"
         }, status=status.HTTP_403_FORBIDDEN)
     
-    serializer = StudentSerializer(user)
+    with metrics.timer('serialize'):
+        user_data = StudentSerializer(user).data
     return Response({
         "status": True,
         "message": "Login successful",
         "data": {
-            "user": serializer.data,
+            "user": user_data,
             "tokens": user.auth_tokens()
         }
     }, status=status.HTTP_200_OK)
 
+@csrf_exempt
+@require_POST
+async def login_user_async(request):
+    # Async twin of login_user for ASGI workers: the password hash runs in a
+    # bounded worker pool so the event loop stays free during a login storm.
+    # Takes the same JSON or form bodies as login_user.
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return JsonResponse({
+                "status": False,
+                "message": "Request body must be a JSON object"
+            }, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        data = request.POST
+
+    matric_number = data.get('matric_number')
+    staff_id = data.get('staff_id')
+    password = data.get('password')
+
+    if not ((matric_number or staff_id) and password):
+        return JsonResponse({
+            "status": False,
+            "message": "matric number or staff ID and password are required"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # the throttle talks to the shared cache synchronously, so keep it off
+    # the event loop
+    throttle_keys, retry_after = await sync_to_async(check_login_throttle)(request, matric_number, staff_id)
+    if retry_after:
+        response = JsonResponse({
+            "status": False,
+            "message": "Too many failed login attempts, please try again later."
+        }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = retry_after_header(retry_after)
+        return response
+
+    try:
+        if staff_id:
+            user = await aauthenticate(staff_id=staff_id, password=password)
+        else:
+            user = await aauthenticate(matric_number=matric_number, password=password)
+    except HashPoolSaturated:
+        response = JsonResponse({
+            "status": False,
+            "message": "Too many login attempts in progress, please try again shortly."
+        }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = '1'
+        return response
+
+    await sync_to_async(record_login_result)(throttle_keys, user is not None and user.is_active)
+    if user is None:
+        return JsonResponse({
+            "status": False,
+            "message": "Invalid login credentials."
+        }, status=status.HTTP_401_UNAUTHORIZED)
+
+    if not user.is_active:
+        return JsonResponse({
+            "status": False,
+            "message": "Account is deactivated"
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    with metrics.timer('serialize'):
+        user_data = await sync_to_async(lambda: StudentSerializer(user).data)()
+    tokens = await sync_to_async(user.auth_tokens)()
+    return JsonResponse({
+        "status": True,
+        "message": "Login successful",
+        "data": {
+            "user": user_data,
+            "tokens": tokens
+        }
+    }, status=status.HTTP_200_OK)
+
+@swagger_auto_schema(
+    method="post",
+    tags=["Admin"],
+    operation_summary="Register students in bulk",
+    operation_description="""
+    Registers a whole intake of students from an uploaded CSV (with a header row) or JSONL file.
+
+    **Notes for Frontend:**
+    - Columns: `matric_number`, `first_name`, `middle_name`, `last_name`, `password`, and optionally `year_of_admission` and `serial_number`.
+    - Rows that fail validation or whose matric number already exists are skipped and reported in `errors`; the rest are still created.
+    - For very large intakes prefer the `bulk_register_students` management command.
+
+    **Authentication:** Required (administrators only).
+    """,
+    manual_parameters=[
+        openapi.Parameter("file", openapi.IN_FORM, type=openapi.TYPE_FILE, required=True, description="CSV or JSONL file of students."),
+        openapi.Parameter("format", openapi.IN_FORM, type=openapi.TYPE_STRING, enum=["csv", "jsonl"], description="Defaults to the file extension."),
+    ],
+    responses={
+        200: openapi.Response(
+            description="Import finished",
+            examples={
+                "application/json": {
+                    "status": True,
+                    "message": "Import finished",
+                    "data": {
+                        "created": 2,
+                        "failed": 1,
+                        "errors": [
+                            {"row": 3, "matric_number": "CSC/20/1234", "message": "A user with this matric number exists"}
+                        ]
+                    }
+                }
+            }
+        ),
+        400: openapi.Response(
+            description="No file uploaded",
+            examples={
+                "application/json": {
+                    "status": False,
+                    "message": "A CSV or JSONL file is required"
+                }
+            }
+        ),
+    }
+)
+@api_view(['POST'])
+@permission_classes([IsSuperUser])
+@parser_classes([MultiPartParser])
+def bulk_register_students(request):
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({
+            "status": False,
+            "message": "A CSV or JSONL file is required"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    fmt = request.data.get('format') or detect_format(upload.name)
+    if fmt not in ('csv', 'jsonl'):
+        return Response({
+            "status": False,
+            "message": "Format must be csv or jsonl"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+    result = StudentImporter(executor=settings.LOGIN_HASH_EXECUTOR).run(read_rows(stream, fmt))
+    return Response({
+        "status": True,
+        "message": "Import finished",
+        "data": result.as_dict()
+    }, status=status.HTTP_200_OK)
+
+@swagger_auto_schema(
+    method="get",
+    tags=["Users"],
+    operation_summary="Search users by name or matric number",
+    operation_description="""
+    Finds users by partial name or by matric number / staff ID prefix.
+
+    **Notes for Frontend:**
+    - Every word typed must match the start of one of the user's names, so `jo do` finds "John Doe". Accents and case are ignored.
+    - A query containing a digit or `/` is matched against the start of matric numbers and staff IDs instead.
+    - Results are cursor-paginated; follow `next` / `previous` rather than building page numbers.
+    - If the search takes longer than the server's latency budget it fails with `503`; ask the user to type more of the name.
+
+    **Authentication:** Required (clinic staff only).
+    """,
+    manual_parameters=[
+        openapi.Parameter("q", openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True, description="At least 2 characters."),
+        openapi.Parameter("page_size", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Results per page (max 100, default 20)."),
+        openapi.Parameter("cursor", openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Opaque cursor taken from `next` / `previous`."),
+    ],
+    responses={
+        200: openapi.Response(
+            description="Search results",
+            examples={
+                "application/json": {
+                    "status": True,
+                    "message": "Search results",
+                    "data": {
+                        "next": "https://api.example.com/api/user/search/?cursor=cD1qb2huKzI%3D&q=john",
+                        "previous": None,
+                        "results": [
+                            {
+                                "matric_number": "CSC/20/1234",
+                                "first_name": "John",
+                                "last_name": "Doe",
+                                "middle_name": "",
+                                "user_type": "student",
+                                "serial_number": 56,
+                                "year_of_admission": 2025,
+                                "profile_image": "https://res.cloudinary.com/health-plus/user_profile_images/default.png",
+                                "profile_image_thumbnail": "https://res.cloudinary.com/health-plus/user_profile_images/default.png",
+                                "date_joined": "2025-10-19T12:34:56Z",
+                                "staff_id": None
+                            }
+                        ]
+                    }
+                }
+            }
+        ),
+        400: openapi.Response(
+            description="Query too short",
+            examples={
+                "application/json": {
+                    "status": False,
+                    "message": "Search query must be at least 2 characters"
+                }
+            }
+        ),
+        503: openapi.Response(
+            description="Search exceeded the latency budget",
+            examples={
+                "application/json": {
+                    "status": False,
+                    "message": "Search took too long, please refine your query"
+                }
+            }
+        ),
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsClinicStaff])
+def search_users(request):
+    query = request.query_params.get('q', '').strip()
+    if len(query) < 2:
+        return Response({
+            "status": False,
+            "message": "Search query must be at least 2 characters"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = UserSearchPagination()
+    # chosen before the deadline opens a transaction, which would pin the
+    # read to default; the budget then applies where the search runs
+    alias = router.db_for_read(User)
+    try:
+        with user_search.query_deadline(settings.USER_SEARCH_BUDGET_MS, using=alias):
+            page = paginator.paginate_queryset(user_search.search_users(query, using=alias), request)
+            with metrics.timer('serialize'):
+                results = UserSearchSerializer(page, many=True).data
+    except user_search.SearchTimeout:
+        return Response({
+            "status": False,
+            "message": "Search took too long, please refine your query"
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    return Response({
+        "status": True,
+        "message": "Search results",
+        "data": {
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "results": results
+        }
+    }, status=status.HTTP_200_OK)
+
+@swagger_auto_schema(
+    method="get",
+    tags=["Users"],
+    operation_summary="List users for clinic rosters",
+    operation_description="""
+    Lists users in the order they joined, optionally filtered. Each entry has exactly the fields of the other user listings.
+
+    **Notes for Frontend:**
+    - Results are cursor-paginated; follow `next` until it is `null`. There is no page count or total.
+    - `page_size` defaults to 500 and is capped at 1000.
+
+    **Authentication:** Required (clinic staff only).
+    """,
+    manual_parameters=[
+        openapi.Parameter("user_type", openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=UserType.list()),
+        openapi.Parameter("year_of_admission", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        openapi.Parameter("verified_staff", openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+        openapi.Parameter("page_size", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Results per page (max 1000, default 500)."),
+        openapi.Parameter("cursor", openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Opaque cursor taken from `next`."),
+    ],
+    responses={
+        200: openapi.Response(
+            description="Roster page",
+            examples={
+                "application/json": {
+                    "status": True,
+                    "message": "Roster",
+                    "data": {
+                        "next": "https://api.example.com/api/user/roster/?cursor=MjAyNS0xMC0xOVQxMjozNDo1NiswMDowMHw1Ng%3D%3D",
+                        "results": [
+                            {
+                                "matric_number": "CSC/20/1234",
+                                "first_name": "John",
+                                "last_name": "Doe",
+                                "middle_name": "",
+                                "user_type": "student",
+                                "serial_number": 56,
+                                "year_of_admission": 2025,
+                                "profile_image": "https://res.cloudinary.com/health-plus/user_profile_images/default.png",
+                                "profile_image_thumbnail": "https://res.cloudinary.com/health-plus/user_profile_images/default.png",
+                                "date_joined": "2025-10-19T12:34:56+01:00"
+                            }
+                        ]
+                    }
+                }
+            }
+        ),
+        400: openapi.Response(
+            description="Invalid filter or cursor",
+            examples={
+                "application/json": {
+                    "status": False,
+                    "message": "verified_staff must be true or false"
+                }
+            }
+        ),
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsClinicStaff])
+@renderer_classes([roster.RosterJSONRenderer])
+def roster_users(request):
+    # values() rows and plain dicts instead of StudentSerializer: a roster
+    # page is hundreds of rows and DRF's per-field dispatch dominated it
+    try:
+        condition = roster.roster_filters(request.query_params)
+        page_size = roster.roster_page_size(request.query_params)
+        rows, cursor = roster.roster_page(condition, request.query_params.get('cursor'), page_size)
+    except roster.InvalidRosterQuery as e:
+        return Response({
+            "status": False,
+            "message": str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    with metrics.timer('serialize'):
+        results = roster.serialize_roster(rows)
+    return Response({
+        "status": True,
+        "message": "Roster",
+        "data": {
+            "next": replace_query_param(request.build_absolute_uri(), 'cursor', cursor) if cursor else None,
+            "results": results
+        }
+    }, status=status.HTTP_200_OK)
+
 def register_staff(request):
     if not request.user.is_superuser:
         return HttpResponse("403 Forbidden")
@@ -295,30 +645,141 @@ def register_staff(request):
 
         if not (first_name and last_name and staff_id and staff_type):
             messages.error(request, 'All fields are required')
-            return redirect('register_staff')
+            return redirect('user:register_staff')
         
         if staff_type not in user_types:
             messages.error(request, 'Invalid staff type entered')
-            return redirect('register_staff')
+            return redirect('user:register_staff')
         
-        new_user = User.objects.create_user(
+        # one INSERT, with the default password hashed once per process rather
+        # than per staff; the ID image is uploaded in the background
+        new_user = User(
             first_name = first_name,
             last_name = last_name,
             staff_id = staff_id,
             user_type = staff_type,
-            password = settings.DEFAULT_STAFF_PASSWORD,
+            password = default_staff_password_hash(),
             is_staff = True
         )
+        try:
+            with transaction.atomic():
+                new_user.save(force_insert=True)
+        except IntegrityError:
+            messages.error(request, 'A staff member with this staff ID exists')
+            return redirect('user:register_staff')
 
         if staff_id_image:
-            new_user.staff_id_img = staff_id_image
-            new_user.save()
+            stage_image_upload(new_user, 'staff_id_img', staff_id_image)
+            messages.success(request, 'Staff created succesfully with default password, staff ID image upload pending')
+            return redirect('user:register_staff')
 
         messages.success(request, 'Staff created succesfully with default password')
-        return redirect('register_staff')
+        return redirect('user:register_staff')
     
     context = {
         'user_types': user_types
     }
 
-    return render(request, 'register_staff.html', context)
\ No newline at end of file
+    return render(request, 'register_staff.html', context)
+
+@swagger_auto_schema(
+    method="post",
+    tags=["Admin"],
+    operation_summary="Register staff in bulk",
+    operation_description="""
+    Registers a hospital's staff roster from an uploaded CSV (with a header row) or JSONL file, with an optional zip of staff ID card images.
+
+    **Notes for Frontend:**
+    - Columns: `staff_id`, `first_name`, `middle_name`, `last_name`, `staff_type`, and optionally `staff_id_img`, the file name of the staff's ID card inside the zip.
+    - Every new staff member gets the default staff password.
+    - Staff IDs that already exist are left untouched and counted in `skipped`, so a failed import can be re-sent as is.
+    - Rows that fail validation, and images that are missing or fail to upload, are reported in `errors`; the rest are still created.
+
+    **Authentication:** Required (administrators only).
+    """,
+    manual_parameters=[
+        openapi.Parameter("file", openapi.IN_FORM, type=openapi.TYPE_FILE, required=True, description="CSV or JSONL file of staff."),
+        openapi.Parameter("images", openapi.IN_FORM, type=openapi.TYPE_FILE, description="Zip archive of staff ID card images."),
+        openapi.Parameter("format", openapi.IN_FORM, type=openapi.TYPE_STRING, enum=["csv", "jsonl"], description="Defaults to the file extension."),
+    ],
+    responses={
+        200: openapi.Response(
+            description="Import finished",
+            examples={
+                "application/json": {
+                    "status": True,
+                    "message": "Import finished",
+                    "data": {
+                        "created": 2,
+                        "failed": 1,
+                        "errors": [
+                            {"row": 3, "staff_id": "NUR/0012", "message": "Image NUR-0012.jpg not found in archive"}
+                        ],
+                        "skipped": 1,
+                        "images_uploaded": 1
+                    }
+                }
+            }
+        ),
+        400: openapi.Response(
+            description="Missing or unreadable upload",
+            examples={
+                "application/json": {
+                    "status": False,
+                    "message": "A CSV or JSONL file is required"
+                }
+            }
+        ),
+    }
+)
+@api_view(['POST'])
+@permission_classes([IsSuperUser])
+@parser_classes([MultiPartParser])
+def bulk_register_staff(request):
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({
+            "status": False,
+            "message": "A CSV or JSONL file is required"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    fmt = request.data.get('format') or detect_format(upload.name)
+    if fmt not in ('csv', 'jsonl'):
+        return Response({
+            "status": False,
+            "message": "Format must be csv or jsonl"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    images = None
+    if request.FILES.get('images') is not None:
+        try:
+            images = zipfile.ZipFile(request.FILES['images'])
+        except zipfile.BadZipFile:
+            return Response({
+                "status": False,
+                "message": "Images must be a zip archive"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+    result = StaffImporter().run(read_rows(stream, fmt), images)
+    return Response({
+        "status": True,
+        "message": "Import finished",
+        "data": result.as_dict()
+    }, status=status.HTTP_200_OK)
+
+
+def metrics_endpoint(request):
+    # Prometheus text format, summed over every worker sharing METRICS_DIR
+    if not metrics.metrics_exposed():
+        raise Http404()
+
+    token = settings.METRICS_AUTH_TOKEN
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+
+    body = metrics.render_prometheus(metrics.get_registry().collect())
+    if settings.DATABASE_REPLICAS:
+        # per worker, unlike the request metrics
+        body += render_routing_prometheus()
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
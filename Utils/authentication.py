@@ -0,0 +1,148 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+# Copied from the user into every token at login, so most requests can be
+# authorised from the token alone. They are only as fresh as the token: a
+# change to user_type or verified_staff reaches requests at the next refresh
+# or login, so can take up to ACCESS_TOKEN_LIFETIME (a day). Deactivation is
+# the exception, checked on every request by is_user_revoked().
+USER_CLAIMS = ('user_type', 'is_active', 'verified_staff')
+
+
+def _revocation_key(user_id):
+    return f'jwt-revoked-user:{user_id}'
+
+
+def revocation_cache():
+    # None without JWT_REVOCATION_CACHE: deactivations are then read from the database
+    alias = settings.JWT_REVOCATION_CACHE
+    return caches[alias] if alias else None
+
+
+def revoke_user_tokens(*user_ids):
+    # Outstanding access tokens still say is_active=True; remember the
+    # deactivation for as long as any of them can live.
+    cache = revocation_cache()
+    if cache is not None and user_ids:
+        timeout = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+        cache.set_many({_revocation_key(user_id): True for user_id in user_ids}, timeout)
+
+
+def restore_user_tokens(*user_ids):
+    cache = revocation_cache()
+    if cache is not None and user_ids:
+        cache.delete_many([_revocation_key(user_id) for user_id in user_ids])
+
+
+def is_user_revoked(user_id) -> bool:
+    cache = revocation_cache()
+    if cache is None:
+        # one primary-key lookup; deleted users count as revoked too
+        return not get_user_model().objects.filter(pk=user_id, is_active=True).exists()
+    return bool(cache.get(_revocation_key(user_id)))
+
+
+# backends that each worker keeps to itself (or that keep nothing)
+UNSHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.security, checks.Tags.caches)
+def check_revocation_cache(app_configs=None, **kwargs):
+    alias = settings.JWT_REVOCATION_CACHE
+    if not alias:
+        if settings.PRODUCTION:
+            return [checks.Error(
+                "JWT_REVOCATION_CACHE is not set, so every authenticated request looks up "
+                "the user in the database.",
+                hint="Point JWT_REVOCATION_CACHE at a cache shared by every worker, such as Redis.",
+                id='User.E003',
+            )]
+        return []
+    if alias not in settings.CACHES:
+        return [checks.Error(f"JWT_REVOCATION_CACHE {alias!r} is not in CACHES.", id='User.E001')]
+    if settings.CACHES[alias]['BACKEND'] in UNSHARED_CACHE_BACKENDS:
+        return [checks.Error(
+            f"JWT_REVOCATION_CACHE {alias!r} is not shared between workers, so a user "
+            "deactivated on one stays signed in on the others.",
+            hint="Use a shared cache such as Redis, or unset JWT_REVOCATION_CACHE to check the database.",
+            id='User.E002',
+        )]
+    return []
+
+
+class ClaimsTokenUser(TokenUser):
+    """
+    Request user built from the access token's claims. Attributes that are not
+    in the token (and permission checks) load the real ``User`` row on first
+    use, so only views that need more than the claims pay for the query.
+    """
+
+    @cached_property
+    def instance(self):
+        return get_user_model().objects.get(pk=self.id)
+
+    @cached_property
+    def is_active(self):
+        if 'is_active' in self.token:
+            return self.token['is_active']
+        return self.instance.is_active
+
+    @cached_property
+    def is_staff(self):
+        return self.instance.is_staff
+
+    @cached_property
+    def is_superuser(self):
+        return self.instance.is_superuser
+
+    @property
+    def groups(self):
+        return self.instance.groups
+
+    @property
+    def user_permissions(self):
+        return self.instance.user_permissions
+
+    def get_group_permissions(self, obj=None):
+        return self.instance.get_group_permissions(obj)
+
+    def get_all_permissions(self, obj=None):
+        return self.instance.get_all_permissions(obj)
+
+    def has_perm(self, perm, obj=None):
+        return self.instance.has_perm(perm, obj)
+
+    def has_perms(self, perm_list, obj=None):
+        return self.instance.has_perms(perm_list, obj)
+
+    def has_module_perms(self, module):
+        return self.instance.has_module_perms(module)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.instance, attr)
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    # Drop-in replacement for JWTAuthentication that skips the per-request
+    # user SELECT; see ClaimsTokenUser.
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if is_user_revoked(user.id) or not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,372 @@
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.client import HTTPConnection
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+from django.utils import timezone
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+@contextmanager
+def throwaway_database(verbosity=0, on_disk=False):
+    # Benchmarks seed and hammer a fresh test database (test_<NAME>, or an
+    # in-memory one on SQLite) so they can never touch real data.
+    if on_disk:
+        _use_sqlite_file()
+    setup_test_environment()
+    old_config = setup_databases(verbosity=verbosity, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def _use_sqlite_file():
+    # Shared-cache in-memory SQLite fails concurrent writers straight away with
+    # "table is locked"; a file database makes them wait their turn instead.
+    settings_dict = connections['default'].settings_dict
+    if settings_dict['ENGINE'] != 'django.db.backends.sqlite3':
+        return
+    settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), f'benchmark_{os.getpid()}.sqlite3')
+    settings_dict['OPTIONS'] = {**settings_dict['OPTIONS'], 'timeout': 30, 'transaction_mode': 'IMMEDIATE'}
+
+
+def run_timed(func, iterations: int) -> dict:
+    latencies = []
+    queries = []
+    for i in range(iterations):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            func(i)
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(ctx.captured_queries))
+    return summarize(latencies, queries)
+
+
+def summarize(latencies, queries=None, elapsed=None) -> dict:
+    # without a wall-clock time the requests are assumed to have run one after
+    # another, as in run_timed()
+    total = elapsed if elapsed is not None else sum(latencies)
+    return {
+        'requests': len(latencies),
+        'throughput': len(latencies) / total if total else 0.0,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'queries_per_request': statistics.fmean(queries) if queries else 0.0,
+        'max_queries': max(queries) if queries else 0,
+    }
+
+
+def format_summary(label: str, summary: dict) -> str:
+    return (
+        f"{label}: {summary['requests']} requests, "
+        f"{summary['queries_per_request']:.1f} queries/request, "
+        f"p50 {summary['p50_ms']:.2f}ms, p95 {summary['p95_ms']:.2f}ms, "
+        f"p99 {summary['p99_ms']:.2f}ms, {summary['throughput']:.0f} req/s"
+        + (f", {summary['errors']} errors" if summary.get('errors') else '')
+    )
+
+
+# Highest number of queries each auth endpoint may issue per request (cold
+# credential cache, existing serial counter). A change that needs more must
+# raise the budget here on purpose; one that needs fewer should lower it.
+QUERY_BUDGETS = {
+    'login': 4,
+    'login_async': 4,
+    'register_student': 6,
+    'register_staff': 5,
+}
+
+DEPARTMENTS = ('CSC', 'MCB', 'NSC', 'MED', 'ACC', 'LAW', 'BCH', 'ANA', 'PHS', 'MLS')
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+
+def matric_number(index: int, year: int) -> str:
+    # CSC/21/0001, MCB/21/0001, ... the way the registry hands them out
+    department = DEPARTMENTS[index % len(DEPARTMENTS)]
+    return f'{department}/{year % 100:02d}/{index // len(DEPARTMENTS) + 1:04d}'
+
+
+def seed_students(count: int, password: str, years=None, batch_size=1000):
+    # Every seeded student shares one password hash, so seeding 100k users
+    # costs one hash rather than 100k of them. Spread over the last five
+    # intakes by default, including this year's, so its counter exists.
+    from User.models import User, UserType
+    from Utils.serials import reserve_serial_numbers
+
+    if years is None:
+        this_year = timezone.now().year
+        years = range(this_year - 4, this_year + 1)
+    encoded = make_password(password)
+    per_year = [count // len(years) + (i < count % len(years)) for i in range(len(years))]
+    matric_numbers = []
+    for year, year_count in zip(years, per_year):
+        if not year_count:
+            continue
+        last = reserve_serial_numbers(year, year_count)
+        users = []
+        for index, serial_number in enumerate(range(last - year_count + 1, last + 1)):
+            user = User(
+                matric_number=matric_number(index, year),
+                first_name=f'Student{index}',
+                last_name=DEPARTMENTS[index % len(DEPARTMENTS)].title(),
+                user_type=UserType.STUDENT,
+                year_of_admission=year,
+                serial_number=serial_number,
+                password=encoded,
+            )
+            user.update_search_name()
+            users.append(user)
+            matric_numbers.append(user.matric_number)
+        User.objects.bulk_create(users, batch_size=batch_size)
+    return matric_numbers
+
+
+class QueryCountMiddleware:
+    # Reports the queries a request issued in a response header, so the
+    # count survives a trip through a real server. Install it first in
+    # MIDDLEWARE so session and auth lookups are counted too.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get_response(request)
+        response[QUERY_COUNT_HEADER] = str(len(ctx.captured_queries))
+        return response
+
+
+class Scenario:
+    """
+    One endpoint under load. ``payload(i)`` builds the body of the i-th
+    request; the same description drives every server kind below.
+    """
+
+    def __init__(self, name, path, payload, expected_status, form=False, headers=None, method='POST'):
+        self.name = name
+        self.path = path
+        self.payload = payload
+        self.expected_status = expected_status
+        self.form = form
+        self.headers = headers or {}
+        self.method = method
+
+    @property
+    def content_type(self):
+        return 'application/x-www-form-urlencoded' if self.form else 'application/json'
+
+    def body(self, i) -> bytes:
+        data = self.payload(i)
+        return (urlencode(data) if self.form else json.dumps(data)).encode()
+
+
+class ClientServer:
+    # Django test client: no sockets, no server, just the handler stack.
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def request(self, scenario, i):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client(raise_request_exception=False)
+        response = client.generic(
+            scenario.method, scenario.path, scenario.body(i),
+            content_type=scenario.content_type, headers=scenario.headers,
+        )
+        return response.status_code, int(response.get(QUERY_COUNT_HEADER, 0))
+
+    def close(self):
+        pass
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class WSGIServerThread:
+    # A real HTTP server on a random localhost port, one thread per connection.
+
+    def __init__(self):
+        self.httpd = make_server(
+            '127.0.0.1', 0, WSGIHandler(),
+            server_class=_ThreadingWSGIServer, handler_class=_QuietHandler,
+        )
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def request(self, scenario, i):
+        conn = HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            conn.request(
+                scenario.method, scenario.path, scenario.body(i),
+                headers={'Content-Type': scenario.content_type, **scenario.headers},
+            )
+            response = conn.getresponse()
+            response.read()
+            return response.status, int(response.getheader(QUERY_COUNT_HEADER) or 0)
+        finally:
+            conn.close()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+class ASGIServer:
+    # Django's ASGI handler driven in-process; concurrency comes from
+    # coroutines on one event loop instead of threads.
+    asynchronous = True
+
+    async def request(self, client, scenario, i):
+        response = await client.generic(
+            scenario.method, scenario.path, scenario.body(i),
+            content_type=scenario.content_type, headers=scenario.headers,
+        )
+        return response.status_code, int(response.get(QUERY_COUNT_HEADER, 0))
+
+    def close(self):
+        pass
+
+
+SERVERS = {
+    'client': ClientServer,
+    'wsgi': WSGIServerThread,
+    'asgi': ASGIServer,
+}
+
+
+class _Recorder:
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, status_code, queries):
+        with self._lock:
+            self.latencies.append(latency)
+            self.queries.append(queries)
+            if status_code != self.scenario.expected_status:
+                self.errors += 1
+
+    def fail(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+            self.errors += 1
+
+
+def _run_threads(server, scenario, requests, concurrency, recorder):
+    indexes = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    i = next(indexes, None)
+                if i is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    status_code, queries = server.request(scenario, i)
+                except Exception:
+                    recorder.fail(time.perf_counter() - start)
+                else:
+                    recorder.record(time.perf_counter() - start, status_code, queries)
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+    if concurrency == 1:
+        # in the calling thread, so it also works inside a TestCase transaction
+        worker()
+        return
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+async def _run_tasks(server, scenario, requests, concurrency, recorder):
+    indexes = iter(range(requests))
+
+    async def worker():
+        client = AsyncClient(raise_request_exception=False)
+        for i in indexes:
+            start = time.perf_counter()
+            try:
+                status_code, queries = await server.request(client, scenario, i)
+            except Exception:
+                recorder.fail(time.perf_counter() - start)
+            else:
+                recorder.record(time.perf_counter() - start, status_code, queries)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def run_scenario(server, scenario, requests: int, concurrency: int = 1) -> dict:
+    recorder = _Recorder(scenario)
+    start = time.perf_counter()
+    if getattr(server, 'asynchronous', False):
+        async_to_sync(_run_tasks)(server, scenario, requests, concurrency, recorder)
+    else:
+        _run_threads(server, scenario, requests, concurrency, recorder)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(recorder.latencies, recorder.queries, elapsed=elapsed)
+    summary['concurrency'] = concurrency
+    summary['errors'] = recorder.errors
+    return summary
+
+
+def check_budget(name: str, summary: dict, budgets=None):
+    # Returns a description of the regression, or None when within budget.
+    budget = (budgets or QUERY_BUDGETS).get(name)
+    if budget is not None and summary['max_queries'] > budget:
+        return f"{name} issued {summary['max_queries']} queries in one request, budget is {budget}"
+    return None
+
+
+def unique_ids(prefix: str):
+    # thread-safe source of identifiers that have never been registered
+    counter = itertools.count(1)
+    return lambda: f'{prefix}{next(counter):06d}'
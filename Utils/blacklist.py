@@ -0,0 +1,230 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Utils.authentication import UNSHARED_CACHE_BACKENDS, USER_CLAIMS
+from Utils.cache import LRUCache
+
+
+class RecentBlacklist:
+    """
+    Blacklisted JTIs, kept until the token would have expired anyway.
+
+    Without ``backend`` this is a per-process set of recent entries: a hit
+    rejects a replayed refresh token without touching the database, a miss
+    still falls through to the BlacklistedToken lookup, because another worker
+    may have blacklisted the token.
+
+    With ``backend`` (a cache shared by every worker) the cache holds every
+    live blacklisted JTI once warm() has loaded the table into it, and is then
+    the whole answer: a hit is revoked, a miss is not, and refreshes never
+    query BlacklistedToken. Until then, or after the cache loses the warm
+    marker (a restart, a flush), misses fall through to the database again.
+    """
+
+    WARM_KEY = 'jwt-blacklisted:warm'
+
+    def __init__(self, max_size, backend=None):
+        self.local = LRUCache(max_size)
+        self.backend_alias = backend
+
+    @property
+    def shared(self):
+        if self.backend_alias:
+            return caches[self.backend_alias]
+        return None
+
+    @staticmethod
+    def make_key(jti):
+        return f'jwt-blacklisted:{jti}'
+
+    def add(self, jti, exp):
+        ttl = exp - time.time()
+        if ttl <= 0:
+            return
+        key = self.make_key(jti)
+        self.local.set(key, True, ttl)
+        if self.shared is not None:
+            self.shared.set(key, True, ttl)
+
+    def lookup(self, jti):
+        # True if blacklisted, False if known not to be, None if only the
+        # database can tell
+        key = self.make_key(jti)
+        if self.local.get(key):
+            return True
+        shared = self.shared
+        if shared is None:
+            return None
+        found = shared.get_many([key, self.WARM_KEY])
+        if found.get(key):
+            return True
+        return False if found.get(self.WARM_KEY) else None
+
+    def __contains__(self, jti):
+        return bool(self.lookup(jti))
+
+    def warm(self, batch_size=5000, now=None) -> int:
+        # Loads every unexpired blacklisted JTI into the shared cache, then
+        # marks it warm. Tokens blacklisted meanwhile reach it through add().
+        shared = self.shared
+        if shared is None:
+            return 0
+        now = now or timezone.now()
+        rows = (
+            BlacklistedToken.objects
+            .filter(token__expires_at__gt=now)
+            .values_list('token__jti', flat=True)
+        )
+        loaded = 0
+        batch = {}
+        # one timeout for the batch: the longest any of them can still live
+        timeout = api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+        for jti in rows.iterator(chunk_size=batch_size):
+            batch[self.make_key(jti)] = True
+            if len(batch) >= batch_size:
+                shared.set_many(batch, timeout)
+                loaded += len(batch)
+                batch = {}
+        if batch:
+            shared.set_many(batch, timeout)
+            loaded += len(batch)
+        shared.set(self.WARM_KEY, True, None)
+        return loaded
+
+    def clear(self):
+        self.local.clear()
+
+
+_recent_blacklist = None
+_recent_blacklist_lock = threading.Lock()
+
+
+def get_recent_blacklist() -> RecentBlacklist:
+    global _recent_blacklist
+    if _recent_blacklist is None:
+        with _recent_blacklist_lock:
+            if _recent_blacklist is None:
+                _recent_blacklist = RecentBlacklist(
+                    max_size=settings.TOKEN_BLACKLIST_RECENT_SIZE,
+                    backend=settings.TOKEN_BLACKLIST_CACHE,
+                )
+    return _recent_blacklist
+
+
+@receiver(setting_changed)
+def reset_recent_blacklist(*, setting, **kwargs):
+    global _recent_blacklist
+    if setting in ('TOKEN_BLACKLIST_RECENT_SIZE', 'TOKEN_BLACKLIST_CACHE'):
+        _recent_blacklist = None
+
+
+@checks.register(checks.Tags.security, checks.Tags.caches)
+def check_blacklist_cache(app_configs=None, **kwargs):
+    # once warm the cache alone decides, so a per-process one would let other
+    # workers accept blacklisted tokens
+    alias = settings.TOKEN_BLACKLIST_CACHE
+    if alias and alias not in settings.CACHES:
+        return [checks.Error(f"TOKEN_BLACKLIST_CACHE {alias!r} is not in CACHES.", id='User.E004')]
+    if alias and settings.CACHES[alias]['BACKEND'] in UNSHARED_CACHE_BACKENDS:
+        return [checks.Error(
+            f"TOKEN_BLACKLIST_CACHE {alias!r} is not shared between workers.",
+            hint="Use a shared cache such as Redis, or unset TOKEN_BLACKLIST_CACHE.",
+            id='User.E005',
+        )]
+    return []
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def remember_blacklisted(sender, instance, created, **kwargs):
+    # every way a token is blacklisted (rotation, logout, the admin) lands
+    # here; a deleted entry stays cached until expiry, which only errs towards
+    # rejecting
+    if created:
+        token = instance.token
+        get_recent_blacklist().add(token.jti, token.expires_at.timestamp())
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+
+    def check_blacklist(self):
+        blacklisted = get_recent_blacklist().lookup(self.payload[api_settings.JTI_CLAIM])
+        if blacklisted:
+            raise TokenError(_("Token is blacklisted"))
+        if blacklisted is None:
+            super().check_blacklist()
+
+
+class CachedBlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    TokenRefreshSerializer whose new tokens carry the user's current
+    USER_CLAIMS, read from the row it loads anyway, instead of the ones
+    copied forward from login.
+    """
+    token_class = CachedBlacklistRefreshToken
+
+    def get_user(self, refresh):
+        try:
+            user = get_user_model().objects.get(
+                **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+            )
+        except get_user_model().DoesNotExist:
+            user = None
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        return user
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = self.get_user(refresh)
+        for claim in USER_CLAIMS:
+            refresh[claim] = getattr(user, claim)
+
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data["refresh"] = str(refresh)
+
+        return data
+
+
+def purge_expired_tokens(batch_size=5000, max_batches=None, now=None) -> int:
+    # Deletes expired outstanding tokens (and their blacklist entries) a batch
+    # at a time so each DELETE holds its locks briefly; an expired token is
+    # rejected on its exp claim alone, so its rows are dead weight.
+    now = now or timezone.now()
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(
+            OutstandingToken.objects
+            .filter(expires_at__lt=now)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        deleted += OutstandingToken.objects.filter(id__in=ids).delete()[1].get(OutstandingToken._meta.label, 0)
+        batches += 1
+    return deleted
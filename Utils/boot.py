@@ -0,0 +1,114 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+# Imported by gunicorn.conf.py before Django is set up, so nothing at module
+# level here may touch Django.
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter by measure_boot(): boots the app the way a
+# preloading gunicorn master does and prints what that cost.
+BOOT_SCRIPT = '''
+import json, resource, sys, time
+start = time.perf_counter()
+from Utils.boot import preload
+preload()
+seconds = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "seconds": seconds,
+    "rss_bytes": rss if sys.platform == "darwin" else rss * 1024,
+    "modules": sorted(sys.modules),
+}))
+'''
+
+IMPORT_TIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def preload():
+    """
+    Everything a worker would otherwise do on its first requests: settings,
+    apps, middleware, the URLconf and every view it imports, and the OpenAPI
+    schema. Run once in the gunicorn master (preload_app), the forked workers
+    share all of it instead of each building their own.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HealthPlus.settings')
+    from django.conf import settings
+    from django.db import connections
+    from django.urls import get_resolver
+    from django.utils.module_loading import import_string
+
+    application = import_string(settings.WSGI_APPLICATION)
+    get_resolver().url_patterns
+    if settings.DOCS_ENABLED:
+        from Utils.openapi import get_schema
+        get_schema()
+    # a connection left open here would be shared by every forked worker
+    connections.close_all()
+    return application
+
+
+class ImportCost:
+    __slots__ = ('module', 'self_us', 'cumulative_us', 'imported_by')
+
+    def __init__(self, module, self_us, cumulative_us, imported_by=None):
+        self.module = module
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.imported_by = imported_by
+
+
+class BootProfile:
+    def __init__(self, seconds, rss_bytes, modules, imports=()):
+        self.seconds = seconds
+        self.rss_bytes = rss_bytes
+        self.modules = frozenset(modules)
+        self.imports = list(imports)
+
+    @property
+    def rss_mb(self) -> float:
+        return self.rss_bytes / (1024 * 1024)
+
+    def by_package(self) -> dict:
+        # own import time per top-level package, in microseconds
+        totals = {}
+        for cost in self.imports:
+            package = cost.module.split('.')[0]
+            totals[package] = totals.get(package, 0) + cost.self_us
+        return totals
+
+
+def parse_importtime(output: str) -> list:
+    """
+    One ImportCost per module in ``python -X importtime`` output. The output
+    is post-order, each module after the ones it imported, one level of
+    indent deeper; the first shallower module after them is their importer.
+    """
+    costs = []
+    pending = []  # (depth, cost) still waiting for their importer
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        depth = len(match[3]) // 2
+        cost = ImportCost(match[4], int(match[1]), int(match[2]))
+        while pending and pending[-1][0] > depth:
+            pending.pop()[1].imported_by = cost.module
+        pending.append((depth, cost))
+        costs.append(cost)
+    return costs
+
+
+def measure_boot(env=None, importtime=False) -> BootProfile:
+    # boots the app in a new interpreter, with ``env`` added to this one's environment
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', BOOT_SCRIPT]
+    environ = {'DJANGO_SETTINGS_MODULE': 'HealthPlus.settings', **os.environ, **(env or {})}
+    result = subprocess.run(command, cwd=PROJECT_DIR, env=environ, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"Boot failed:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    imports = parse_importtime(result.stderr) if importtime else ()
+    return BootProfile(report['seconds'], report['rss_bytes'], report['modules'], imports)
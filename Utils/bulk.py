@@ -0,0 +1,409 @@
+import csv
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import DataError, IntegrityError, transaction
+
+from User.models import User, UserType
+from Utils.credential_cache import get_credential_cache
+from Utils.hashers import default_staff_password_hash
+from Utils.hashing import create_executor
+from Utils.serials import reserve_serial_numbers
+from Utils.uploads import get_upload_backend
+
+REQUIRED_STUDENT_FIELDS = ('matric_number', 'first_name', 'last_name', 'password')
+
+
+class BulkResult:
+    identifier = 'matric_number'
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, row_number, identifier, message):
+        self.errors.append({
+            "row": row_number,
+            self.identifier: identifier,
+            "message": message
+        })
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "failed": len(self.errors),
+            "errors": self.errors
+        }
+
+
+def detect_format(filename: str, default: str = 'csv') -> str:
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    return default
+
+
+def read_rows(stream, fmt: str = 'csv'):
+    # Yields (row_number, dict) lazily so arbitrarily large files are never
+    # held in memory; rows that cannot be parsed come through as a string error.
+    if fmt == 'jsonl':
+        for row_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = f"Invalid JSON: {e}"
+            else:
+                if not isinstance(row, dict):
+                    row = "Each line must be a JSON object"
+            yield row_number, row
+    elif fmt == 'csv':
+        # row 1 is the header
+        for row_number, row in enumerate(csv.DictReader(stream), start=2):
+            yield row_number, row
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}")
+
+
+def chunked(iterable, size: int):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def check_lengths(cleaned, names):
+    # rows too long for their column would otherwise fail the whole INSERT
+    for name in names:
+        max_length = User._meta.get_field(name).max_length
+        if len(cleaned[name]) > max_length:
+            raise ValueError(f"{name} must be at most {max_length} characters")
+
+
+def clean_student_row(row) -> dict:
+    if isinstance(row, str):
+        raise ValueError(row)
+
+    cleaned = {
+        name: (str(row.get(name) or '')).strip()
+        for name in REQUIRED_STUDENT_FIELDS + ('middle_name',)
+    }
+    # passwords are taken verbatim
+    cleaned['password'] = str(row.get('password') or '')
+
+    missing = [name for name in REQUIRED_STUDENT_FIELDS if not cleaned[name]]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    check_lengths(cleaned, ('matric_number', 'first_name', 'middle_name', 'last_name'))
+
+    for name in ('year_of_admission', 'serial_number'):
+        value = row.get(name)
+        if value in (None, ''):
+            cleaned[name] = None
+            continue
+        try:
+            cleaned[name] = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number")
+
+    return cleaned
+
+
+class StudentImporter:
+    """
+    Onboards students in chunks: validate, drop duplicates (within the file and
+    already in the database), hash passwords in parallel, then one bulk INSERT
+    per chunk. Bad rows are reported and skipped; they never abort a chunk.
+    """
+
+    def __init__(self, batch_size=1000, workers=None, executor='process', progress=None):
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.executor_type = executor
+        self.progress = progress
+
+    def run(self, rows) -> BulkResult:
+        result = BulkResult()
+        seen = set()
+        with create_executor(self.workers, self.executor_type) as executor:
+            for chunk in chunked(rows, self.batch_size):
+                self.import_chunk(chunk, seen, executor, result)
+                if self.progress:
+                    self.progress(result)
+        return result
+
+    def import_chunk(self, chunk, seen, executor, result):
+        valid = []
+        for row_number, row in chunk:
+            matric_number = row.get('matric_number') if isinstance(row, dict) else None
+            try:
+                cleaned = clean_student_row(row)
+            except ValueError as e:
+                result.add_error(row_number, matric_number, str(e))
+                continue
+            if cleaned['matric_number'] in seen:
+                result.add_error(row_number, cleaned['matric_number'], "Duplicate matric number in file")
+                continue
+            seen.add(cleaned['matric_number'])
+            valid.append((row_number, cleaned))
+
+        valid = self.drop_existing(valid, result)
+        if not valid:
+            return
+
+        # chunksize keeps inter-process round trips low on the process pool
+        passwords = executor.map(
+            make_password,
+            [cleaned['password'] for _, cleaned in valid],
+            chunksize=max(1, len(valid) // (self.workers * 4)),
+        )
+        users = [self.build_user(cleaned, encoded) for (_, cleaned), encoded in zip(valid, passwords)]
+
+        try:
+            self.insert(users)
+        except (DataError, IntegrityError):
+            # someone registered one of these matric numbers meanwhile, or the
+            # database refused a row; report those rows and insert the rest
+            # one at a time, so one bad row cannot fail the chunk again
+            still_new = {row_number for row_number, _ in self.drop_existing(valid, result)}
+            for (row_number, cleaned), user in zip(valid, users):
+                if row_number not in still_new:
+                    continue
+                user.serial_number = user._requested_serial_number
+                try:
+                    self.insert([user])
+                except (DataError, IntegrityError) as e:
+                    result.add_error(row_number, cleaned['matric_number'], f"Could not be saved: {e}")
+                else:
+                    result.created += 1
+            return
+        result.created += len(users)
+
+    def drop_existing(self, valid, result):
+        existing = set(
+            User.objects
+            .filter(matric_number__in=[cleaned['matric_number'] for _, cleaned in valid])
+            .values_list('matric_number', flat=True)
+        )
+        kept = []
+        for row_number, cleaned in valid:
+            if cleaned['matric_number'] in existing:
+                result.add_error(row_number, cleaned['matric_number'], "A user with this matric number exists")
+            else:
+                kept.append((row_number, cleaned))
+        return kept
+
+    def build_user(self, cleaned, encoded_password):
+        user = User(
+            matric_number=cleaned['matric_number'],
+            first_name=cleaned['first_name'],
+            middle_name=cleaned['middle_name'],
+            last_name=cleaned['last_name'],
+            user_type=UserType.STUDENT,
+            password=encoded_password,
+            serial_number=cleaned['serial_number'] or 0,
+        )
+        if cleaned['year_of_admission']:
+            user.year_of_admission = cleaned['year_of_admission']
+        user.update_search_name()
+        user._requested_serial_number = user.serial_number
+        return user
+
+    def insert(self, users):
+        with transaction.atomic():
+            needs_serial = defaultdict(list)
+            for user in users:
+                if not user.serial_number:
+                    needs_serial[user.year_of_admission].append(user)
+            # one counter bump per year per chunk, rolled back with the insert
+            for year, pending in needs_serial.items():
+                last = reserve_serial_numbers(year, len(pending))
+                for serial_number, user in enumerate(pending, start=last - len(pending) + 1):
+                    user.serial_number = serial_number
+            User.objects.bulk_create(users, batch_size=self.batch_size)
+
+        # bulk_create skips save(), so clear any cached "unknown matric number"
+        credential_cache = get_credential_cache()
+        for user in users:
+            credential_cache.invalidate(matric_number=user.matric_number)
+
+
+REQUIRED_STAFF_FIELDS = ('staff_id', 'first_name', 'last_name', 'staff_type')
+
+
+class StaffImportResult(BulkResult):
+    identifier = 'staff_id'
+
+    def __init__(self):
+        super().__init__()
+        self.skipped = 0
+        self.images_uploaded = 0
+
+    def as_dict(self):
+        return {
+            **super().as_dict(),
+            "skipped": self.skipped,
+            "images_uploaded": self.images_uploaded
+        }
+
+
+def clean_staff_row(row) -> dict:
+    if isinstance(row, str):
+        raise ValueError(row)
+
+    cleaned = {
+        name: (str(row.get(name) or '')).strip()
+        for name in REQUIRED_STAFF_FIELDS + ('middle_name', 'staff_id_img')
+    }
+    missing = [name for name in REQUIRED_STAFF_FIELDS if not cleaned[name]]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    if cleaned['staff_type'] not in UserType.list():
+        raise ValueError("Invalid staff type entered")
+    check_lengths(cleaned, ('staff_id', 'first_name', 'middle_name', 'last_name'))
+    return cleaned
+
+
+def upload_image(field, name, content):
+    return get_upload_backend().upload(field, ContentFile(content, name=name), name)
+
+
+class StaffImporter:
+    """
+    Onboards a staff roster: one hash of DEFAULT_STAFF_PASSWORD for everyone,
+    one bulk INSERT per chunk, then the ID card images from ``images`` (a
+    ZipFile, matched by the ``staff_id_img`` column) uploaded on a bounded
+    thread pool. Staff IDs that already exist are skipped, so an interrupted
+    import can simply be run again.
+    """
+
+    def __init__(self, batch_size=500, upload_workers=8, progress=None, upload=upload_image):
+        self.batch_size = batch_size
+        self.upload_workers = upload_workers
+        self.progress = progress
+        self.upload = upload
+
+    def run(self, rows, images=None) -> StaffImportResult:
+        result = StaffImportResult()
+        seen = set()
+        password = default_staff_password_hash()
+        with ThreadPoolExecutor(max_workers=self.upload_workers, thread_name_prefix='staff-image') as executor:
+            for chunk in chunked(rows, self.batch_size):
+                created = self.import_chunk(chunk, seen, password, result)
+                if images is not None and created:
+                    self.upload_images(created, images, executor, result)
+                if self.progress:
+                    self.progress(result)
+        return result
+
+    def import_chunk(self, chunk, seen, password, result):
+        valid = []
+        for row_number, row in chunk:
+            staff_id = row.get('staff_id') if isinstance(row, dict) else None
+            try:
+                cleaned = clean_staff_row(row)
+            except ValueError as e:
+                result.add_error(row_number, staff_id, str(e))
+                continue
+            if cleaned['staff_id'] in seen:
+                result.add_error(row_number, cleaned['staff_id'], "Duplicate staff ID in file")
+                continue
+            seen.add(cleaned['staff_id'])
+            valid.append((row_number, cleaned))
+
+        valid = self.drop_existing(valid, result)
+        if not valid:
+            return []
+
+        users = [self.build_user(cleaned, password) for _, cleaned in valid]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+        except (DataError, IntegrityError):
+            # registered by someone else meanwhile (leave those alone too), or
+            # the database refused a row; insert the rest one at a time and
+            # report the rows that still fail
+            created = []
+            for row_number, cleaned in self.drop_existing(valid, result):
+                user = self.build_user(cleaned, password)
+                try:
+                    with transaction.atomic():
+                        User.objects.bulk_create([user])
+                except (DataError, IntegrityError) as e:
+                    result.add_error(row_number, cleaned['staff_id'], f"Could not be saved: {e}")
+                else:
+                    created.append(((row_number, cleaned), user))
+            valid = [row for row, _ in created]
+            users = [user for _, user in created]
+        result.created += len(users)
+
+        credential_cache = get_credential_cache()
+        for user in users:
+            credential_cache.invalidate(staff_id=user.staff_id)
+        return [(row_number, cleaned, user) for (row_number, cleaned), user in zip(valid, users)]
+
+    def drop_existing(self, valid, result):
+        existing = set(
+            User.objects
+            .filter(staff_id__in=[cleaned['staff_id'] for _, cleaned in valid])
+            .values_list('staff_id', flat=True)
+        )
+        result.skipped += sum(1 for _, cleaned in valid if cleaned['staff_id'] in existing)
+        return [(row_number, cleaned) for row_number, cleaned in valid if cleaned['staff_id'] not in existing]
+
+    def build_user(self, cleaned, password):
+        user = User(
+            staff_id=cleaned['staff_id'],
+            first_name=cleaned['first_name'],
+            middle_name=cleaned['middle_name'],
+            last_name=cleaned['last_name'],
+            user_type=cleaned['staff_type'],
+            is_staff=True,
+            password=password,
+        )
+        user.update_search_name()
+        return user
+
+    def upload_images(self, created, images, executor, result):
+        field = User._meta.get_field('staff_id_img')
+        names = set(images.namelist())
+        # ZipFile reads are not thread-safe, so members are read here and only
+        # the uploads run on the pool; at most 2 * upload_workers images are
+        # held in memory at once
+        in_flight = {}
+        uploaded = []
+
+        def collect(done):
+            for future in done:
+                row_number, user = in_flight.pop(future)
+                try:
+                    user.staff_id_img = future.result()
+                except Exception as e:
+                    result.add_error(row_number, user.staff_id, f"Image upload failed: {e}")
+                else:
+                    uploaded.append(user)
+
+        for row_number, cleaned, user in created:
+            name = cleaned['staff_id_img']
+            if not name:
+                continue
+            if name not in names:
+                result.add_error(row_number, user.staff_id, f"Image {name} not found in archive")
+                continue
+            if len(in_flight) >= 2 * self.upload_workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            future = executor.submit(self.upload, field, os.path.basename(name), images.read(name))
+            in_flight[future] = (row_number, user)
+        collect(wait(in_flight).done)
+
+        if uploaded:
+            User.objects.bulk_update(uploaded, ['staff_id_img'], batch_size=self.batch_size)
+            result.images_uploaded += len(uploaded)
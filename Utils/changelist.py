@@ -0,0 +1,167 @@
+import hashlib
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, OrderBy, Q
+from django.utils.functional import cached_property
+
+from Utils.database import POSTGRES_ENGINES
+
+
+def query_fingerprint(queryset) -> str:
+    # same SQL and parameters, same rows
+    sql, params = queryset.query.sql_with_params()
+    return hashlib.sha256(f'{queryset.db}|{sql}|{params!r}'.encode()).hexdigest()[:32]
+
+
+def estimated_count(queryset):
+    """
+    The table's reltuples for an unfiltered ``queryset`` on Postgres. None
+    for filtered querysets, whose planner estimates can be off by orders of
+    magnitude, elsewhere, or before the table has been analyzed.
+    """
+    if queryset.query.has_filters():
+        return None
+    connection = connections[queryset.db]
+    if connection.settings_dict['ENGINE'] not in POSTGRES_ENGINES:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    # -1 until the first ANALYZE / autovacuum
+    return row[0] if row and row[0] >= 0 else None
+
+
+def keyset_columns(queryset):
+    """
+    [(field name, descending), ...] for the queryset's ordering, when every
+    term is a non-null column and the last is unique, so rows can be fetched
+    "after" a row instead of at an OFFSET. None otherwise.
+    """
+    query = queryset.query
+    meta = queryset.model._meta
+    ordering = query.order_by or (meta.ordering if query.default_ordering else ())
+    columns = []
+    for term in ordering:
+        if isinstance(term, str):
+            name, descending = term.lstrip('-'), term.startswith('-')
+        elif isinstance(term, OrderBy) and isinstance(term.expression, F):
+            name, descending = term.expression.name, term.descending
+        else:
+            return None
+        if name == 'pk':
+            name = meta.pk.name
+        try:
+            field = meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.null or '__' in name:
+            return None
+        columns.append((field, descending))
+    if not columns or not (columns[-1][0].primary_key or columns[-1][0].unique):
+        return None
+    return [(field.attname, descending) for field, descending in columns]
+
+
+def keyset_condition(columns, values) -> Q:
+    # rows after ``values`` in the (column, descending) order
+    clauses = []
+    for i, (name, descending) in enumerate(columns):
+        clause = Q(**{f'{name}__{"lt" if descending else "gt"}': values[i]})
+        for (previous, _), value in zip(columns[:i], values):
+            clause &= Q(**{previous: value})
+        clauses.append(clause)
+    # the redundant bound on the first column gives the index a range start
+    first, descending = columns[0]
+    return Q(**{f'{first}__{"lte" if descending else "gte"}': values[0]}) & reduce(or_, clauses)
+
+
+class ChangelistPaginator(Paginator):
+    """
+    Admin changelist paginator for large tables. The unfiltered total comes
+    from a Postgres estimate once it reaches ADMIN_COUNT_ESTIMATE_THRESHOLD
+    rows; every other total is an exact COUNT(*) cached for
+    ADMIN_COUNT_CACHE_TTL seconds. Each page remembers its last row, so following "next" fetches
+    the rows after it instead of counting through an OFFSET.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.ADMIN_COUNT_CACHE]
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        estimate = estimated_count(queryset)
+        if estimate is not None and estimate >= settings.ADMIN_COUNT_ESTIMATE_THRESHOLD:
+            return estimate
+
+        key = f'admin:count:{query_fingerprint(queryset.order_by())}'
+        count = self.cache.get(key)
+        if count is None:
+            count = queryset.count()
+            self.cache.set(key, count, settings.ADMIN_COUNT_CACHE_TTL)
+        return count
+
+    @cached_property
+    def keyset_columns(self):
+        return keyset_columns(self.object_list)
+
+    def boundary_key(self, number):
+        return f'admin:page:{query_fingerprint(self.object_list)}:{self.per_page}:{number}'
+
+    def page(self, number):
+        number = self.validate_number(number)
+        columns = self.keyset_columns
+        if columns is None:
+            return super().page(number)
+
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        after = self.cache.get(self.boundary_key(number - 1)) if number > 1 else None
+        if after is None:
+            object_list = self.object_list[bottom:top]
+        else:
+            object_list = self.object_list.filter(keyset_condition(columns, after))[:max(top - bottom, 0)]
+
+        # evaluated here so the boundary can be read off the last row; the
+        # changelist then iterates the same, already fetched, queryset
+        rows = list(object_list)
+        if rows:
+            last = rows[-1]
+            self.cache.set(
+                self.boundary_key(number), [getattr(last, name) for name, _ in columns],
+                settings.ADMIN_PAGE_BOUNDARY_TTL,
+            )
+        return self._get_page(object_list, number, self)
+
+
+class CachedFacetsMixin:
+    # Facet counts ("?_facets=True") for a list filter, cached for
+    # ADMIN_FACET_CACHE_TTL seconds per distinct filtered query.
+
+    def get_facet_queryset(self, changelist):
+        filtered_qs = changelist.get_queryset(self.request, exclude_parameters=self.expected_parameters())
+        counts = self.get_facet_counts(changelist.pk_attname, filtered_qs)
+        aggregates = repr(sorted(counts.items()))
+        key = f'admin:facets:{query_fingerprint(filtered_qs)}:{hashlib.sha256(aggregates.encode()).hexdigest()[:32]}'
+        cache = caches[settings.ADMIN_COUNT_CACHE]
+        result = cache.get(key)
+        if result is None:
+            result = filtered_qs.aggregate(**counts)
+            cache.set(key, result, settings.ADMIN_FACET_CACHE_TTL)
+        return result
+
+
+def cached_facets(filter_class):
+    return type(f'Cached{filter_class.__name__}', (CachedFacetsMixin, filter_class), {})
@@ -0,0 +1,128 @@
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from Utils.cache import LRUCache
+
+# Just enough of the user row to decide a login; the full row is only fetched
+# once the password has been verified.
+Credentials = namedtuple('Credentials', ['id', 'password', 'is_active', 'user_type'])
+
+CREDENTIAL_FIELDS = ('matric_number', 'staff_id')
+
+_MISSING = object()
+# stored instead of None so "known not to exist" can be told apart from a miss
+_NEGATIVE = ()
+
+
+class CredentialCache:
+    """
+    Two-level cache of login credentials keyed by matric number / staff id.
+
+    The in-process LRU absorbs repeated lookups inside a worker; the optional
+    shared backend (any alias from ``CACHES``) lets workers share results.
+    Unknown identifiers are cached too, so stuffing traffic against
+    non-existent matric numbers stops reaching the database.
+    """
+
+    def __init__(self, max_size, ttl, negative_ttl, backend=None, local_ttl=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # with a shared backend the local copy is only a short-lived shortcut,
+        # so a change made on another worker is seen within local_ttl seconds
+        self.local_ttl = ttl if local_ttl is None else min(ttl, local_ttl)
+        self.local = LRUCache(max_size)
+        self.backend_alias = backend
+
+    @property
+    def shared(self):
+        if self.backend_alias:
+            return caches[self.backend_alias]
+        return None
+
+    @staticmethod
+    def make_key(field, value):
+        return f'credentials:{field}:{value}'
+
+    def _store(self, key, value):
+        if value is _NEGATIVE:
+            local_ttl = min(self.negative_ttl, self.local_ttl)
+            shared_ttl = self.negative_ttl
+        else:
+            local_ttl = self.local_ttl
+            shared_ttl = self.ttl
+        self.local.set(key, value, local_ttl)
+        if self.shared is not None:
+            self.shared.set(key, value, shared_ttl)
+
+    def lookup(self, field: str, value) -> Credentials | None:
+        if field not in CREDENTIAL_FIELDS:
+            raise ValueError(f'Cannot look up credentials by {field!r}')
+        if value is None:
+            return None
+
+        key = self.make_key(field, value)
+        cached = self.local.get(key, _MISSING)
+        if cached is _MISSING and self.shared is not None:
+            cached = self.shared.get(key, _MISSING)
+            if cached is not _MISSING:
+                self.local.set(key, cached, self.local_ttl)
+
+        if cached is _MISSING:
+            row = (
+                get_user_model().objects
+                .filter(**{field: value})
+                .values_list(*Credentials._fields)
+                .first()
+            )
+            cached = Credentials(*row) if row else _NEGATIVE
+            self._store(key, cached)
+
+        if cached is _NEGATIVE:
+            return None
+        return Credentials(*cached)
+
+    def invalidate(self, matric_number=None, staff_id=None):
+        keys = [
+            self.make_key(field, value)
+            for field, value in (('matric_number', matric_number), ('staff_id', staff_id))
+            if value is not None
+        ]
+        for key in keys:
+            self.local.delete(key)
+        if keys and self.shared is not None:
+            self.shared.delete_many(keys)
+
+    def clear(self):
+        self.local.clear()
+
+
+_credential_cache = None
+_credential_cache_lock = threading.Lock()
+
+
+def get_credential_cache() -> CredentialCache:
+    global _credential_cache
+    if _credential_cache is None:
+        with _credential_cache_lock:
+            if _credential_cache is None:
+                _credential_cache = CredentialCache(
+                    max_size=settings.CREDENTIAL_CACHE_MAX_SIZE,
+                    ttl=settings.CREDENTIAL_CACHE_TTL,
+                    negative_ttl=settings.CREDENTIAL_CACHE_NEGATIVE_TTL,
+                    backend=settings.CREDENTIAL_CACHE_BACKEND,
+                    local_ttl=settings.CREDENTIAL_CACHE_LOCAL_TTL if settings.CREDENTIAL_CACHE_BACKEND else None,
+                )
+    return _credential_cache
+
+
+@receiver(setting_changed)
+def reset_credential_cache(*, setting, **kwargs):
+    global _credential_cache
+    if setting.startswith('CREDENTIAL_CACHE_'):
+        _credential_cache = None
@@ -0,0 +1,52 @@
+import importlib.util
+import warnings
+
+# Imported by settings.py, so nothing here may touch Django's app registry.
+
+POSTGRES_ENGINES = ('django.db.backends.postgresql', 'django.contrib.gis.db.backends.postgis')
+
+
+def pool_available() -> bool:
+    # Django's pool needs psycopg 3 and psycopg_pool; psycopg2 has neither
+    return all(importlib.util.find_spec(name) is not None for name in ('psycopg', 'psycopg_pool'))
+
+
+def configure_connections(database: dict, conn_max_age: int, health_checks: bool,
+                          pool: bool = False, pool_options: dict | None = None,
+                          asgi: bool = False) -> dict:
+    """
+    Returns a copy of ``database`` set up to reuse connections: a psycopg
+    connection pool when ``pool`` is on and the backend supports it,
+    otherwise persistent connections kept for ``conn_max_age`` seconds.
+    Under ASGI (``asgi``) persistent connections are never used.
+    """
+    database = {**database, 'OPTIONS': dict(database.get('OPTIONS') or {})}
+    database['CONN_HEALTH_CHECKS'] = health_checks
+
+    if pool and database.get('ENGINE') in POSTGRES_ENGINES:
+        if pool_available():
+            # the pool hands connections back after each request; Django
+            # refuses to combine it with persistent connections
+            database['CONN_MAX_AGE'] = 0
+            database['OPTIONS']['pool'] = dict(pool_options or {})
+            return database
+        warnings.warn(
+            "DB_POOL is on but psycopg[pool] is not installed; "
+            "falling back to persistent connections.",
+            RuntimeWarning,
+        )
+
+    if asgi and conn_max_age:
+        # Django closes connections at the end of a request in the thread
+        # that served it, but async views run their queries in other
+        # threads, so persistent connections there are never reused or
+        # closed, only leaked
+        warnings.warn(
+            "DB_CONN_MAX_AGE is ignored under ASGI; use DB_POOL to reuse "
+            "connections there.",
+            RuntimeWarning,
+        )
+        conn_max_age = 0
+
+    database['CONN_MAX_AGE'] = conn_max_age
+    return database
@@ -0,0 +1,64 @@
+import csv
+import json
+from datetime import date, datetime
+
+from User.models import User
+
+# password is deliberately left out
+EXPORT_FIELDS = [
+    'id', 'matric_number', 'first_name', 'middle_name', 'last_name', 'user_type',
+    'serial_number', 'year_of_admission', 'profile_image', 'staff_id', 'staff_id_img',
+    'verified_staff', 'is_staff', 'is_superuser', 'is_active', 'date_joined', 'last_login',
+]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+class _Echo:
+    # file-like object that hands back what csv.writer writes to it
+    def write(self, value):
+        return value
+
+
+def _export_value(value):
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'build_url'):
+        # CloudinaryResource; building the URL is local string work
+        return value.url
+    return value
+
+
+def iter_user_rows(queryset=None, fields=EXPORT_FIELDS, chunk_size=2000):
+    # values_list + iterator() keeps memory flat: rows are fetched chunk_size at
+    # a time (a server-side cursor on Postgres) and never cached on the queryset
+    queryset = User.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield [_export_value(value) for value in row]
+
+
+def iter_csv(rows, fields=EXPORT_FIELDS):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def iter_jsonl(rows, fields=EXPORT_FIELDS):
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row))) + '\n'
+
+
+def iter_export(fmt, queryset=None, fields=EXPORT_FIELDS, chunk_size=2000):
+    rows = iter_user_rows(queryset, fields, chunk_size)
+    if fmt == 'csv':
+        return iter_csv(rows, fields)
+    if fmt == 'jsonl':
+        return iter_jsonl(rows, fields)
+    raise ValueError(f"Unsupported export format {fmt!r}")
@@ -0,0 +1,156 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+# Cost parameters are read from settings on every use, so a hash with
+# different parameters - stronger or weaker - is reported by must_update()
+# and rewritten on the next successful login.
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    # hashlib caps scrypt at 32MiB unless told otherwise, which rules out
+    # work factors above 2**14; this is only a ceiling, not an allocation
+    maxmem = 2**31 - 1
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+
+def needs_rehash(encoded: str) -> bool:
+    # Same decision check_password() hands to its setter, for callers that
+    # verified the password somewhere the setter cannot reach (a worker process).
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = hashers.get_hasher()
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+HASHER_CLASSES = {
+    'pbkdf2': PBKDF2PasswordHasher,
+    'argon2': Argon2PasswordHasher,
+    'scrypt': ScryptPasswordHasher,
+}
+
+
+def time_hash(algorithm: str, params: dict, samples: int = 3) -> float:
+    # Best of ``samples`` hashes with the given PASSWORD_* settings, in seconds.
+    from django.test import override_settings
+
+    hasher = HASHER_CLASSES[algorithm]()
+    salt = hasher.salt()
+    best = None
+    with override_settings(**params):
+        for _ in range(samples):
+            start = time.perf_counter()
+            hasher.encode('calibration-password', salt)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _closest(candidates, target):
+    # candidates are (params, seconds); compare on a log scale so 2x over
+    # and 2x under the target count as equally far off
+    return min(candidates, key=lambda c: abs(math.log(c[1] / target)))
+
+
+def calibrate(algorithm: str, target: float, samples: int = 3):
+    """
+    Returns (params, seconds): the PASSWORD_* settings for ``algorithm`` whose
+    hash time on this machine is closest to ``target`` seconds. Memory and
+    parallelism settings are kept as configured; only the time cost moves.
+    """
+    if algorithm == 'pbkdf2':
+        # cost is linear in the iteration count, so one probe is enough
+        probe = 100_000
+        seconds = time_hash(algorithm, {'PASSWORD_PBKDF2_ITERATIONS': probe}, samples)
+        iterations = max(10_000, round(probe * target / seconds, -4))
+        params = {'PASSWORD_PBKDF2_ITERATIONS': int(iterations)}
+        return params, time_hash(algorithm, params, samples)
+
+    if algorithm == 'scrypt':
+        fixed = {
+            'PASSWORD_SCRYPT_BLOCK_SIZE': settings.PASSWORD_SCRYPT_BLOCK_SIZE,
+            'PASSWORD_SCRYPT_PARALLELISM': settings.PASSWORD_SCRYPT_PARALLELISM,
+        }
+        steps = (('PASSWORD_SCRYPT_WORK_FACTOR', 2**exponent) for exponent in range(12, 21))
+    elif algorithm == 'argon2':
+        hashers.Argon2PasswordHasher()._load_library()
+        fixed = {
+            'PASSWORD_ARGON2_MEMORY_COST': settings.PASSWORD_ARGON2_MEMORY_COST,
+            'PASSWORD_ARGON2_PARALLELISM': settings.PASSWORD_ARGON2_PARALLELISM,
+        }
+        steps = (('PASSWORD_ARGON2_TIME_COST', time_cost) for time_cost in range(1, 21))
+    else:
+        raise ValueError(f'Unknown password hasher {algorithm!r}')
+
+    # raise the cost until a hash takes at least the target, then keep
+    # whichever of the last two steps is closer
+    candidates = []
+    for name, value in steps:
+        params = {**fixed, name: value}
+        candidates.append((params, time_hash(algorithm, params, samples)))
+        if candidates[-1][1] >= target:
+            break
+    return _closest(candidates[-2:], target)
+
+
+_default_staff_password = None
+_default_staff_password_lock = threading.Lock()
+
+
+def default_staff_password_hash() -> str:
+    # Every new staff account starts with DEFAULT_STAFF_PASSWORD, so it is
+    # hashed once per process rather than once per account. Staff accounts
+    # therefore share a salt until each user changes their password.
+    global _default_staff_password
+    if _default_staff_password is None:
+        with _default_staff_password_lock:
+            if _default_staff_password is None:
+                _default_staff_password = hashers.make_password(settings.DEFAULT_STAFF_PASSWORD)
+    return _default_staff_password
+
+
+@receiver(setting_changed)
+def reset_default_staff_password(*, setting, **kwargs):
+    global _default_staff_password
+    if setting == 'DEFAULT_STAFF_PASSWORD' or setting.startswith('PASSWORD_'):
+        _default_staff_password = None
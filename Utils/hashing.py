@@ -0,0 +1,110 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class HashPoolSaturated(Exception):
+    pass
+
+
+def _init_worker():
+    # spawned workers start from a clean interpreter and need the app registry
+    # (and therefore PASSWORD_HASHERS) before they can verify anything
+    django.setup()
+
+
+def create_executor(workers: int, kind: str = 'process'):
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+
+
+class HashPool:
+    """
+    Bounded pool that runs password hashing off the event loop.
+
+    At most ``workers`` hashes run at once and at most ``max_queue`` more may
+    wait for a free worker; anything beyond that is rejected straight away
+    with ``HashPoolSaturated`` instead of piling up until the client times out.
+    """
+
+    def __init__(self, workers: int, max_queue: int, executor: str = 'process'):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.executor_type = executor
+        self._executor = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = create_executor(self.workers, self.executor_type)
+        return self._executor
+
+    def reserve(self):
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                raise HashPoolSaturated()
+            self._in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, func, *args):
+        self.reserve()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.get_executor(), func, *args)
+        finally:
+            self.release()
+
+    async def check_password(self, password: str, encoded: str) -> bool:
+        return await self.run(check_password, password, encoded)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+
+def get_hash_pool() -> HashPool:
+    global _hash_pool
+    if _hash_pool is None:
+        with _hash_pool_lock:
+            if _hash_pool is None:
+                _hash_pool = HashPool(
+                    workers=settings.LOGIN_HASH_WORKERS,
+                    max_queue=settings.LOGIN_HASH_MAX_QUEUE,
+                    executor=settings.LOGIN_HASH_EXECUTOR,
+                )
+    return _hash_pool
+
+
+@receiver(setting_changed)
+def reset_hash_pool(*, setting, **kwargs):
+    global _hash_pool
+    if setting.startswith('LOGIN_HASH_') and _hash_pool is not None:
+        _hash_pool.shutdown(wait=False)
+        _hash_pool = None
@@ -0,0 +1,328 @@
+import atexit
+import contextvars
+import glob
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# upper bounds, in seconds, of the request latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ('db', 'hash', 'serialize')
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    __slots__ = ('start', 'queries', 'seconds')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+
+    def add(self, phase, seconds):
+        self.seconds[phase] += seconds
+
+
+@contextmanager
+def timer(phase: str):
+    # Adds the time spent in the block to the current request's ``phase``;
+    # a no-op outside a sampled request.
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.add('db', time.perf_counter() - start)
+
+
+def install_query_timer(connection):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+@receiver(connection_created)
+def _install_on_connect(sender, connection, **kwargs):
+    # covers connections opened on other threads, e.g. by sync_to_async
+    if settings.METRICS_ENABLED:
+        install_query_timer(connection)
+
+
+class MetricsRegistry:
+    """
+    Per-view totals for this process. With ``directory`` set, the totals are
+    written there every ``flush_interval`` seconds as ``<pid>.json`` so the
+    /metrics view of any worker can add up the whole gunicorn arbiter.
+    """
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.views = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    @staticmethod
+    def _empty():
+        return {
+            'requests': 0,
+            'sampled': 0,
+            'duration': 0.0,
+            'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+            'queries': 0,
+            **{f'{phase}_seconds': 0.0 for phase in PHASES},
+        }
+
+    def count(self, view):
+        with self._lock:
+            self.views.setdefault(view, self._empty())['requests'] += 1
+
+    def observe(self, view, duration, timings):
+        with self._lock:
+            totals = self.views.setdefault(view, self._empty())
+            totals['requests'] += 1
+            totals['sampled'] += 1
+            totals['duration'] += duration
+            totals['buckets'][bisect_left(LATENCY_BUCKETS, duration)] += 1
+            totals['queries'] += timings.queries
+            for phase, seconds in timings.seconds.items():
+                totals[f'{phase}_seconds'] += seconds
+        self.maybe_flush()
+
+    def clear(self):
+        with self._lock:
+            self.views.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {view: {**totals, 'buckets': list(totals['buckets'])} for view, totals in self.views.items()}
+
+    def path(self, pid=None):
+        return os.path.join(self.directory, f'{pid or os.getpid()}.json')
+
+    def maybe_flush(self):
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        # write then rename, so a reader never sees half a file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, self.path())
+
+    def collect(self):
+        # this worker's live totals plus the last flush of every other worker,
+        # including ones that have since exited so counters never go backwards
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own = self.path()
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return merge_snapshots(snapshots)
+
+
+def merge_snapshots(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for view, totals in snapshot.items():
+            target = merged.setdefault(view, MetricsRegistry._empty())
+            for key, value in totals.items():
+                if key == 'buckets':
+                    target[key] = [a + b for a, b in zip(target[key], value)]
+                else:
+                    target[key] += value
+    return merged
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(views) -> str:
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(samples)
+
+    ordered = sorted(views.items())
+    metric('healthplus_requests_total', 'counter', 'Requests handled, sampled or not.', [
+        f'healthplus_requests_total{{view="{_label(view)}"}} {totals["requests"]}' for view, totals in ordered
+    ])
+
+    histogram = []
+    for view, totals in ordered:
+        label = _label(view)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, totals['buckets']):
+            cumulative += count
+            histogram.append(f'healthplus_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+        histogram.append(
+            f'healthplus_request_duration_seconds_bucket{{view="{label}",le="+Inf"}} {totals["sampled"]}'
+        )
+        histogram.append(f'healthplus_request_duration_seconds_sum{{view="{label}"}} {totals["duration"]}')
+        histogram.append(f'healthplus_request_duration_seconds_count{{view="{label}"}} {totals["sampled"]}')
+    metric('healthplus_request_duration_seconds', 'histogram', 'Latency of sampled requests.', histogram)
+
+    metric('healthplus_db_queries_total', 'counter', 'SQL queries issued by sampled requests.', [
+        f'healthplus_db_queries_total{{view="{_label(view)}"}} {totals["queries"]}' for view, totals in ordered
+    ])
+    for phase, help_text in (
+        ('db', 'Time sampled requests spent in SQL.'),
+        ('hash', 'Time sampled requests spent hashing passwords.'),
+        ('serialize', 'Time sampled requests spent serializing and rendering responses.'),
+    ):
+        name = f'healthplus_{phase}_seconds_total'
+        metric(name, 'counter', help_text, [
+            f'{name}{{view="{_label(view)}"}} {totals[f"{phase}_seconds"]}' for view, totals in ordered
+        ])
+    return '\n'.join(lines) + '\n'
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+                atexit.register(_registry.flush)
+    return _registry
+
+
+@receiver(setting_changed)
+def reset_registry(*, setting, **kwargs):
+    global _registry
+    if setting in ('METRICS_DIR', 'METRICS_FLUSH_INTERVAL'):
+        _registry = None
+
+
+def metrics_exposed() -> bool:
+    # /metrics is served without a token only outside production
+    return settings.METRICS_ENABLED and bool(settings.METRICS_AUTH_TOKEN or not settings.PRODUCTION)
+
+
+@checks.register(checks.Tags.security)
+def check_metrics_auth(app_configs=None, **kwargs):
+    if settings.METRICS_ENABLED and settings.PRODUCTION and not settings.METRICS_AUTH_TOKEN:
+        return [checks.Error(
+            "METRICS_ENABLED is on in production without METRICS_AUTH_TOKEN; /metrics is not served.",
+            hint="Set METRICS_AUTH_TOKEN and have the scraper send it as a Bearer token.",
+            id='User.E006',
+        )]
+    return []
+
+
+def server_timing(timings, total) -> str:
+    return ', '.join([
+        f'db;dur={timings.seconds["db"] * 1000:.2f};desc="{timings.queries} queries"',
+        f'hash;dur={timings.seconds["hash"] * 1000:.2f}',
+        f'serialize;dur={timings.seconds["serialize"] * 1000:.2f}',
+        f'total;dur={total * 1000:.2f}',
+    ])
+
+
+class MetricsMiddleware:
+    """
+    Times a ``METRICS_SAMPLE_RATE`` fraction of requests: SQL count and time,
+    password hashing, serialization and total latency, per view. Results go
+    to the registry behind /metrics and, if ``METRICS_SERVER_TIMING`` is on,
+    to a Server-Timing header. Unsampled requests are only counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_SAMPLE_RATE
+        self.server_timing = settings.METRICS_SERVER_TIMING
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return None, None
+        for connection in connections.all():
+            install_query_timer(connection)
+        timings = RequestTimings()
+        return timings, _current.set(timings)
+
+    def finish(self, request, response, timings, token):
+        view = request.resolver_match.view_name if request.resolver_match else 'unmatched'
+        if timings is None:
+            get_registry().count(view)
+            return response
+
+        _current.reset(token)
+        total = time.perf_counter() - timings.start
+        get_registry().observe(view, total, timings)
+        if self.server_timing:
+            response['Server-Timing'] = server_timing(timings, total)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = self.start()
+        response = self.get_response(request)
+        return self.finish(request, response, timings, token)
+
+    async def __acall__(self, request):
+        timings, token = self.start()
+        response = await self.get_response(request)
+        return self.finish(request, response, timings, token)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; count that as
+        # serialization too
+        timings = _current.get()
+        if timings is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(lambda r: timings.add('serialize', time.perf_counter() - start))
+        return response
@@ -0,0 +1,220 @@
+import gzip
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+try:
+    import brotli
+except ImportError:  # optional; without it only gzip bodies are served
+    brotli = None
+
+API_INFO = openapi.Info(
+    title="Health Plus API",
+    default_version='v1',
+    description="Below, you will find all endpoints and documentation to each of these endpoints",
+    # terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="adesolaayodeji53@gmail.com"),
+    license=openapi.License(name="BSD License"),
+)
+
+schema_view = get_schema_view(
+    API_INFO,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+    url=settings.SWAGGER_DOCS_BASE_URL,
+)
+
+# format -> (file name, content type); "openapi" is what the UIs used to
+# request with ?format=openapi
+SCHEMA_FORMATS = {
+    'json': ('swagger.json', 'application/json'),
+    'openapi': ('swagger.json', 'application/openapi+json'),
+    'yaml': ('swagger.yaml', 'application/yaml'),
+}
+
+# preferred first, with the suffix of their files in OPENAPI_SCHEMA_DIR
+ENCODINGS = ('br', 'gzip')
+SUFFIXES = {'gzip': 'gz', 'br': 'br'}
+
+
+class SchemaBody:
+    """One encoded schema document, with its precompressed copies and ETag."""
+    __slots__ = ('content', 'encoded', 'etag')
+
+    def __init__(self, content: bytes, encoded=None):
+        self.content = content
+        self.encoded = dict(encoded) if encoded is not None else compress(content)
+        self.etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+
+    def etag_for(self, encoding):
+        # each encoding is its own representation, so gets its own tag
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+
+def compress(content: bytes) -> dict:
+    # mtime=0 so the same schema always compresses to the same bytes
+    encoded = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(content, quality=11)
+    return encoded
+
+
+def generate_schema() -> dict:
+    # The document schema_view would render for an anonymous request; the
+    # view is public, so nobody sees a different one.
+    generator = schema_view.generator_class(API_INFO, url=settings.SWAGGER_DOCS_BASE_URL)
+    schema = generator.get_schema(request=None, public=True)
+    return {
+        'swagger.json': OpenAPICodecJson(validators=[]).encode(schema),
+        'swagger.yaml': OpenAPICodecYaml(validators=[]).encode(schema),
+    }
+
+
+def write_schema(directory, documents=None) -> dict:
+    """
+    Writes every schema document, and its precompressed copies, to
+    ``directory`` for the workers to load instead of generating it. Returns
+    the SchemaBody of each document.
+    """
+    documents = documents if documents is not None else generate_schema()
+    os.makedirs(directory, exist_ok=True)
+    bodies = {}
+    for name, content in documents.items():
+        body = SchemaBody(content)
+        files = {name: content, **{f'{name}.{SUFFIXES[encoding]}': data for encoding, data in body.encoded.items()}}
+        for file_name, data in files.items():
+            # renamed into place so a worker never reads half a file
+            path = os.path.join(directory, file_name)
+            with open(f'{path}.tmp', 'wb') as destination:
+                destination.write(data)
+            os.replace(f'{path}.tmp', path)
+        bodies[name] = body
+    return bodies
+
+
+def read_schema(directory) -> dict | None:
+    # the documents write_schema left in ``directory``; None if any is missing
+    bodies = {}
+    for name in {name for name, _ in SCHEMA_FORMATS.values()}:
+        path = os.path.join(directory, name)
+        try:
+            with open(path, 'rb') as source:
+                content = source.read()
+        except FileNotFoundError:
+            return None
+        encoded = {}
+        for encoding, suffix in SUFFIXES.items():
+            try:
+                with open(f'{path}.{suffix}', 'rb') as source:
+                    encoded[encoding] = source.read()
+            except FileNotFoundError:
+                pass
+        bodies[name] = SchemaBody(content, encoded if 'gzip' in encoded else None)
+    return bodies
+
+
+_schema = None
+_schema_lock = threading.Lock()
+
+
+def get_schema() -> dict:
+    """
+    The schema documents of this process: read from OPENAPI_SCHEMA_DIR, where
+    `manage.py build_openapi_schema` puts them on deploy, or generated on
+    first use when that is unset or empty. Either way it happens once per
+    process; the schema only changes when new code is deployed.
+    """
+    global _schema
+    if _schema is None:
+        with _schema_lock:
+            if _schema is None:
+                directory = settings.OPENAPI_SCHEMA_DIR
+                bodies = read_schema(directory) if directory else None
+                if bodies is None:
+                    bodies = {name: SchemaBody(content) for name, content in generate_schema().items()}
+                _schema = bodies
+    return _schema
+
+
+@receiver(setting_changed)
+def reset_schema(*, setting, **kwargs):
+    global _schema
+    if setting.startswith('OPENAPI_SCHEMA_') or setting in ('SWAGGER_DOCS_BASE_URL', 'ROOT_URLCONF'):
+        _schema = None
+
+
+def accepted_encoding(header: str, available):
+    # the first of ENCODINGS that is ``available`` and accepted (q > 0); None for identity
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def schema_response(request, format):
+    """
+    Serves a cached schema document: 304 when If-None-Match has its ETag,
+    otherwise the smallest precompressed body the client accepts.
+    """
+    try:
+        name, content_type = SCHEMA_FORMATS[format]
+    except KeyError:
+        raise Http404()
+    body = get_schema()[name]
+
+    encoding = accepted_encoding(request.headers.get('Accept-Encoding', ''), body.encoded)
+    etag = body.etag_for(encoding)
+
+    # weak comparison, as for any If-None-Match
+    if_none_match = [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        content = body.content if encoding is None else body.encoded[encoding]
+        response = HttpResponse(content, content_type=content_type)
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.OPENAPI_SCHEMA_MAX_AGE}'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def openapi_schema(request, format):
+    # swagger.json/ and swagger.yaml/
+    return schema_response(request, format.lstrip('.'))
+
+
+def serve_cached_spec(ui_view):
+    # The UIs used to fetch the spec from their own URL with ?format=openapi,
+    # generating it every time; those links now get the cached copy.
+    def view(request, *args, **kwargs):
+        format = request.GET.get('format')
+        if format in SCHEMA_FORMATS:
+            return schema_response(request, format)
+        return ui_view(request, *args, **kwargs)
+    return view
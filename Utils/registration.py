@@ -0,0 +1,72 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from User.models import User
+from Utils import metrics
+from Utils.serials import get_serial_allocator
+from Utils.tokens import mint_token_pair
+
+
+class RegistrationError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def validate_student_registration(data) -> dict:
+    fields = {
+        'matric_number': data.get('matric_number'),
+        'first_name': data.get('first_name'),
+        'middle_name': data.get('middle_name'),
+        'last_name': data.get('last_name'),
+        'serial_number': data.get('serial_number'),
+        'password': data.get('password'),
+        'confirm_password': data.get('confirm_password'),
+    }
+
+    required = ('matric_number', 'first_name', 'last_name', 'password', 'confirm_password')
+    if not all(fields[name] for name in required):
+        raise RegistrationError("All fields are required")
+
+    if fields.pop('confirm_password') != fields['password']:
+        raise RegistrationError("Passwords do not match")
+
+    if fields['serial_number']:
+        try:
+            fields['serial_number'] = int(fields['serial_number'])
+        except (TypeError, ValueError):
+            raise RegistrationError("Serial number must be a number")
+
+    return fields
+
+
+def register_student(data) -> tuple[User, dict]:
+    # One INSERT for the user row: the unique constraint on matric_number is the
+    # existence check, last_login is filled in up front so issuing tokens needs
+    # no follow-up UPDATE.
+    fields = validate_student_registration(data)
+
+    user = User(
+        matric_number=fields['matric_number'],
+        first_name=fields['first_name'],
+        middle_name=fields['middle_name'] or '',
+        last_name=fields['last_name'],
+        serial_number=fields['serial_number'] or 0,
+        last_login=timezone.now(),
+    )
+    with metrics.timer('hash'):
+        user.set_password(fields['password'])
+
+    allocator = get_serial_allocator()
+    if not user.serial_number and not allocator.transactional:
+        user.serial_number = allocator.allocate(user.year_of_admission)
+
+    try:
+        with transaction.atomic():
+            if not user.serial_number:
+                user.serial_number = allocator.allocate(user.year_of_admission)
+            user.save(force_insert=True)
+    except IntegrityError:
+        raise RegistrationError("A user with this matric number exists")
+
+    return user, mint_token_pair(user)
@@ -0,0 +1,157 @@
+import contextvars
+import random
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Only these tables are read from replicas; everything else stays on default.
+# Not the token blacklist: a lagging replica would accept a refresh token
+# that was just rotated or logged out.
+REPLICATED_MODELS = frozenset({'User.user'})
+
+_state = contextvars.ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    # mutable, so a write made in a sync_to_async thread still pins the
+    # request it belongs to
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+class RoutingStats:
+    """Per-process count of routing decisions, by operation, alias and reason."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, operation, alias, reason):
+        with self._lock:
+            self.counts[operation, alias, reason] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def clear(self):
+        with self._lock:
+            self.counts.clear()
+
+
+routing_stats = RoutingStats()
+
+
+def render_routing_prometheus() -> str:
+    lines = [
+        '# HELP healthplus_db_routes_total Database routing decisions of this worker.',
+        '# TYPE healthplus_db_routes_total counter',
+    ]
+    for (operation, alias, reason), count in sorted(routing_stats.snapshot().items()):
+        lines.append(
+            f'healthplus_db_routes_total{{operation="{operation}",database="{alias}",reason="{reason}"}} {count}'
+        )
+    return '\n'.join(lines) + '\n'
+
+
+class ReplicaRouter:
+    """
+    Sends reads of REPLICATED_MODELS to a random alias from DATABASE_REPLICAS,
+    except where they could miss a recent write: outside a request (commands,
+    background jobs), inside a transaction, and for the rest of a request, or
+    REPLICA_STICKY_SECONDS after it, once it has written to one of them.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or model._meta.label_lower not in REPLICATED_MODELS:
+            return None
+
+        state = _state.get()
+        if state is None:
+            reason = 'outside_request'
+        elif state.pinned:
+            reason = 'pinned'
+        elif connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            reason = 'transaction'
+        else:
+            alias = random.choice(replicas)
+            routing_stats.record('read', alias, 'replica')
+            return alias
+        routing_stats.record('read', DEFAULT_DB_ALIAS, reason)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or model._meta.label_lower not in REPLICATED_MODELS:
+            return None
+        state = _state.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        routing_stats.record('write', DEFAULT_DB_ALIAS, 'primary')
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema through replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    """
+    Gives each request its routing state. A request that wrote sets a cookie
+    that keeps the same client reading from default for
+    REPLICA_STICKY_SECONDS, long enough for the replicas to catch up.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.cookie_name = settings.REPLICA_PIN_COOKIE
+        self.sticky_seconds = settings.REPLICA_STICKY_SECONDS
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        try:
+            pinned = float(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        state = RoutingState(pinned)
+        return state, _state.set(state)
+
+    def finish(self, response, state, token):
+        _state.reset(token)
+        if state.wrote and self.sticky_seconds > 0:
+            response.set_cookie(
+                self.cookie_name, f'{time.time() + self.sticky_seconds:.3f}',
+                max_age=self.sticky_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self.start(request)
+        response = self.get_response(request)
+        return self.finish(response, state, token)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        response = await self.get_response(request)
+        return self.finish(response, state, token)
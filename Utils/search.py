@@ -0,0 +1,73 @@
+import time
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+
+from User.models import User
+from Utils.text import normalize_search_text
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def build_search_query(query: str):
+    # Anything with a digit or "/" is treated as a matric number / staff id
+    # prefix; otherwise every word must start one of the words of the name.
+    term = query.strip()
+    if any(char.isdigit() for char in term) or '/' in term:
+        return Q(matric_number__istartswith=term) | Q(staff_id__istartswith=term)
+
+    words = normalize_search_text(term).split()
+    if not words:
+        return None
+    condition = Q()
+    for word in words:
+        condition &= Q(search_name__startswith=word) | Q(search_name__contains=f' {word}')
+    return condition
+
+
+def search_users(query: str, using=None):
+    condition = build_search_query(query)
+    if condition is None:
+        return User.objects.none()
+    return User.objects.using(using).filter(condition)
+
+
+@contextmanager
+def query_deadline(milliseconds: int, using=DEFAULT_DB_ALIAS):
+    # Aborts any query on the ``using`` connection that runs past the budget:
+    # statement_timeout on Postgres, a progress handler on SQLite. Raises
+    # SearchTimeout instead of the backend's error.
+    if not milliseconds:
+        yield
+        return
+
+    connection = connections[using]
+    connection.ensure_connection()
+    try:
+        if connection.vendor == 'postgresql':
+            with transaction.atomic(using=using):
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL statement_timeout = %s', [int(milliseconds)])
+                yield
+        elif connection.vendor == 'sqlite':
+            deadline = time.monotonic() + milliseconds / 1000
+            connection.connection.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+            try:
+                yield
+            finally:
+                connection.connection.set_progress_handler(None, 0)
+        else:
+            yield
+    except Exception as e:
+        if _is_timeout(e):
+            raise SearchTimeout() from e
+        raise
+
+
+def _is_timeout(exc) -> bool:
+    cause = exc.__cause__ or exc
+    message = str(cause).lower()
+    return 'interrupted' in message or 'statement timeout' in message or 'canceling statement' in message
@@ -0,0 +1,119 @@
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F, Max
+from django.dispatch import receiver
+
+from User.models import SerialCounter, User, UserType
+
+
+def _create_counter(year_of_admission: int, count: int, using: str) -> int | None:
+    # First allocation for a year: start after the highest serial already
+    # handed out. Returns None if another worker created the row first.
+    last = (
+        User.objects.using(using)
+        .filter(user_type=UserType.STUDENT, year_of_admission=year_of_admission)
+        .aggregate(last=Max('serial_number'))['last']
+    ) or 0
+    try:
+        with transaction.atomic(using=using):
+            SerialCounter.objects.using(using).create(
+                year_of_admission=year_of_admission, last_value=last + count
+            )
+    except IntegrityError:
+        return None
+    return last + count
+
+
+def _bump_counter(year_of_admission: int, count: int, using: str) -> int | None:
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {SerialCounter._meta.db_table} SET last_value = last_value + %s '
+                'WHERE year_of_admission = %s RETURNING last_value',
+                [count, year_of_admission],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    # The UPDATE takes the write lock first, so the read-back inside the same
+    # transaction cannot interleave with another allocation.
+    counters = SerialCounter.objects.using(using).filter(year_of_admission=year_of_admission)
+    if not counters.update(last_value=F('last_value') + count):
+        return None
+    return counters.values_list('last_value', flat=True).get()
+
+
+def reserve_serial_numbers(year_of_admission: int, count: int = 1) -> int:
+    # Atomically reserves ``count`` consecutive serial numbers for the year and
+    # returns the last one. When called inside the caller's transaction the
+    # reservation is rolled back with it, so failed inserts leave no gaps.
+    using = router.db_for_write(SerialCounter)
+    with transaction.atomic(using=using, savepoint=False):
+        while True:
+            last = _bump_counter(year_of_admission, count, using)
+            if last is None:
+                last = _create_counter(year_of_admission, count, using)
+            if last is not None:
+                return last
+
+
+class CounterSerialAllocator:
+    # one counter UPDATE per registration, committed with the student row
+    transactional = True
+
+    def allocate(self, year_of_admission: int) -> int:
+        return reserve_serial_numbers(year_of_admission)
+
+
+class BlockSerialAllocator:
+    """
+    Hands out serial numbers from blocks reserved ``block_size`` at a time, so
+    most registrations never touch the counter row.
+
+    Blocks are committed on their own, outside the registration transaction;
+    numbers left in a block when the worker exits are never used, so serials
+    are unique but may have gaps.
+    """
+    transactional = False
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def allocate(self, year_of_admission: int) -> int:
+        with self._lock:
+            next_value, last_value = self._blocks.get(year_of_admission, (1, 0))
+            if next_value > last_value:
+                last_value = reserve_serial_numbers(year_of_admission, self.block_size)
+                next_value = last_value - self.block_size + 1
+            self._blocks[year_of_admission] = (next_value + 1, last_value)
+            return next_value
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_serial_allocator():
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                block_size = settings.SERIAL_NUMBER_BLOCK_SIZE
+                if block_size > 1:
+                    _allocator = BlockSerialAllocator(block_size)
+                else:
+                    _allocator = CounterSerialAllocator()
+    return _allocator
+
+
+@receiver(setting_changed)
+def reset_serial_allocator(*, setting, **kwargs):
+    global _allocator
+    if setting == 'SERIAL_NUMBER_BLOCK_SIZE':
+        _allocator = None
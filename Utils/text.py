@@ -0,0 +1,12 @@
+import re
+import unicodedata
+
+_SEPARATORS = re.compile(r"[^\w/]+")
+
+
+def normalize_search_text(value: str) -> str:
+    # "Adébáyọ̀  O'Neil" -> "adebayo o neil": accents stripped, lower-cased,
+    # punctuation (except the "/" in matric numbers) and runs of spaces collapsed
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(_SEPARATORS.sub(' ', value.lower()).split())
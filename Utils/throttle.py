@@ -0,0 +1,195 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from Utils.cache import LRUCache
+
+
+def client_ip(request) -> str:
+    # With LOGIN_THROTTLE_PROXY_COUNT proxies in front, the client is the
+    # address the outermost of them saw: that many entries from the right of
+    # X-Forwarded-For. Anything further left is whatever the client sent.
+    proxies = settings.LOGIN_THROTTLE_PROXY_COUNT
+    if proxies:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def login_throttle_keys(ip, matric_number=None, staff_id=None):
+    # (key, limit) pairs for one login attempt
+    keys = [(f'ip:{ip}', settings.LOGIN_THROTTLE_IP_LIMIT)]
+    if staff_id:
+        keys.append((f'staff_id:{str(staff_id).strip().lower()}', settings.LOGIN_THROTTLE_IDENTIFIER_LIMIT))
+    elif matric_number:
+        keys.append((f'matric_number:{str(matric_number).strip().lower()}', settings.LOGIN_THROTTLE_IDENTIFIER_LIMIT))
+    return keys
+
+
+class LoginThrottle:
+    """
+    Failed-login counters over a sliding window, per client IP and per
+    matric number / staff id. A key that goes over its limit is locked out
+    for ``lockout`` seconds, doubling with every further lockout inside the
+    strike memory, up to ``max_lockout``.
+
+    Counters live in an in-process LRU, or in the shared ``backend`` (any
+    alias from ``CACHES``) so all workers add up to one count. Lockouts are
+    always copied to the local LRU, so a locked-out client is turned away
+    without a cache round trip, let alone a query or a password hash.
+    """
+
+    def __init__(self, window, lockout, max_lockout, backend=None, max_keys=100_000):
+        self.window = window
+        self.lockout = lockout
+        self.max_lockout = max_lockout
+        self.local = LRUCache(max_keys)
+        self.backend_alias = backend
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        if self.backend_alias:
+            return caches[self.backend_alias]
+        return None
+
+    def retry_after(self, keys) -> float:
+        # Seconds until the first locked key is released; 0 if none is locked.
+        now = time.time()
+        lock_keys = [f'throttle:lock:{key}' for key, _ in keys]
+        for lock_key in lock_keys:
+            until = self.local.get(lock_key)
+            if until is not None and until > now:
+                return until - now
+
+        if self.shared is not None:
+            for lock_key, until in self.shared.get_many(lock_keys).items():
+                if until > now:
+                    self.local.set(lock_key, until, until - now)
+                    return until - now
+        return 0
+
+    def record_failure(self, keys) -> float:
+        # Counts one failed attempt against every key; returns how long the
+        # attempt locked them out for, 0 if it did not.
+        now = time.time()
+        locked_for = 0
+        for key, limit in keys:
+            if self._count(key, now) > limit:
+                locked_for = max(locked_for, self._lock_out(key, now))
+        return locked_for
+
+    def reset(self, keys):
+        # after a successful login: the account's failures no longer count
+        now = time.time()
+        index = int(now // self.window)
+        for key, _ in keys:
+            names = [f'throttle:count:{key}', f'throttle:strikes:{key}', f'throttle:lock:{key}']
+            for name in names:
+                self.local.delete(name)
+            if self.shared is not None:
+                self.shared.delete_many([
+                    *names[1:], f'throttle:count:{key}:{index}', f'throttle:count:{key}:{index - 1}',
+                ])
+
+    def _count(self, key, now) -> float:
+        # Sliding window approximated from two fixed windows: this window's
+        # count plus the previous one's, weighted by how much of it still
+        # overlaps the last ``window`` seconds.
+        index, offset = divmod(now, self.window)
+        index = int(index)
+        overlap = 1 - offset / self.window
+
+        if self.shared is not None:
+            name = f'throttle:count:{key}:{index}'
+            self.shared.add(name, 0, self.window * 2)
+            current = self.shared.incr(name)
+            previous = self.shared.get(f'throttle:count:{key}:{index - 1}', 0)
+            return current + previous * overlap
+
+        name = f'throttle:count:{key}'
+        with self._lock:
+            counted_index, current, previous = self.local.get(name, (index, 0, 0))
+            if counted_index != index:
+                previous = current if counted_index == index - 1 else 0
+                current = 0
+            current += 1
+            self.local.set(name, (index, current, previous), self.window * 2)
+        return current + previous * overlap
+
+    def _lock_out(self, key, now) -> float:
+        name = f'throttle:strikes:{key}'
+        memory = self.window + self.max_lockout
+        if self.shared is not None:
+            self.shared.add(name, 0, memory)
+            strikes = self.shared.incr(name)
+        else:
+            with self._lock:
+                strikes = self.local.get(name, 0) + 1
+                self.local.set(name, strikes, memory)
+
+        seconds = min(self.lockout * 2 ** min(strikes - 1, 32), self.max_lockout)
+        until = now + seconds
+        self.local.set(f'throttle:lock:{key}', until, seconds)
+        if self.shared is not None:
+            self.shared.set(f'throttle:lock:{key}', until, math.ceil(seconds))
+        return seconds
+
+    def clear(self):
+        self.local.clear()
+
+
+_login_throttle = None
+_login_throttle_lock = threading.Lock()
+
+
+def get_login_throttle() -> LoginThrottle:
+    global _login_throttle
+    if _login_throttle is None:
+        with _login_throttle_lock:
+            if _login_throttle is None:
+                _login_throttle = LoginThrottle(
+                    window=settings.LOGIN_THROTTLE_WINDOW,
+                    lockout=settings.LOGIN_THROTTLE_LOCKOUT,
+                    max_lockout=settings.LOGIN_THROTTLE_MAX_LOCKOUT,
+                    backend=settings.LOGIN_THROTTLE_BACKEND,
+                    max_keys=settings.LOGIN_THROTTLE_MAX_KEYS,
+                )
+    return _login_throttle
+
+
+@receiver(setting_changed)
+def reset_login_throttle(*, setting, **kwargs):
+    global _login_throttle
+    if setting.startswith('LOGIN_THROTTLE_'):
+        _login_throttle = None
+
+
+def check_login_throttle(request, matric_number=None, staff_id=None):
+    # (keys, retry_after) for a login attempt, checked before any query or
+    # hash; keys is None when throttling is off
+    if not settings.LOGIN_THROTTLE_ENABLED:
+        return None, 0
+    keys = login_throttle_keys(client_ip(request), matric_number, staff_id)
+    return keys, get_login_throttle().retry_after(keys)
+
+
+def record_login_result(keys, succeeded: bool):
+    if keys is None:
+        return
+    if succeeded:
+        # only the account's own counter; one valid login must not clear
+        # the failures an address has racked up against other accounts
+        get_login_throttle().reset(keys[1:])
+    else:
+        get_login_throttle().record_failure(keys)
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch, get_md5_hash_password
+
+from Utils.authentication import USER_CLAIMS
+
+
+def mint_token_pair(user) -> dict:
+    # RefreshToken.for_user() encodes the refresh token once for the
+    # OutstandingToken row and we would encode it again for the response;
+    # build the token ourselves so it is signed only once.
+    refresh = RefreshToken()
+    refresh[api_settings.USER_ID_CLAIM] = str(getattr(user, api_settings.USER_ID_FIELD))
+    if api_settings.CHECK_REVOKE_TOKEN:
+        refresh[api_settings.REVOKE_TOKEN_CLAIM] = get_md5_hash_password(user.password)
+    # copied onto the access token too, see ClaimsTokenUser; a refresh reads
+    # them from the user again (CachedBlacklistTokenRefreshSerializer)
+    for claim in USER_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+
+    encoded_refresh = str(refresh)
+    if apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+        from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+        OutstandingToken.objects.create(
+            user=user,
+            jti=refresh[api_settings.JTI_CLAIM],
+            token=encoded_refresh,
+            created_at=refresh.current_time,
+            expires_at=datetime_from_epoch(refresh['exp']),
+        )
+
+    return {
+        "access": str(refresh.access_token),
+        "refresh": encoded_refresh
+    }
+
+
+def touch_last_login(user, now=None) -> bool:
+    # Writes only the last_login column, and skips the write entirely when it
+    # was already bumped within LAST_LOGIN_UPDATE_WINDOW seconds.
+    now = now or timezone.now()
+    window = settings.LAST_LOGIN_UPDATE_WINDOW
+    if window and user.last_login and now - user.last_login < timedelta(seconds=window):
+        return False
+
+    get_user_model().objects.filter(pk=user.pk).update(last_login=now)
+    user.last_login = now
+    return True
+
+
+def issue_tokens(user) -> dict:
+    tokens = mint_token_pair(user)
+    touch_last_login(user)
+    return tokens
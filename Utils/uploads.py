@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cloudinary.uploader
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.core.files import File
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from User.models import ImageUpload, ImageUploadStatus, User
+from Utils.images import profile_image_urls
+
+
+class CloudinaryBackend:
+    def upload(self, field, file, name):
+        # the upload CloudinaryField.pre_save would do, minus the model save
+        options = {"type": field.type, "resource_type": field.resource_type, **field.options}
+        # name it after the original upload rather than the staged copy
+        return cloudinary.uploader.upload_resource(File(file, name=name), **options)
+
+
+class LocalFileSystemBackend:
+    """
+    Offline stand-in for Cloudinary: keeps the file under ``root`` and hands
+    back a resource the CloudinaryField can store, named the way Cloudinary
+    would name it.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or settings.IMAGE_UPLOAD_LOCAL_ROOT
+
+    def upload(self, field, file, name):
+        stem, extension = os.path.splitext(os.path.basename(name))
+        public_id = f"{field.options.get('folder', '').strip('/')}/{stem}_{uuid.uuid4().hex[:8]}".lstrip('/')
+        path = os.path.join(self.root, public_id + extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as destination:
+            while chunk := file.read(64 * 1024):
+                destination.write(chunk)
+        return CloudinaryResource(
+            public_id=public_id, format=extension.lstrip('.') or None, version=str(int(time.time())),
+            type=field.type, resource_type=field.resource_type,
+        )
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_upload_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.IMAGE_UPLOAD_BACKEND)()
+    return _backend
+
+
+def stage_image_upload(user, field_name, uploaded_file) -> ImageUpload:
+    # Copies the file to the staging directory and queues it; the request
+    # returns straight away and the field stays as it was until the upload lands.
+    staging_dir = settings.IMAGE_UPLOAD_STAGING_DIR
+    os.makedirs(staging_dir, exist_ok=True)
+    extension = os.path.splitext(uploaded_file.name or '')[1].lower()
+    staged_path = os.path.join(staging_dir, f'{uuid.uuid4().hex}{extension}')
+    with open(staged_path, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+
+    # a newer image replaces one still waiting
+    for superseded in ImageUpload.objects.filter(user=user, field=field_name):
+        discard_image_upload(superseded)
+    upload = ImageUpload.objects.create(
+        user=user, field=field_name, staged_path=staged_path, name=os.path.basename(uploaded_file.name or 'image'),
+    )
+    transaction.on_commit(lambda: get_upload_queue().submit(upload.pk))
+    return upload
+
+
+def discard_image_upload(upload):
+    ImageUpload.objects.filter(pk=upload.pk).delete()
+    try:
+        os.remove(upload.staged_path)
+    except FileNotFoundError:
+        pass
+
+
+def process_image_upload(upload_id) -> ImageUpload | None:
+    """
+    Makes one attempt at an upload. Returns None once it is done (or was
+    superseded), otherwise the row with its new status and attempt count.
+    """
+    upload = ImageUpload.objects.filter(pk=upload_id).first()
+    if upload is None:
+        return None
+
+    field = User._meta.get_field(upload.field)
+    try:
+        with open(upload.staged_path, 'rb') as staged:
+            resource = get_upload_backend().upload(field, staged, upload.name)
+    except Exception as e:
+        upload.attempts += 1
+        upload.last_error = str(e)[:1000]
+        if upload.attempts >= settings.IMAGE_UPLOAD_MAX_ATTEMPTS:
+            upload.status = ImageUploadStatus.FAILED
+        upload.save(update_fields=['attempts', 'last_error', 'status'])
+        return upload
+
+    with transaction.atomic():
+        # deleting the row claims it; if it is already gone a newer image
+        # replaced this one and must not be overwritten
+        deleted, _ = ImageUpload.objects.filter(pk=upload.pk).delete()
+        if deleted:
+            values = {upload.field: resource}
+            if upload.field == 'profile_image':
+                values.update(profile_image_urls(resource))
+            User.objects.filter(pk=upload.user_id).update(**values)
+    try:
+        os.remove(upload.staged_path)
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def drain_image_uploads(retry_failed=False):
+    # One attempt at every pending upload, in the calling thread; returns
+    # (uploaded, still pending, failed). For cron, or after an outage.
+    if retry_failed:
+        ImageUpload.objects.filter(status=ImageUploadStatus.FAILED).update(
+            status=ImageUploadStatus.PENDING, attempts=0,
+        )
+    uploaded = pending = failed = 0
+    ids = ImageUpload.objects.filter(status=ImageUploadStatus.PENDING).order_by('pk').values_list('pk', flat=True)
+    for upload_id in list(ids):
+        upload = process_image_upload(upload_id)
+        if upload is None:
+            uploaded += 1
+        elif upload.status == ImageUploadStatus.FAILED:
+            failed += 1
+        else:
+            pending += 1
+    return uploaded, pending, failed
+
+
+class UploadQueue:
+    """
+    Worker threads that push staged images to the storage backend. A failed
+    attempt is retried after ``retry_delay`` seconds, doubling each time,
+    until IMAGE_UPLOAD_MAX_ATTEMPTS marks it failed. With ``workers=0`` the
+    single attempt runs inline and retries are left to the
+    process_image_uploads command.
+    """
+
+    def __init__(self, workers: int, retry_delay: float):
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image-upload')
+        return self._executor
+
+    def submit(self, upload_id):
+        if self.workers < 1:
+            process_image_upload(upload_id)
+            return
+        self.get_executor().submit(self._run, upload_id)
+
+    def _run(self, upload_id):
+        try:
+            upload = process_image_upload(upload_id)
+        finally:
+            connections.close_all()
+        if upload is not None and upload.status == ImageUploadStatus.PENDING:
+            retry = threading.Timer(self.retry_delay * 2 ** (upload.attempts - 1), self.submit, [upload_id])
+            retry.daemon = True
+            retry.start()
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_upload_queue() -> UploadQueue:
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = UploadQueue(settings.IMAGE_UPLOAD_WORKERS, settings.IMAGE_UPLOAD_RETRY_DELAY)
+    return _queue
+
+
+@receiver(setting_changed)
+def reset_uploads(*, setting, **kwargs):
+    global _backend, _queue
+    if setting in ('IMAGE_UPLOAD_BACKEND', 'IMAGE_UPLOAD_LOCAL_ROOT'):
+        _backend = None
+    if setting in ('IMAGE_UPLOAD_WORKERS', 'IMAGE_UPLOAD_RETRY_DELAY') and _queue is not None:
+        _queue.shutdown(wait=False)
+        _queue = None
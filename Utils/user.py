@@ -1,14 +1,87 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import check_password, make_password
+
 from User.models import User
+from Utils import metrics
+from Utils.credential_cache import get_credential_cache
+from Utils.hashers import needs_rehash
+from Utils.hashing import HashPoolSaturated, get_hash_pool
+
+def _credential_field(matric_number=None, staff_id=None):
+    if staff_id is not None:
+        return 'staff_id', staff_id
+    return 'matric_number', matric_number
+
+def _load_user(credentials, field, value) -> User | None:
+    # the cached projection can be stale (row deleted, identifier changed via a
+    # queryset update); drop it rather than hand back the wrong account
+    user = User.objects.filter(pk=credentials.id).first()
+    if user is None or getattr(user, field) != value:
+        get_credential_cache().invalidate(**{field: value})
+        return None
+    if user.password != credentials.password:
+        # changed since it was cached, e.g. on another worker: the row decides
+        get_credential_cache().invalidate(**{field: value})
+    return user
 
 def authenticate(password: str, matric_number=None, staff_id=None) -> User | None:
-    try:
-        if staff_id is not None:
-            user = User.objects.get(staff_id=staff_id)
-        else:
-            user = User.objects.get(matric_number=matric_number)
-            
-        if user.check_password(password):
+    field, value = _credential_field(matric_number, staff_id)
+    credentials = get_credential_cache().lookup(field, value)
+    if credentials is None:
+        return None
+
+    rehash = False
+
+    def setter(raw_password):
+        nonlocal rehash
+        rehash = True
+
+    with metrics.timer('hash'):
+        valid = check_password(password, credentials.password, setter)
+    if not valid:
+        return None
+
+    user = _load_user(credentials, field, value)
+    if user is not None and user.password != credentials.password:
+        # the cached hash was stale; a password that only matched it is the old one
+        rehash = False
+        with metrics.timer('hash'):
+            if not check_password(password, user.password, setter):
+                return None
+    if user is not None and rehash:
+        # stored with another hasher or other cost settings than configured now
+        with metrics.timer('hash'):
+            user.set_password(password)
+        user.save(update_fields=['password'])
+    return user
+
+async def aauthenticate(password: str, matric_number=None, staff_id=None) -> User | None:
+    # same contract as authenticate(), but the hash check runs in the bounded
+    # hash pool; raises HashPoolSaturated when the pool is full
+    field, value = _credential_field(matric_number, staff_id)
+    credentials = await sync_to_async(get_credential_cache().lookup)(field, value)
+    if credentials is None:
+        return None
+
+    pool = get_hash_pool()
+    with metrics.timer('hash'):
+        valid = await pool.check_password(password, credentials.password)
+    if not valid:
+        return None
+
+    user = await sync_to_async(_load_user)(credentials, field, value)
+    if user is not None and user.password != credentials.password:
+        with metrics.timer('hash'):
+            if not await pool.check_password(password, user.password):
+                return None
+        credentials = credentials._replace(password=user.password)
+    if user is not None and needs_rehash(credentials.password):
+        # the check ran in the pool where check_password's setter cannot reach,
+        # so upgrade here; a busy pool just leaves it for the next login
+        try:
+            with metrics.timer('hash'):
+                user.password = await pool.run(make_password, password)
+        except HashPoolSaturated:
             return user
-        return None 
-    except User.DoesNotExist:
-        return None
\ No newline at end of file
+        await sync_to_async(user.save)(update_fields=['password'])
+    return user
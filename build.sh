@@ -0,0 +1,13 @@
+#!/usr/bin/env bash
+# Build step for a deploy: run once per release, before gunicorn starts.
+set -o errexit
+
+pip install -r requirements.txt
+
+# staticfiles/ is build output and not in the repo: collect the hashed,
+# precompressed assets WhiteNoise serves (see STORAGES in settings)
+python manage.py collectstatic --noinput
+
+if [ -n "${OPENAPI_SCHEMA_DIR:-}" ]; then
+    python manage.py build_openapi_schema
+fi
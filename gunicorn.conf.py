@@ -0,0 +1,58 @@
+import gc
+import glob
+import os
+
+# not `from decouple import config`: gunicorn reads every module-level name
+# here as a setting, and `config` is one of its own
+import decouple
+
+# GUNICORN_ASGI serves HealthPlus.asgi on uvicorn workers instead, so async
+# views such as api/user/login/async/ run on the workers' event loop rather
+# than in a loop started for each request. Database connections are then not
+# kept between requests (see DB_CONN_MAX_AGE in settings); DB_POOL reuses them
+serve_asgi = decouple.config('GUNICORN_ASGI', default=False, cast=bool)
+wsgi_app = 'HealthPlus.asgi:application' if serve_asgi else 'HealthPlus.wsgi:application'
+worker_class = 'uvicorn_worker.UvicornWorker' if serve_asgi else 'sync'
+bind = decouple.config('GUNICORN_BIND', default=f"0.0.0.0:{decouple.config('PORT', default='8000')}")
+workers = decouple.config('WEB_CONCURRENCY', default=2, cast=int)
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+
+# Load the app once in the master and fork the workers from it, so they share
+# its memory instead of each importing everything again. Turn off for
+# --reload in development.
+preload_app = decouple.config('GUNICORN_PRELOAD', default=True, cast=bool)
+
+if preload_app:
+    # No collections in the master until the fork: they would free objects in
+    # the middle of pages the workers are about to share (see gc.freeze).
+    gc.disable()
+
+
+def on_starting(server):
+    # a new release starts from zero; the last one's per-worker counts would
+    # otherwise be added to ours forever
+    metrics_dir = decouple.config('METRICS_DIR', default=None)
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+            os.remove(path)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from Utils.boot import preload
+
+    # URLconf, views and the OpenAPI schema, now rather than on each
+    # worker's first requests
+    preload()
+    # everything so far is moved out of the collector's reach, so the workers'
+    # collections never write to (and copy) the pages they share
+    gc.freeze()
+    # the master lives as long as the workers; let it collect again, now
+    # that only what it allocates from here on is tracked
+    gc.enable()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()